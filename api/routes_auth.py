@@ -1,96 +1,179 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, field_validator
+from typing import Dict, Any, List, Optional, Tuple
+from functools import lru_cache
+import asyncio
+import hashlib
+import logging
+import os
+import bcrypt
 
-router = APIRouter()
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
 
-# Request models
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
+
+# Request models. Emails are normalized once at validation time so
+# handlers can use data.email directly for lookups.
 class SignUpRequest(BaseModel):
     username: str
     email: str
     password: str
 
+    @field_validator("email")
+    @classmethod
+    def _normalize_email(cls, v: str) -> str:
+        return v.strip().lower()
+
 class SignInRequest(BaseModel):
     email: str
     password: str
 
-# Global database - make sure this is properly shared
-users_db: Dict[str, Dict[str, Any]] = {}
+    @field_validator("email")
+    @classmethod
+    def _normalize_email(cls, v: str) -> str:
+        return v.strip().lower()
+
+# Global user store. With REDIS_URL set, users live in Redis so every
+# uvicorn worker sees the same table; otherwise fall back to in-process
+# shards keyed by email so concurrent signups only contend when they land
+# on the same shard. SHARDS must be a power of two.
+REDIS_URL = os.getenv("REDIS_URL")
+USERS_SET_KEY = "users"
+
+# One client app-wide; redis-py keeps its own connection pool
+redis_client = (
+    aioredis.Redis.from_url(REDIS_URL, decode_responses=False)
+    if REDIS_URL and REDIS_AVAILABLE else None
+)
+if REDIS_URL and not REDIS_AVAILABLE:
+    logger.warning("REDIS_URL is set but redis is not installed; using in-process user store")
+
+SHARDS = 16
+_shards: List[Dict[str, Dict[str, Any]]] = [{} for _ in range(SHARDS)]
+_locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(SHARDS)]
+
+def _shard(email: str) -> Tuple[Dict[str, Dict[str, Any]], asyncio.Lock]:
+    """Return the (shard, lock) pair owning this email"""
+    i = hash(email) & (SHARDS - 1)
+    return _shards[i], _locks[i]
+
+def _user_key(email: str) -> str:
+    return f"user:{email}"
+
+async def _create_user(email: str, username: str, hashed: bytes) -> bool:
+    """Insert a user, returning False if the email is already registered"""
+    if redis_client is not None:
+        # HSETNX on every field keeps a duplicate signup from overwriting
+        # anything; the whole insert is a single round-trip
+        async with redis_client.pipeline(transaction=True) as p:
+            p.hsetnx(_user_key(email), "password", hashed)
+            p.hsetnx(_user_key(email), "username", username)
+            p.sadd(USERS_SET_KEY, email)
+            created, _, _ = await p.execute()
+        return bool(created)
+
+    shard, lock = _shard(email)
+    async with lock:
+        if email in shard:
+            return False
+        shard[email] = {
+            "username": username,
+            "email": email,
+            "password": hashed,
+        }
+    return True
+
+async def _get_user(email: str) -> Optional[Dict[str, Any]]:
+    if redis_client is not None:
+        hashed, username = await redis_client.hmget(_user_key(email), "password", "username")
+        if hashed is None:
+            return None
+        return {
+            "username": username.decode() if username else "",
+            "email": email,
+            "password": hashed,
+        }
 
-print("🚀 Authentication router initialized!")
-print("📝 Current users in database:", list(users_db.keys()))
+    # dict.get is atomic under the GIL, so reads skip the shard lock
+    shard, _ = _shard(email)
+    return shard.get(email)
+
+async def _user_count() -> int:
+    if redis_client is not None:
+        return await redis_client.scard(USERS_SET_KEY)
+    return sum(len(shard) for shard in _shards)
+
+# bcrypt work factor used for newly registered passwords
+BCRYPT_ROUNDS = 12
+
+@lru_cache(maxsize=4096)
+def _verify(email: str, pw_sha: str, stored_hash: bytes) -> bool:
+    """Memoized bcrypt check so repeat signins skip the KDF.
+
+    The stored hash is part of the key, so a changed password can never be
+    verified against a stale entry; old entries just age out of the LRU.
+    """
+    return bcrypt.checkpw(pw_sha.encode(), stored_hash)
+
+def _password_digest(password: str) -> str:
+    """SHA-256 pre-hash used both as bcrypt input and as the cache key"""
+    return hashlib.sha256(password.encode()).hexdigest()
 
 @router.post("/signup")
 async def signup(data: SignUpRequest):
-    print(f"\n=== SIGNUP ATTEMPT ===")
-    print(f"📧 Email: {data.email}")
-    print(f"👤 Username: {data.username}")
-    print(f"🔐 Password: {data.password}")
+    logger.debug("Signup attempt: email=%s username=%s", data.email, data.username)
     
-    # Convert email to lowercase for consistent comparison
-    email_lower = data.email.lower().strip()
+    # Already lowercased and stripped by SignUpRequest
+    email_lower = data.email
     
-    # Check if user already exists
-    if email_lower in users_db:
-        print(f"❌ User already exists: {email_lower}")
-        print(f"📊 Current users: {list(users_db.keys())}")
-        raise HTTPException(status_code=400, detail="User with this email already exists")
+    # Hash before touching the store so the KDF never holds a shard lock;
+    # only the bcrypt hash is stored, never the plaintext password. The KDF
+    # takes hundreds of milliseconds, so it runs off the event loop.
+    hashed = await asyncio.to_thread(
+        bcrypt.hashpw, _password_digest(data.password).encode(), bcrypt.gensalt(BCRYPT_ROUNDS)
+    )
     
-    # Store user data
-    users_db[email_lower] = {
-        "username": data.username.strip(),
-        "email": email_lower,
-        "password": data.password,
-    }
+    # Insert fails if the user already exists
+    if not await _create_user(email_lower, data.username.strip(), hashed):
+        logger.debug("User already exists: %s", email_lower)
+        raise HTTPException(status_code=400, detail="User with this email already exists")
     
-    print(f"✅ User successfully registered: {email_lower}")
-    print(f"📊 Current users in database: {list(users_db.keys())}")
-    print("=== SIGNUP SUCCESS ===\n")
+    logger.debug("User successfully registered: %s", email_lower)
     
     return {"message": "Sign-up successful", "email": email_lower}
 
 @router.post("/signin")
 async def signin(data: SignInRequest):
-    print(f"\n=== SIGNIN ATTEMPT ===")
-    print(f"📧 Email: {data.email}")
-    print(f"🔐 Password: {data.password}")
-    print(f"📊 Available users: {list(users_db.keys())}")
+    logger.debug("Signin attempt: email=%s", data.email)
     
-    email_lower = data.email.lower().strip()
+    # Already lowercased and stripped by SignInRequest
+    email_lower = data.email
     
-    user = users_db.get(email_lower)
+    user = await _get_user(email_lower)
     
     if not user:
-        print(f"❌ User not found: {email_lower}")
-        print("=== SIGNIN FAILED ===\n")
+        logger.debug("Signin failed, user not found: %s", email_lower)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    # Compare passwords
-    if user["password"] != data.password:
-        print(f"❌ Password mismatch for: {email_lower}")
-        print(f"💾 Stored password: {user['password']}")
-        print(f"📨 Provided password: {data.password}")
-        print("=== SIGNIN FAILED ===\n")
+    # Compare passwords against the stored bcrypt hash; a cache miss runs the
+    # full KDF, so the check happens in a worker thread
+    if not await asyncio.to_thread(_verify, email_lower, _password_digest(data.password), user["password"]):
+        logger.debug("Signin failed, password mismatch for: %s", email_lower)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    print(f"✅ Successful signin for: {email_lower}")
-    print(f"👤 Welcome: {user['username']}")
-    print("=== SIGNIN SUCCESS ===\n")
+    logger.debug("Successful signin for: %s", email_lower)
     return {"message": f"Welcome back, {user['username']}!"}
 
-# Debug endpoint to see all users
-@router.get("/debug-users")
-async def debug_users():
-    return {
-        "total_users": len(users_db),
-        "users": users_db
-    }
-
 # Health check endpoint
 @router.get("/health")
 async def health_check():
     return {
         "status": "healthy", 
-        "user_count": len(users_db),
-        "users": list(users_db.keys())
+        "user_count": await _user_count()
     }
\ No newline at end of file
@@ -1,26 +1,132 @@
 # api/routes_exam_generation.py
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
 import os
-import uuid
-import sys
+import secrets
+import logging
+import asyncio
+import functools
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from cachetools import LRUCache, TTLCache
 
-# Add services to path
-sys.path.append(str(Path(__file__).parent.parent / "services"))
+# Import failures propagate so main.py can skip mounting this router
+from services.exam_service import exam_service
 
-try:
-    from services.exam_service import exam_service
-except ImportError as e:
-    print(f"Warning: Could not import exam_service: {e}")
-    # Create a mock service for development
-    class MockExamService:
-        def initialize_controller(self):
-            return False
-        def generate_exam_from_pdf(self, **kwargs):
-            return {"success": False, "error": "Exam service not available"}
-    exam_service = MockExamService()
+logger = logging.getLogger(__name__)
 
-router = APIRouter()
+class _SizeLimitedRoute(APIRoute):
+    """
+    Rejects requests whose Content-Length is over MAX_PDF_SIZE before the
+    body is read. FastAPI parses and spools File(...) uploads before the
+    endpoint or its dependencies run, so the check can't live there.
+    """
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def size_limited_handler(request: Request):
+            try:
+                content_length = int(request.headers.get("content-length", "0"))
+            except ValueError:
+                content_length = 0
+            if content_length > MAX_PDF_SIZE:
+                raise HTTPException(status_code=413, detail="PDF too large")
+            return await handler(request)
+
+        return size_limited_handler
+
+router = APIRouter(default_response_class=ORJSONResponse, route_class=_SizeLimitedRoute)
+
+# Temporary upload directory, created once per worker
+TEMP_DIR = Path("temp_uploads")
+TEMP_DIR.mkdir(exist_ok=True)
+
+# Uploads are copied to disk in fixed-size chunks so peak memory per
+# request stays O(chunk) instead of O(file size). Each copy reads into a
+# UPLOAD_CHUNK_SIZE * UPLOAD_WRITE_BATCH buffer, so one write syscall covers
+# what would otherwise be UPLOAD_WRITE_BATCH chunk-sized writes.
+UPLOAD_CHUNK_SIZE = 1 << 16
+UPLOAD_WRITE_BATCH = 8
+UPLOAD_BUFFER_SIZE = UPLOAD_CHUNK_SIZE * UPLOAD_WRITE_BATCH
+
+# Largest PDF accepted by /generate-exam
+MAX_PDF_SIZE = 25 * 1024 * 1024
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_PDF_SIZE while being copied"""
+
+# Pool of reusable copy buffers: uploads borrow one instead of allocating
+# fresh bytes objects per chunk. At most UPLOAD_BUFFER_POOL are kept around.
+UPLOAD_BUFFER_POOL = 32
+_free_buffers: "queue.SimpleQueue[bytearray]" = queue.SimpleQueue()
+
+def _acquire_buffer() -> bytearray:
+    try:
+        return _free_buffers.get_nowait()
+    except queue.Empty:
+        return bytearray(UPLOAD_BUFFER_SIZE)
+
+def _release_buffer(buf: bytearray):
+    if _free_buffers.qsize() < UPLOAD_BUFFER_POOL:
+        _free_buffers.put(buf)
+
+def _copy_upload(src, dst_path: str, max_size: int = MAX_PDF_SIZE) -> str:
+    """
+    Copy an uploaded file to disk through a pooled buffer (blocking).
+    Returns the SHA-256 hex digest of the content.
+    """
+    # SpooledTemporaryFile only grew readinto() in Python 3.11
+    if not hasattr(src, "readinto"):
+        src = src._file
+    
+    buf = _acquire_buffer()
+    view = memoryview(buf)
+    digest = hashlib.sha256()
+    try:
+        total = 0
+        with open(dst_path, "wb") as dst:
+            while n := src.readinto(view):
+                # Content-Length can be absent or wrong; enforce the cap here too
+                total += n
+                if total > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                digest.update(view[:n])
+                dst.write(view[:n])
+    finally:
+        view.release()
+        _release_buffer(buf)
+    return digest.hexdigest()
+
+# Status probes hit /exam-service-status every few seconds; keep the last
+# answer for 30s so they don't re-run controller initialization each time
+_status_cache = TTLCache(maxsize=1, ttl=30)
+# The status endpoint is sync, so FastAPI runs it in its threadpool, and
+# cachetools caches aren't thread-safe
+_status_lock = threading.Lock()
+
+# Successful exams keyed by (pdf sha256, query, counts, total marks), so
+# re-uploading the same textbook with the same settings skips generation
+_exam_cache = LRUCache(maxsize=256)
+
+# Exam generation parses PDFs and builds prompts synchronously; run it on a
+# dedicated pool so it never stalls the event loop or the shared default pool
+EXAM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=(os.cpu_count() or 1) * 2,
+    thread_name_prefix="exam-gen",
+)
+
+async def _run_exam_generation(**kwargs):
+    # Each request gets its own executor thread, so concurrent uploads are
+    # generated in parallel rather than queued behind one another
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        EXAM_EXECUTOR,
+        functools.partial(exam_service.generate_exam_from_pdf, **kwargs),
+    )
 
 @router.post("/generate-exam")
 async def generate_exam_from_pdf(
@@ -34,27 +140,32 @@ async def generate_exam_from_pdf(
     """
     Generate exam paper from uploaded PDF
     """
+    # Oversized requests never get here: _SizeLimitedRoute rejects them from
+    # Content-Length, and _copy_upload enforces the cap on the bytes themselves
+    
+    # Validate file type
+    if not pdf_file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    # Generate unique filename
+    file_extension = Path(pdf_file.filename).suffix
+    unique_filename = f"{secrets.token_hex(16)}{file_extension}"
+    pdf_path = str(TEMP_DIR / unique_filename)
+    
     try:
-        # Validate file type
-        if not pdf_file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-        
-        # Create temporary upload directory
-        temp_dir = "temp_uploads"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Generate unique filename
-        file_extension = os.path.splitext(pdf_file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        pdf_path = os.path.join(temp_dir, unique_filename)
+        # Save uploaded file without buffering it whole in memory
+        try:
+            pdf_sha = await asyncio.to_thread(_copy_upload, pdf_file.file, pdf_path)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="PDF too large")
         
-        # Save uploaded file
-        with open(pdf_path, "wb") as f:
-            content = await pdf_file.read()
-            f.write(content)
+        cache_key = (pdf_sha, query, mcq_count, short_count, long_count, total_marks)
+        cached = _exam_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Generate exam
-        result = exam_service.generate_exam_from_pdf(
+        # Generate exam off the event loop
+        result = await _run_exam_generation(
             pdf_path=pdf_path,
             query=query,
             mcq_count=mcq_count,
@@ -63,39 +174,63 @@ async def generate_exam_from_pdf(
             total_marks=total_marks
         )
         
-        # Clean up temporary file
-        try:
-            if os.path.exists(pdf_path):
-                os.remove(pdf_path)
-        except Exception as e:
-            print(f"Warning: Could not delete temp file {pdf_path}: {e}")
-        
+        # Only cache successes so transient failures are retried
+        if result.get("success"):
+            _exam_cache[cache_key] = result
         return result
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exam generation failed: {str(e)}")
+    finally:
+        # Clean up temporary file, even when generation failed
+        try:
+            await asyncio.to_thread(os.unlink, pdf_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not delete temp file %s: %s", pdf_path, e)
 
 @router.get("/exam-service-status")
 def get_exam_service_status():
     """Check if exam generation service is available"""
+    with _status_lock:
+        cached = _status_cache.get("status")
+    if cached is not None:
+        return cached
+    
     try:
         if exam_service.initialize_controller():
-            return {
+            response = {
                 "status": "available",
                 "message": "Exam generation service is ready"
             }
         else:
-            return {
+            response = {
                 "status": "unavailable", 
                 "message": "Exam generation service failed to initialize"
             }
     except Exception as e:
+        # Errors are not cached so the next probe retries immediately
         return {
             "status": "error",
             "message": f"Service check failed: {str(e)}"
         }
+    
+    with _status_lock:
+        _status_cache["status"] = response
+    return response
+
+@router.post("/warmup")
+async def warmup():
+    """
+    Initialize the exam service ahead of the first real request, so a cold
+    worker's controller setup and Gemini model discovery don't land on it
+    """
+    loop = asyncio.get_running_loop()
+    ready = await loop.run_in_executor(EXAM_EXECUTOR, exam_service.initialize_controller)
+    return {"status": "warm" if ready else "unavailable"}
 
 @router.post("/test-exam-generation")
 async def test_exam_generation():
@@ -113,7 +248,7 @@ async def test_exam_generation():
                 "note": "Place a sample.pdf file in the root directory for testing"
             }
         
-        result = exam_service.generate_exam_from_pdf(
+        result = await _run_exam_generation(
             pdf_path=sample_pdf_path,
             query="artificial intelligence and machine learning",
             mcq_count=5,
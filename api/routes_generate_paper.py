@@ -4,18 +4,51 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from pathlib import Path
-import shutil
+from collections import OrderedDict
+from cachetools import LRUCache
 from datetime import datetime
+import asyncio
+import base64
+import hashlib
+import json
 import io
+import logging
 import re
 import random
+import shutil
 import sys
 import os
+import uuid
+from xml.sax.saxutils import escape
+import aiofiles
+import fitz
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
 
 # Add the current directory to Python path to find your modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Folder to save uploaded files
 UPLOAD_DIR = Path("uploaded_files")
@@ -24,6 +57,32 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 # Maximum allowed files
 MAX_FILES = 10
 
+# Extracted page texts keyed by BLAKE2b of the uploaded bytes, so iterating
+# on the same source material (tweaking counts, headings) skips PyMuPDF.
+# In-memory LRU bounded to EXTRACTION_CACHE_SIZE, backed by JSON files in
+# EXTRACTION_CACHE_DIR for reuse across workers and restarts.
+# Bump EXTRACTOR_VERSION whenever iter_pdf_pages' output changes; entries
+# live in a per-version directory and older versions are removed at startup.
+EXTRACTOR_VERSION = 2
+EXTRACTION_CACHE_ROOT = UPLOAD_DIR / ".cache"
+EXTRACTION_CACHE_DIR = EXTRACTION_CACHE_ROOT / f"v{EXTRACTOR_VERSION}"
+EXTRACTION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+for _stale in EXTRACTION_CACHE_ROOT.iterdir():
+    if _stale != EXTRACTION_CACHE_DIR:
+        if _stale.is_dir():
+            shutil.rmtree(_stale, ignore_errors=True)
+        else:
+            _stale.unlink(missing_ok=True)
+EXTRACTION_CACHE_SIZE = 128
+# Entries kept on disk; the least recently used are removed beyond this
+EXTRACTION_DISK_CACHE_SIZE = 2048
+COPY_CHUNK_SIZE = 1 << 20
+_extraction_cache: "OrderedDict[str, list]" = OrderedDict()
+_extraction_cache_lock = asyncio.Lock()
+
+# PyMuPDF is CPU-bound; cap concurrent extractions to avoid thrashing
+_extraction_semaphore = asyncio.Semaphore(min(MAX_FILES, os.cpu_count() or 1))
+
 # Pydantic Model for Download Paper
 class DownloadPaperRequest(BaseModel):
     id: int
@@ -61,112 +120,292 @@ except ImportError as e:
     class FallbackExamService:
         def generate_exam_from_pdf(self, **kwargs):
             return {"success": False, "error": "Exam service not available"}
+        def generate_exam_from_chunks(self, **kwargs):
+            return {"success": False, "error": "Exam service not available"}
+        async def agenerate_exam_from_chunks(self, **kwargs):
+            return {"success": False, "error": "Exam service not available"}
+        def stream_exam_from_chunks(self, **kwargs):
+            yield {"error": "Exam service not available"}
     exam_service = FallbackExamService()
 
+# --- Precompiled text patterns ---
+_WS_RE = re.compile(r'\s+')
+# Sentence split: fold !/? into '.' then str.split, cheaper than a regex split
+_SENT_TRANS = str.maketrans({'!': '.', '?': '.'})
+_LETTER_RE = re.compile(r'[a-zA-Z]')
+_CONCEPT_RE = re.compile(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b')
+
+# Sentences containing any of these (case-insensitive substring) are noise
+_NOISE_WORDS = frozenset({
+    'page', 'chapter', 'figure', 'table', 'copyright',
+    'confidential', 'error', 'no text', 'unsupported'
+})
+_STOP_CAPS = frozenset({'The', 'This', 'That', 'These', 'Those'})
+
+# One Aho-Corasick automaton finds any noise word in a single pass over the
+# sentence instead of one substring scan per word
+if AHOCORASICK_AVAILABLE:
+    _NOISE_AC = ahocorasick.Automaton()
+    for _word in _NOISE_WORDS:
+        _NOISE_AC.add_word(_word, _word)
+    _NOISE_AC.make_automaton()
+else:
+    _NOISE_AC = None
+
+def _has_noise(sentence):
+    # One casefold per sentence is cheap next to the scan itself; an
+    # re.IGNORECASE alternation over the noise words measured ~10x slower
+    # than casefold plus substring checks on typical sentences
+    folded = sentence.casefold()
+    if _NOISE_AC is not None:
+        return next(_NOISE_AC.iter(folded), None) is not None
+    return any(word in folded for word in _NOISE_WORDS)
+
+_NOISE_PATTERN = "|".join(re.escape(word) for word in sorted(_NOISE_WORDS))
+
+def _quality_sentences(candidates, seen):
+    """
+    Yield stripped candidates that pass the quality filter and are not yet
+    in `seen`. With PyArrow the filter runs column-wise over the whole
+    segment; otherwise each sentence is checked in Python, and rejected
+    sentences are added to `seen` so repeated boilerplate is skipped cheaply.
+    """
+    if PYARROW_AVAILABLE:
+        arr = pc.utf8_trim_whitespace(pa.array(candidates, type=pa.string()))
+        length = pc.utf8_length(arr)
+        word_count = pc.list_value_length(pc.utf8_split_whitespace(arr))
+        mask = pc.and_(pc.greater(length, 40), pc.less(length, 300))
+        mask = pc.and_(mask, pc.greater_equal(word_count, 8))
+        mask = pc.and_(mask, pc.match_substring_regex(arr, r'[a-zA-Z]'))
+        mask = pc.and_(mask, pc.invert(
+            pc.match_substring_regex(arr, _NOISE_PATTERN, ignore_case=True)
+        ))
+        for clean_sentence in arr.filter(mask).to_pylist():
+            if clean_sentence not in seen:
+                yield clean_sentence
+        return
+
+    for sentence in candidates:
+        clean_sentence = sentence.strip()
+        # Skip repeats (accepted or rejected) before any filtering work
+        if clean_sentence in seen:
+            continue
+        seen.add(clean_sentence)
+        # More strict filtering to get only quality content
+        if (len(clean_sentence) > 40 and
+            len(clean_sentence) < 300 and
+            len(clean_sentence.split()) >= 8 and
+            not _has_noise(clean_sentence) and
+            _LETTER_RE.search(clean_sentence)):  # Must contain letters
+            yield clean_sentence
+
 # --- IMPROVED PDF Extraction Functions ---
-def extract_text_from_pdf_enhanced(file_path):
-    """Enhanced PDF text extraction with better debugging"""
-    try:
-        import fitz
-        print(f"🔍 Extracting from PDF: {file_path}")
-        
-        doc = fitz.open(file_path)
-        full_text = ""
-        
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
+# Enough sentences to build every question type; extraction stops here
+MAX_MEANINGFUL_SENTENCES = 50
+
+def iter_pdf_pages(file_path):
+    """Yield whitespace-normalized text for each non-empty PDF page"""
+    print(f"🔍 Extracting from PDF: {file_path}")
+    
+    with fitz.open(file_path) as doc:
+        for page_num, page in enumerate(doc):
+            # Text blocks only (b[6] == 0), no layout reflow or image blocks;
+            # fall back to plain text for pages where blocks come back thin
+            blocks = page.get_text("blocks", flags=fitz.TEXTFLAGS_SEARCH)
+            page_text = " ".join(b[4] for b in blocks if b[6] == 0)
+            if len(page_text) < 50:
+                page_text = page.get_text("text")
             
             if page_text and page_text.strip():
                 # Clean the text - remove excessive whitespace
-                cleaned_text = re.sub(r'\s+', ' ', page_text.strip())
-                full_text += f"\n{cleaned_text}"
+                cleaned_text = _WS_RE.sub(' ', page_text.strip())
                 print(f"✅ Page {page_num + 1}: {len(cleaned_text)} chars")
+                yield cleaned_text
             else:
                 print(f"❌ Page {page_num + 1}: No text found")
+
+def extract_text_from_pdf_enhanced(file_path):
+    """Enhanced PDF text extraction, returning the list of cleaned page texts"""
+    try:
+        pages = list(iter_pdf_pages(file_path))
         
-        doc.close()
-        
-        if not full_text.strip():
+        if not pages:
             print("❌ DEBUG: No text could be extracted from PDF")
-            return ""
+            return []
         
-        print(f"✅ DEBUG: Total extracted: {len(full_text)} characters")
-        return full_text
+        print(f"✅ DEBUG: Total extracted: {sum(map(len, pages))} characters")
+        return pages
         
     except Exception as e:
         print(f"❌ DEBUG: PDF extraction error: {e}")
-        return f"Error extracting text from PDF: {str(e)}"
+        return []
 
 def extract_text_from_file_enhanced(file_path):
-    """Enhanced file text extraction"""
+    """Enhanced file text extraction, returning page texts (empty on failure)"""
     try:
         file_path = Path(file_path)
         if not file_path.exists():
             print(f"❌ DEBUG: File not found: {file_path}")
-            return f"File not found: {file_path}"
+            return []
             
         if file_path.suffix.lower() == '.pdf':
             return extract_text_from_pdf_enhanced(str(file_path))
         else:
             print(f"❌ DEBUG: Unsupported file type: {file_path.suffix}")
-            return f"Unsupported file type: {file_path.suffix}"
+            return []
             
     except Exception as e:
         print(f"❌ DEBUG: File processing error: {e}")
-        return f"Error reading file: {str(e)}"
+        return []
+
+async def save_upload(file: UploadFile, file_path: Path) -> str:
+    """Stream an upload to disk, returning the BLAKE2b digest of its bytes"""
+    digest = hashlib.blake2b(digest_size=16)
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+            await buffer.write(chunk)
+    return digest.hexdigest()
+
+def discard_upload(file_path: Path):
+    """Remove a saved upload once its pages have been extracted"""
+    try:
+        file_path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"⚠️ Could not remove upload {file_path}: {e}")
+
+def _load_cached_pages(digest):
+    path = EXTRACTION_CACHE_DIR / f"{digest}.json"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            pages = json.load(f)
+        # mtime doubles as last use, for _trim_disk_cache
+        os.utime(path)
+        return pages
+    except (OSError, ValueError):
+        return None
+
+def _trim_disk_cache():
+    """Remove the least recently used entries beyond EXTRACTION_DISK_CACHE_SIZE"""
+    entries = []
+    with os.scandir(EXTRACTION_CACHE_DIR) as it:
+        for entry in it:
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass
+    if len(entries) <= EXTRACTION_DISK_CACHE_SIZE:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - EXTRACTION_DISK_CACHE_SIZE]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def _store_cached_pages(digest, pages):
+    try:
+        with open(EXTRACTION_CACHE_DIR / f"{digest}.json", "w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False)
+        _trim_disk_cache()
+    except OSError as e:
+        print(f"⚠️ Could not persist extraction cache entry {digest}: {e}")
+
+async def _remember_pages(digest, pages):
+    async with _extraction_cache_lock:
+        _extraction_cache[digest] = pages
+        _extraction_cache.move_to_end(digest)
+        while len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+            _extraction_cache.popitem(last=False)
+
+async def extract_pages_cached(file_path, digest):
+    """Return page texts for a saved upload, reusing earlier extractions"""
+    async with _extraction_cache_lock:
+        pages = _extraction_cache.get(digest)
+        if pages is not None:
+            _extraction_cache.move_to_end(digest)
+            print(f"⚡ Extraction cache hit (memory): {file_path}")
+            return pages
+    
+    pages = await asyncio.to_thread(_load_cached_pages, digest)
+    if pages is not None:
+        print(f"⚡ Extraction cache hit (disk): {file_path}")
+    else:
+        async with _extraction_semaphore:
+            pages = await asyncio.to_thread(extract_text_from_file_enhanced, file_path)
+        # Empty results may be transient failures; don't cache them anywhere
+        if not pages:
+            return pages
+        await asyncio.to_thread(_store_cached_pages, digest, pages)
+    
+    await _remember_pages(digest, pages)
+    return pages
 
 # --- IMPROVED Content Processing Functions ---
 def extract_meaningful_content(content):
-    """Extract meaningful sentences and concepts with better filtering"""
+    """
+    Extract meaningful sentences and concepts with better filtering.
+    `content` is either a string or an iterable of text segments (pages);
+    segments are consumed lazily and scanning stops once enough sentences
+    have been collected.
+    """
     print("🔍 Extracting meaningful content...")
     
-    if not content or "Error:" in content:
-        print("❌ No content or error in content")
-        return [], []
-    
-    # Split into sentences
-    sentences = re.split(r'[.!?]+', content)
-    
-    meaningful_sentences = []
-    key_concepts = set()
-    
-    for sentence in sentences:
-        clean_sentence = sentence.strip()
-        # More strict filtering to get only quality content
-        if (len(clean_sentence) > 40 and
-            len(clean_sentence) < 300 and
-            len(clean_sentence.split()) >= 8 and
-            not any(word in clean_sentence.lower() for word in [
-                'page', 'chapter', 'figure', 'table', 'copyright',
-                'confidential', 'error', 'no text', 'unsupported'
-            ]) and
-            re.search(r'[a-zA-Z]', clean_sentence)):  # Must contain letters
+    if isinstance(content, str):
+        if not content or "Error:" in content:
+            print("❌ No content or error in content")
+            return [], []
+        content = [content]
+    
+    seen: set[str] = set()
+    unique_sentences: list[str] = []
+    
+    for segment in content:
+        # Split into sentences
+        candidates = segment.translate(_SENT_TRANS).split('.')
+        for clean_sentence in _quality_sentences(candidates, seen):
+            seen.add(clean_sentence)
+            unique_sentences.append(clean_sentence)
             
-            meaningful_sentences.append(clean_sentence)
-            
-            # Extract key concepts (capitalized phrases)
-            concepts = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', clean_sentence)
-            for concept in concepts:
-                if len(concept) > 3 and concept not in ['The', 'This', 'That', 'These', 'Those']:
-                    key_concepts.add(concept)
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_sentences = []
-    for sentence in meaningful_sentences:
-        if sentence not in seen:
-            seen.add(sentence)
-            unique_sentences.append(sentence)
-    
+            if len(unique_sentences) >= MAX_MEANINGFUL_SENTENCES:
+                break
+        if len(unique_sentences) >= MAX_MEANINGFUL_SENTENCES:
+            break
+    
+    # Extract key concepts (capitalized phrases) in one pass; the ". "
+    # separator keeps phrases from running across sentence boundaries.
+    # dict.fromkeys dedupes in document order so the top 20 are stable.
+    key_concepts = dict.fromkeys(
+        concept for concept in _CONCEPT_RE.findall(". ".join(unique_sentences))
+        if len(concept) > 3 and concept not in _STOP_CAPS
+    )
     concepts_list = list(key_concepts)
     
     print(f"📝 Found {len(unique_sentences)} meaningful sentences and {len(concepts_list)} key concepts")
-    return unique_sentences[:50], concepts_list[:20]
-
-def prepare_chunks_for_gemini(content):
+    return unique_sentences, concepts_list[:20]
+
+# Sentence extraction and fallback papers keyed by a digest of the source
+# files, so a request reuses one extraction for chunking and the fallback,
+# and repeat requests on the same material skip both
+CONTENT_MEMO_SIZE = 64
+_meaningful_cache = LRUCache(maxsize=CONTENT_MEMO_SIZE)
+_fallback_cache = LRUCache(maxsize=CONTENT_MEMO_SIZE)
+
+def content_key_for(digests):
+    """Combine per-file upload digests into one key for the whole corpus"""
+    return hashlib.blake2b("".join(digests).encode(), digest_size=16).hexdigest()
+
+def _meaningful_content(content, content_key=None):
+    """extract_meaningful_content, memoized when a content key is given"""
+    if content_key is None:
+        return extract_meaningful_content(content)
+    if content_key not in _meaningful_cache:
+        _meaningful_cache[content_key] = extract_meaningful_content(content)
+    return _meaningful_cache[content_key]
+
+def prepare_chunks_for_gemini(content, content_key=None):
     """Prepare content chunks for question generation"""
-    sentences, concepts = extract_meaningful_content(content)
+    sentences, concepts = _meaningful_content(content, content_key)
     
     # Group sentences into meaningful chunks (3-5 sentences each)
     chunks = []
@@ -186,23 +425,15 @@ def prepare_chunks_for_gemini(content):
     return chunks
 
 # --- UNIFIED QUESTION GENERATION ---
-def generate_questions_with_service(chunks, mcq_count, saq_count, laq_count, difficulty, paper_heading):
+async def generate_questions_with_service(chunks, mcq_count, saq_count, laq_count, difficulty, paper_heading):
     """Generate questions using the unified exam service"""
     print("🚀 USING UNIFIED EXAM SERVICE FOR QUESTION GENERATION")
     
     try:
-        # Save chunks to a temporary PDF for processing
-        temp_pdf_path = "temp_content.pdf"
-        
-        # Create a simple text representation (in real implementation, you'd create an actual PDF)
-        with open(temp_pdf_path, 'w', encoding='utf-8') as f:
-            f.write(f"# {paper_heading}\n\n")
-            for i, chunk in enumerate(chunks):
-                f.write(f"## Chunk {i+1}\n{chunk}\n\n")
-        
-        # Use the exam service
-        result = exam_service.generate_exam_from_pdf(
-            pdf_path=temp_pdf_path,
+        # Hand the extracted chunks straight to the service; no temp file
+        # round-trip and no second parse of the material
+        result = await exam_service.agenerate_exam_from_chunks(
+            chunks=chunks,
             query=paper_heading,
             mcq_count=mcq_count,
             short_count=saq_count,
@@ -210,12 +441,6 @@ def generate_questions_with_service(chunks, mcq_count, saq_count, laq_count, dif
             total_marks=(mcq_count * 1 + saq_count * 3 + laq_count * 5)
         )
         
-        # Clean up temp file
-        try:
-            os.remove(temp_pdf_path)
-        except:
-            pass
-        
         if result.get("success"):
             exam_data = result.get("exam", {})
             questions_text = format_exam_questions(exam_data)
@@ -231,7 +456,7 @@ def generate_questions_with_service(chunks, mcq_count, saq_count, laq_count, dif
 
 def format_exam_questions(exam_data):
     """Format exam questions into text format"""
-    questions_text = ""
+    parts: list[str] = []
     question_number = 1
     
     # MCQs from Section A
@@ -239,13 +464,13 @@ def format_exam_questions(exam_data):
     mcq_questions = mcq_section.get("questions", [])
     
     if mcq_questions:
-        questions_text += f"**SECTION A: MULTIPLE CHOICE QUESTIONS** ({len(mcq_questions)} questions - {len(mcq_questions)} marks)\n\n"
+        parts.append(f"**SECTION A: MULTIPLE CHOICE QUESTIONS** ({len(mcq_questions)} questions - {len(mcq_questions)} marks)\n\n")
         for mcq in mcq_questions:
-            questions_text += f"{question_number}. {mcq.get('question', 'Question')}\n"
+            parts.append(f"{question_number}. {mcq.get('question', 'Question')}\n")
             options = mcq.get('options', ['Option A', 'Option B', 'Option C', 'Option D'])
             for i, option in enumerate(options):
-                questions_text += f"   {chr(97+i)}) {option}\n"
-            questions_text += "\n"
+                parts.append(f"   {chr(97+i)}) {option}\n")
+            parts.append("\n")
             question_number += 1
     
     # Short Answer Questions from Section B
@@ -253,9 +478,9 @@ def format_exam_questions(exam_data):
     short_questions = short_section.get("questions", [])
     
     if short_questions:
-        questions_text += f"**SECTION B: SHORT ANSWER QUESTIONS** ({len(short_questions)} questions - {len(short_questions) * 3} marks)\n\n"
+        parts.append(f"**SECTION B: SHORT ANSWER QUESTIONS** ({len(short_questions)} questions - {len(short_questions) * 3} marks)\n\n")
         for saq in short_questions:
-            questions_text += f"{question_number}. {saq.get('question', 'Question')} ({3} marks)\n\n"
+            parts.append(f"{question_number}. {saq.get('question', 'Question')} ({3} marks)\n\n")
             question_number += 1
     
     # Long Answer Questions from Section C  
@@ -263,199 +488,191 @@ def format_exam_questions(exam_data):
     long_questions = long_section.get("questions", [])
     
     if long_questions:
-        questions_text += f"**SECTION C: LONG ANSWER QUESTIONS** ({len(long_questions)} questions - {len(long_questions) * 5} marks)\n\n"
+        parts.append(f"**SECTION C: LONG ANSWER QUESTIONS** ({len(long_questions)} questions - {len(long_questions) * 5} marks)\n\n")
         for laq in long_questions:
-            questions_text += f"{question_number}. {laq.get('question', 'Question')} ({5} marks)\n\n"
+            parts.append(f"{question_number}. {laq.get('question', 'Question')} ({5} marks)\n\n")
             question_number += 1
     
-    return questions_text
+    return "".join(parts)
 
 # --- ENHANCED FALLBACK QUESTION GENERATION ---
-def generate_enhanced_fallback_questions(content, mcq_count, saq_count, laq_count, difficulty):
-    """Enhanced fallback question generation with variety"""
+# Templates for the enhanced fallback generator
+_FALLBACK_QUESTION_TYPES = (
+    "What is the PRIMARY purpose of: \"{}\"?",
+    "Which statement BEST summarizes: \"{}\"?",
+    "How would you APPLY the concept: \"{}\"?",
+    "What can be INFERRED from: \"{}\"?",
+    "What is the key CHARACTERISTIC in: \"{}\"?",
+)
+_FALLBACK_OPTION_TEMPLATES = (
+    ("To achieve the main objective described", "For documentation purposes only", "As a secondary supporting function", "For entertainment value"),
+    ("As clearly explained in the material", "A common misconception", "Only partially correct", "Not covered in the text"),
+    ("In practical scenarios as outlined", "Only in theoretical frameworks", "With significant modifications", "It has no practical application"),
+    ("The logical conclusion supported by evidence", "An assumption not supported", "A contradictory viewpoint", "An irrelevant detail"),
+    ("The defining feature mentioned", "A minor attribute", "An external characteristic", "An incorrect assumption"),
+)
+_FALLBACK_SAQ_TYPES = (
+    "Explain the SIGNIFICANCE of: \"{}\"",
+    "How would you IMPLEMENT: \"{}\"?",
+    "ANALYZE the importance of: \"{}\"",
+    "DESCRIBE the process in: \"{}\"",
+)
+_FALLBACK_LAQ_TYPES = (
+    "Compare and contrast '{}' and '{}' with specific examples from the study material. Discuss their applications and practical significance.",
+    "Write a comprehensive analysis of '{}' covering its principles, applications, and importance as explained in the text. Provide detailed examples.",
+    "Evaluate the impact and relevance of '{}' in the context of the course material, supporting your analysis with specific references.",
+)
+
+def generate_enhanced_fallback_questions(content, mcq_count, saq_count, laq_count, difficulty,
+                                         content_key=None):
+    """
+    Enhanced fallback question generation with variety. With a content key
+    the selection is seeded from it, so the paper is stable per input and
+    cached.
+    """
     print("🔄 Using ENHANCED fallback question generation")
     
-    sentences, concepts = extract_meaningful_content(content)
+    if content_key is not None:
+        memo_key = (content_key, mcq_count, saq_count, laq_count, difficulty)
+        if memo_key not in _fallback_cache:
+            _fallback_cache[memo_key] = _build_fallback_questions(
+                content, mcq_count, saq_count, laq_count, content_key
+            )
+        return _fallback_cache[memo_key]
+    return _build_fallback_questions(content, mcq_count, saq_count, laq_count, None)
+
+def _build_fallback_questions(content, mcq_count, saq_count, laq_count, content_key):
+    sentences, concepts = _meaningful_content(content, content_key)
     
     if len(sentences) < 3:
         return None
     
-    questions = ""
+    parts: list[str] = []
     question_number = 1
+    rng = random.Random(content_key)
     
-    # Shuffle for variety
-    random.shuffle(sentences)
-    random.shuffle(concepts)
+    # Draw only what the paper uses; sample() also leaves the (possibly
+    # memoized) extraction result untouched
+    sentences = rng.sample(sentences, min(mcq_count + saq_count, len(sentences)))
+    concepts = rng.sample(concepts, min(laq_count + 1, len(concepts)))
     
     # Generate VARIED MCQs
     if mcq_count > 0:
-        questions += f"**SECTION A: MULTIPLE CHOICE QUESTIONS** ({mcq_count} questions - {mcq_count} marks)\n\n"
-        
-        question_types = [
-            "What is the PRIMARY purpose of: \"{}\"?",
-            "Which statement BEST summarizes: \"{}\"?", 
-            "How would you APPLY the concept: \"{}\"?",
-            "What can be INFERRED from: \"{}\"?",
-            "What is the key CHARACTERISTIC in: \"{}\"?"
-        ]
+        parts.append(f"**SECTION A: MULTIPLE CHOICE QUESTIONS** ({mcq_count} questions - {mcq_count} marks)\n\n")
         
-        option_templates = [
-            ["To achieve the main objective described", "For documentation purposes only", "As a secondary supporting function", "For entertainment value"],
-            ["As clearly explained in the material", "A common misconception", "Only partially correct", "Not covered in the text"],
-            ["In practical scenarios as outlined", "Only in theoretical frameworks", "With significant modifications", "It has no practical application"],
-            ["The logical conclusion supported by evidence", "An assumption not supported", "A contradictory viewpoint", "An irrelevant detail"],
-            ["The defining feature mentioned", "A minor attribute", "An external characteristic", "An incorrect assumption"]
-        ]
+        mcq_total = min(mcq_count, len(sentences))
+        # Select random question types and options in one draw each
+        picks = zip(sentences[:mcq_total],
+                    rng.choices(_FALLBACK_QUESTION_TYPES, k=mcq_total),
+                    rng.choices(_FALLBACK_OPTION_TEMPLATES, k=mcq_total))
         
-        for i in range(min(mcq_count, len(sentences))):
-            sentence = sentences[i]
-            clean_sentence = re.sub(r'\s+', ' ', sentence).strip()
-            
-            # Select random question type and options
-            question_template = random.choice(question_types)
-            options = random.choice(option_templates)
+        for sentence, question_template, options in picks:
+            clean_sentence = _WS_RE.sub(' ', sentence).strip()
             question = question_template.format(clean_sentence[:80])
             
-            questions += f"{question_number}. {question}\n"
+            parts.append(f"{question_number}. {question}\n")
             
             for j, option in enumerate(options):
-                questions += f"   {chr(97+j)}) {option}\n"
-            questions += "\n"
+                parts.append(f"   {chr(97+j)}) {option}\n")
+            parts.append("\n")
             question_number += 1
     
     # Generate VARIED SAQs
     if saq_count > 0:
-        questions += f"**SECTION B: SHORT ANSWER QUESTIONS** ({saq_count} questions - {saq_count * 3} marks)\n\n"
-        
-        saq_types = [
-            "Explain the SIGNIFICANCE of: \"{}\"",
-            "How would you IMPLEMENT: \"{}\"?", 
-            "ANALYZE the importance of: \"{}\"",
-            "DESCRIBE the process in: \"{}\""
-        ]
+        parts.append(f"**SECTION B: SHORT ANSWER QUESTIONS** ({saq_count} questions - {saq_count * 3} marks)\n\n")
         
         for i in range(min(saq_count, len(sentences) - mcq_count)):
             sentence = sentences[i + mcq_count]
-            clean_sentence = re.sub(r'\s+', ' ', sentence).strip()
+            clean_sentence = _WS_RE.sub(' ', sentence).strip()
             
-            saq_template = random.choice(saq_types)
+            saq_template = rng.choice(_FALLBACK_SAQ_TYPES)
             question = saq_template.format(clean_sentence[:100])
             
-            questions += f"{question_number}. {question} (3 marks)\n\n"
+            parts.append(f"{question_number}. {question} (3 marks)\n\n")
             question_number += 1
     
     # Generate MEANINGFUL LAQs
     if laq_count > 0:
-        questions += f"**SECTION C: LONG ANSWER QUESTIONS** ({laq_count} questions - {laq_count * 5} marks)\n\n"
-        
-        laq_types = [
-            "Compare and contrast '{}' and '{}' with specific examples from the study material. Discuss their applications and practical significance.",
-            "Write a comprehensive analysis of '{}' covering its principles, applications, and importance as explained in the text. Provide detailed examples.",
-            "Evaluate the impact and relevance of '{}' in the context of the course material, supporting your analysis with specific references."
-        ]
+        parts.append(f"**SECTION C: LONG ANSWER QUESTIONS** ({laq_count} questions - {laq_count * 5} marks)\n\n")
         
         for i in range(min(laq_count, len(concepts))):
             if i + 1 < len(concepts):
-                question = random.choice(laq_types).format(concepts[i], concepts[i+1])
+                question = rng.choice(_FALLBACK_LAQ_TYPES).format(concepts[i], concepts[i+1])
             else:
-                question = random.choice(laq_types).format(concepts[i])
+                question = rng.choice(_FALLBACK_LAQ_TYPES).format(concepts[i])
             
-            questions += f"{question_number}. {question} (5 marks)\n\n"
+            parts.append(f"{question_number}. {question} (5 marks)\n\n")
             question_number += 1
     
-    return questions
+    return "".join(parts)
 
 def generate_sample_questions(mcq_count, saq_count, laq_count, mcq_diff, saq_diff, laq_diff):
     """Generate sample questions as last resort"""
     print("📝 GENERATING SAMPLE QUESTIONS (LAST RESORT)")
-    questions_content = ""
+    parts: list[str] = []
     question_number = 1
     
     if mcq_count > 0:
-        questions_content += f"SECTION A: MULTIPLE CHOICE QUESTIONS ({mcq_count} questions - {mcq_count} marks)\n\n"
+        parts.append(f"SECTION A: MULTIPLE CHOICE QUESTIONS ({mcq_count} questions - {mcq_count} marks)\n\n")
         for i in range(mcq_count):
-            questions_content += f"{question_number}. Sample {mcq_diff} level MCQ question {i+1} about course content?\n"
-            questions_content += "   a) Correct answer based on material\n   b) Plausible but incorrect option\n   c) Common misconception\n   d) Unrelated concept\n\n"
+            parts.append(f"{question_number}. Sample {mcq_diff} level MCQ question {i+1} about course content?\n")
+            parts.append("   a) Correct answer based on material\n   b) Plausible but incorrect option\n   c) Common misconception\n   d) Unrelated concept\n\n")
             question_number += 1
     
     if saq_count > 0:
-        questions_content += f"SECTION B: SHORT ANSWER QUESTIONS ({saq_count} questions - {saq_count * 3} marks)\n\n"
+        parts.append(f"SECTION B: SHORT ANSWER QUESTIONS ({saq_count} questions - {saq_count * 3} marks)\n\n")
         for i in range(saq_count):
-            questions_content += f"{question_number}. Explain {saq_diff.lower()} level concept {i+1} as covered in the course material. (3 marks)\n\n"
+            parts.append(f"{question_number}. Explain {saq_diff.lower()} level concept {i+1} as covered in the course material. (3 marks)\n\n")
             question_number += 1
     
     if laq_count > 0:
-        questions_content += f"SECTION C: LONG ANSWER QUESTIONS ({laq_count} questions - {laq_count * 5} marks)\n\n"
+        parts.append(f"SECTION C: LONG ANSWER QUESTIONS ({laq_count} questions - {laq_count * 5} marks)\n\n")
         for i in range(laq_count):
-            questions_content += f"{question_number}. Write comprehensive answer on {laq_diff.lower()} level topic {i+1} demonstrating deep understanding of course concepts. (5 marks)\n\n"
+            parts.append(f"{question_number}. Write comprehensive answer on {laq_diff.lower()} level topic {i+1} demonstrating deep understanding of course concepts. (5 marks)\n\n")
             question_number += 1
     
-    return questions_content
+    return "".join(parts)
 
 # --- FIXED PDF Generation Function ---
+# Stylesheet built once at import; building it per request dominated small PDFs.
+# SimpleDocTemplate is bound to its output buffer, so that one stays per call.
+if REPORTLAB_AVAILABLE:
+    _STYLES = getSampleStyleSheet()
+    _INDENTED = ParagraphStyle('Indented', parent=_STYLES['BodyText'], leftIndent=18)
+
 def generate_pdf_content(paper_data):
     """Generate PDF content - FIXED version"""
     try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
+        if not REPORTLAB_AVAILABLE:
+            raise ImportError("reportlab is not installed")
         
         buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Title
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, height - 100, paper_data['title'])
-        
-        # Details
-        p.setFont("Helvetica", 12)
-        y_position = height - 150
+        body = _STYLES['BodyText']
         
+        # Title and details
+        story = [Paragraph(escape(paper_data['title']), _STYLES['Title']), Spacer(1, 12)]
         details = [
-            f"Subject: {paper_data.get('subject', 'General')}",
-            f"Level: {paper_data.get('level', 'Mixed')}",
-            f"Date: {paper_data.get('date', 'N/A')}",
-            f"Total Marks: {paper_data.get('total_marks', 'N/A')}",
+            f"Subject: {paper_data.get('subject') or 'General'}",
+            f"Topic: {paper_data.get('topic') or 'Various Topics'}",
+            f"Level: {paper_data.get('level') or 'Mixed'}",
+            f"Date: {paper_data.get('date') or 'N/A'}",
+            f"Total Marks: {paper_data.get('total_marks') or 'N/A'}",
         ]
-        
-        for detail in details:
-            p.drawString(100, y_position, detail)
-            y_position -= 25
-        
-        y_position -= 30
-        
-        # Questions
-        if paper_data.get('questions'):
-            p.setFont("Helvetica-Bold", 14)
-            p.drawString(100, y_position, "QUESTIONS")
-            y_position -= 40
-            p.setFont("Helvetica", 10)
-            
-            questions_text = paper_data['questions']
-            lines = questions_text.split('\n')
-            
-            for line in lines:
-                if y_position < 100:  # New page if needed
-                    p.showPage()
-                    p.setFont("Helvetica", 10)
-                    y_position = height - 100
-                
-                if line.strip():
-                    # Handle long lines by wrapping
-                    if len(line) > 90:
-                        p.drawString(100, y_position, line[:90])
-                        y_position -= 15
-                        if len(line) > 180:
-                            p.drawString(100, y_position, line[90:180])
-                            y_position -= 15
-                            p.drawString(100, y_position, line[180:])
-                        else:
-                            p.drawString(100, y_position, line[90:])
-                    else:
-                        p.drawString(100, y_position, line)
-                    y_position -= 15
-        
-        p.save()
+        story.extend(Paragraph(escape(detail), body) for detail in details)
+        story.append(Spacer(1, 24))
+        
+        # Questions; Platypus wraps long lines and paginates
+        questions = paper_data.get('questions') or paper_data.get('content')
+        if questions:
+            story.append(Paragraph("QUESTIONS", _STYLES['Heading2']))
+            for line in questions.split('\n'):
+                if not line.strip():
+                    story.append(Spacer(1, 6))
+                    continue
+                style = _INDENTED if line[0].isspace() else body
+                story.append(Paragraph(escape(line.strip()), style))
+        
+        SimpleDocTemplate(buffer, pagesize=A4, title=paper_data['title']).build(story)
         buffer.seek(0)
         return buffer
         
@@ -493,7 +710,9 @@ async def generate_paper(
     saqDifficulty: str = Form(...),
     laqCount: int = Form(...),
     laqDifficulty: str = Form(...),
-    files: list[UploadFile] = File(...)
+    files: list[UploadFile] = File(...),
+    stream: str = Form("false"),
+    includePdf: str = Form("false")
 ):
     print("=== UNIFIED PAPER GENERATION STARTED ===")
     print(f"Paper Heading: {paperHeading}")
@@ -504,6 +723,8 @@ async def generate_paper(
     includeRollNumber = includeRollNumber.lower() in ("true", "1", "yes")
     includeName = includeName.lower() in ("true", "1", "yes")
     includeClassSection = includeClassSection.lower() in ("true", "1", "yes")
+    stream = stream.lower() in ("true", "1", "yes")
+    includePdf = includePdf.lower() in ("true", "1", "yes")
 
     # Validations
     if totalMarks < 5 or totalMarks > 1000:
@@ -515,113 +736,212 @@ async def generate_paper(
     if len(files) == 0:
         raise HTTPException(status_code=400, detail="At least one file must be uploaded.")
 
-    # Save files
-    saved_files = []
-    for file in files:
-        file_path = UPLOAD_DIR / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        saved_files.append(str(file_path))
-        print(f"💾 Saved file: {file_path}")
+    if len(files) > MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FILES} files can be uploaded.")
+
+    # Save files concurrently, hashing content on the way for the extraction cache.
+    # Each upload gets its own path so same-named files never share one on disk.
+    file_paths = [UPLOAD_DIR / f"{uuid.uuid4().hex}{Path(file.filename).suffix}" for file in files]
+    try:
+        digests = await asyncio.gather(*[
+            save_upload(file, file_path) for file, file_path in zip(files, file_paths)
+        ])
+        saved_files = [(str(file_path), digest) for file_path, digest in zip(file_paths, digests)]
+        for file, file_path in zip(files, file_paths):
+            print(f"💾 Saved file: {file.filename} -> {file_path}")
+
+        print("=== CONTENT EXTRACTION ===")
+        # Extract all files concurrently; gather keeps results in upload order
+        extracted = await asyncio.gather(*[
+            extract_pages_cached(file_path, digest) for file_path, digest in saved_files
+        ])
+    finally:
+        # Extracted pages live in the cache now; the raw uploads are no longer needed
+        await asyncio.gather(*[asyncio.to_thread(discard_upload, file_path) for file_path in file_paths])
 
     # --- Enhanced Content Extraction ---
-    all_extracted_content = ""
+    # Page texts from every file with usable content; kept as a list so the
+    # sentence pipeline can stream through pages instead of one giant string
+    all_extracted_pages = []
+    total_content_length = 0
     extracted_file_count = 0
     
-    print("=== CONTENT EXTRACTION ===")
-    for file_path in saved_files:
-        print(f"🔍 Processing: {file_path}")
-        extracted_text = extract_text_from_file_enhanced(file_path)
-        print(f"📊 Extraction result: {len(extracted_text)} chars")
+    content_digests = []
+    for file, (file_path, digest), pages in zip(files, saved_files, extracted):
+        print(f"🔍 Processed: {file.filename}")
+        page_chars = sum(map(len, pages))
+        print(f"📊 Extraction result: {page_chars} chars")
         
         # Enhanced content validation
-        if (extracted_text and 
-            len(extracted_text.strip()) > 200 and
-            "Error:" not in extracted_text and
-            "not found" not in extracted_text.lower() and
-            "unsupported" not in extracted_text.lower() and
-            "no text" not in extracted_text.lower()):
-            
-            all_extracted_content += f"\n{extracted_text}"
+        if page_chars > 200:
+            all_extracted_pages.extend(pages)
+            total_content_length += page_chars
             extracted_file_count += 1
+            content_digests.append(digest)
             print(f"✅ Meaningful content extracted")
         else:
             print(f"❌ No meaningful content")
-            if extracted_text:
-                print(f"   Reason: {extracted_text[:200]}...")
 
-    print(f"📈 Total content length: {len(all_extracted_content)}")
+    print(f"📈 Total content length: {total_content_length}")
     print(f"📈 Files with content: {extracted_file_count}")
 
     # --- UNIFIED Question Generation ---
     questions_content = None
     service_used = False
+    content_key = None
+    chunks = []
+    counts = (mcqCount, saqCount, laqCount)
+    difficulties = (mcqDifficulty, saqDifficulty, laqDifficulty)
     
-    if extracted_file_count > 0 and len(all_extracted_content.strip()) > 200:
+    if extracted_file_count > 0 and total_content_length > 200:
+        content_key = content_key_for(content_digests)
         # Prepare chunks for question generation
-        chunks = prepare_chunks_for_gemini(all_extracted_content)
-        
-        if chunks:
-            print("🚀 ATTEMPTING UNIFIED SERVICE QUESTION GENERATION")
-            # Try unified service first
-            questions_content = generate_questions_with_service(
-                chunks, mcqCount, saqCount, laqCount, mcqDifficulty, paperHeading
-            )
-            
-            if questions_content:
-                service_used = True
-                print("🎉 SUCCESS: Unified service questions generated!")
+        chunks = prepare_chunks_for_gemini(all_extracted_pages, content_key)
+    
+    if stream and chunks:
+        print("📡 STREAMING UNIFIED SERVICE QUESTION GENERATION")
+        return StreamingResponse(
+            _paper_event_stream(chunks, all_extracted_pages, content_key, paperHeading,
+                                totalMarks, counts, difficulties, extracted_file_count),
+            media_type="text/event-stream",
+        )
+    
+    if chunks:
+        print("🚀 ATTEMPTING UNIFIED SERVICE QUESTION GENERATION")
+        # Try unified service first
+        questions_content = await generate_questions_with_service(
+            chunks, mcqCount, saqCount, laqCount, mcqDifficulty, paperHeading
+        )
         
-        # Enhanced fallback generation
-        if not questions_content:
-            print("🔄 Unified service failed, using ENHANCED fallback generation")
-            questions_content = generate_enhanced_fallback_questions(
-                all_extracted_content, mcqCount, saqCount, laqCount, mcqDifficulty
-            )
-            if questions_content:
-                print("✅ Enhanced fallback questions generated")
+        if questions_content:
+            service_used = True
+            print("🎉 SUCCESS: Unified service questions generated!")
+    
+    if not questions_content:
+        questions_content = _fallback_questions_content(
+            all_extracted_pages if content_key else None, content_key, counts, difficulties
+        )
+
+    paper_data, response_data = _store_generated_paper(
+        paperHeading, totalMarks, counts, mcqDifficulty, questions_content,
+        extracted_file_count, service_used
+    )
+
+    print(f"=== PAPER GENERATION COMPLETED ===")
+    print(f"🤖 Service Used: {service_used}")
+    print(f"📚 Content-based: {extracted_file_count > 0}")
+    result = {
+        "message": "Paper generated successfully!", 
+        "paper": response_data,
+        "saved_as_latest": True
+    }
+    if includePdf:
+        # The PDF of the paper just built, so clients need not fetch
+        # /latest-paper and post it back to /download-paper
+        pdf_buffer = await asyncio.to_thread(generate_pdf_content, paper_data)
+        result["pdf_b64"] = base64.b64encode(pdf_buffer.getvalue()).decode()
+    return JSONResponse(result)
+
+def _fallback_questions_content(pages, content_key, counts, difficulties):
+    """Enhanced fallback when there is extracted content, sample questions otherwise"""
+    mcq_count, saq_count, laq_count = counts
+    questions_content = None
+    
+    # Enhanced fallback generation
+    if pages:
+        print("🔄 Unified service failed, using ENHANCED fallback generation")
+        questions_content = generate_enhanced_fallback_questions(
+            pages, mcq_count, saq_count, laq_count, difficulties[0],
+            content_key=content_key
+        )
+        if questions_content:
+            print("✅ Enhanced fallback questions generated")
     
     # Final fallback to samples
     if not questions_content:
         print("❌ All generation failed, using sample questions")
-        questions_content = generate_sample_questions(mcqCount, saqCount, laqCount, mcqDifficulty, saqDifficulty, laqDifficulty)
+        questions_content = generate_sample_questions(mcq_count, saq_count, laq_count, *difficulties)
+    return questions_content
 
-    # Create paper
+def _store_generated_paper(heading, total_marks, counts, level, questions_content,
+                           extracted_file_count, service_used):
+    """Save the paper as the latest one; returns (paper data, response summary)"""
+    mcq_count, saq_count, laq_count = counts
     paper_data = {
         "id": int(datetime.now().timestamp()),
-        "title": paperHeading,
-        "level": mcqDifficulty,
+        "title": heading,
+        "level": level,
         "date": datetime.now().strftime("%Y-%m-%d"),
-        "content": f"Paper: {paperHeading}",
+        "content": f"Paper: {heading}",
         "subject": "Generated Paper",
         "topic": "Custom Exam Paper",
         "questions": questions_content.strip(),
-        "total_marks": totalMarks,
-        "mcq_count": mcqCount,
-        "saq_count": saqCount,
-        "laq_count": laqCount,
+        "total_marks": total_marks,
+        "mcq_count": mcq_count,
+        "saq_count": saq_count,
+        "laq_count": laq_count,
         "content_based": extracted_file_count > 0,
         "service_used": service_used
     }
     
     set_latest_paper_storage(paper_data)
 
-    response_data = {
-        "paperHeading": paperHeading,
-        "totalMarks": totalMarks,
+    return paper_data, {
+        "paperHeading": heading,
+        "totalMarks": total_marks,
         "content_based": extracted_file_count > 0,
         "service_used": service_used,
         "extracted_content_files": extracted_file_count
     }
 
-    print(f"=== PAPER GENERATION COMPLETED ===")
-    print(f"🤖 Service Used: {service_used}")
-    print(f"📚 Content-based: {extracted_file_count > 0}")
-    return JSONResponse({
-        "message": "Paper generated successfully!", 
-        "paper": response_data,
-        "saved_as_latest": True
-    })
+_STREAM_END = object()
+
+async def _iterate_in_thread(iterator):
+    """Drive a blocking iterator from worker threads, one item per hop"""
+    while (item := await asyncio.to_thread(next, iterator, _STREAM_END)) is not _STREAM_END:
+        yield item
+
+def _sse(event):
+    return f"data: {json.dumps(event)}\n\n"
+
+async def _paper_event_stream(chunks, pages, content_key, heading, total_marks,
+                              counts, difficulties, extracted_file_count):
+    """
+    Server-sent events for a streamed paper: one event per generated question,
+    a fallback event carrying the full text if the service produced nothing,
+    and a final done event with the same summary /generate-paper returns
+    """
+    mcq_count, saq_count, laq_count = counts
+    sections = {"A": [], "B": [], "C": []}
+    events = exam_service.stream_exam_from_chunks(
+        chunks=chunks,
+        query=heading,
+        mcq_count=mcq_count,
+        short_count=saq_count,
+        long_count=laq_count
+    )
+    async for event in _iterate_in_thread(events):
+        if "question" in event:
+            sections[event["section"]].append(event["question"])
+        yield _sse(event)
+    
+    service_used = any(sections.values())
+    if service_used:
+        questions_content = format_exam_questions({
+            "Section A: Multiple Choice Questions": {"questions": sections["A"]},
+            "Section B: Short Answer Questions": {"questions": sections["B"]},
+            "Section C: Long Answer Questions": {"questions": sections["C"]},
+        })
+    else:
+        questions_content = _fallback_questions_content(pages, content_key, counts, difficulties)
+        yield _sse({"fallback": True, "questions": questions_content})
+    
+    _, response_data = _store_generated_paper(
+        heading, total_marks, counts, difficulties[0], questions_content,
+        extracted_file_count, service_used
+    )
+    logger.info("Streamed paper generation completed")
+    yield _sse({"done": True, "paper": response_data, "saved_as_latest": True})
 
 # Keep other endpoints the same...
 @router.get("/latest-paper")
@@ -636,16 +956,16 @@ async def download_paper(paper_request: DownloadPaperRequest):
     try:
         paper_data = paper_request.dict()
         
-        # Generate PDF using FIXED function
-        pdf_buffer = generate_pdf_content(paper_data)
+        # Layout is CPU-bound; keep it off the event loop
+        pdf_buffer = await asyncio.to_thread(generate_pdf_content, paper_data)
         
         # Return PDF file
-        filename = f"{paper_data['title'].replace(' ', '_')}.pdf"
+        filename = paper_data['title'].replace(' ', '_').replace('"', "'") or "paper"
         
         return StreamingResponse(
             pdf_buffer,
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            headers={"Content-Disposition": f'attachment; filename="{filename}.pdf"'}
         )
         
     except Exception as e:
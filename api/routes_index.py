@@ -2,12 +2,27 @@ from fastapi import APIRouter, UploadFile, Form
 from chunker.chunker import split_text_to_chunks
 from chunker.embedder import embed_chunks
 from qdrant.indexer import upsert_chunks
+from qdrant import query_cache
 from qdrant.schema import create_collection
+import aiofiles
+import asyncio
+import hashlib
 import fitz
 import os
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Chunk counts of documents already indexed, keyed by (sha256, doc_id).
+# Lives in-process alongside the in-memory Qdrant client, so it never
+# claims a document is indexed after a restart has wiped the collection.
+_indexed_docs: dict[tuple[str, str], int] = {}
+
+@router.on_event("startup")
+def _ensure_collection():
+    create_collection()
+
 # PDF text extraction
 def extract_text(pdf_path):
     doc = fitz.open(pdf_path)
@@ -16,25 +31,42 @@ def extract_text(pdf_path):
         text += page.get_text()
     return text
 
+def _index_file(path, doc_id):
+    text = extract_text(path)
+    chunks = split_text_to_chunks(text)
+    embeddings = embed_chunks(chunks)
+    upsert_chunks(chunks, embeddings, doc_id)
+    return len(chunks)
+
 @router.post("/add-document")
 async def add_document(file: UploadFile, doc_id: str = Form(...)):
     temp_path = f"temp_{file.filename}"
 
-    # save temp file
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
+    # save temp file, hashing on the way to skip re-indexing identical uploads
+    digest = hashlib.sha256()
+    async with aiofiles.open(temp_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            await f.write(chunk)
 
     try:
-        text = extract_text(temp_path)
-        chunks = split_text_to_chunks(text)
-        embeddings = embed_chunks(chunks)
+        key = (digest.hexdigest(), doc_id)
+        if key in _indexed_docs:
+            return {
+                "doc_id": doc_id,
+                "chunks": _indexed_docs[key],
+                "cached": True,
+            }
 
-        create_collection()
-        upsert_chunks(chunks, embeddings, doc_id)
+        # Extraction, embedding and upsert are blocking; keep them off the loop
+        chunk_count = await asyncio.to_thread(_index_file, temp_path, doc_id)
+        _indexed_docs[key] = chunk_count
+        # Cached search results no longer reflect the collection
+        query_cache.invalidate()
 
         return {
             "doc_id": doc_id,
-            "chunks": len(chunks),
+            "chunks": chunk_count,
         }
     finally:
         os.remove(temp_path)
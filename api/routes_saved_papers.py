@@ -4,19 +4,99 @@ from fastapi.responses import JSONResponse, FileResponse
 from typing import List, Optional
 from pydantic import BaseModel
 from pathlib import Path
-import json
+import asyncio
+import sqlite3
 import uuid
-from datetime import datetime
+import aiofiles
+import aiofiles.os
+import orjson
 
 router = APIRouter()
 
 SAVE_FILE = Path("saved_papers.json")
+PAPERS_DB = Path("papers.db")
 GENERATED_PAPER_FILE = Path("latest_generated_paper.json")
 
 # Ensure files exist
-SAVE_FILE.touch(exist_ok=True)
 GENERATED_PAPER_FILE.touch(exist_ok=True)
 
+# One lock per file serializes read-modify-write cycles; writes go through a
+# temp file and os.replace, so readers never see a half-written file and
+# don't need the lock
+_file_locks: dict = {}
+
+def _lock_for(path: Path) -> asyncio.Lock:
+    return _file_locks.setdefault(path, asyncio.Lock())
+
+async def _write_json(path: Path, data):
+    tmp_path = path.with_name(path.name + ".tmp")
+    async with aiofiles.open(tmp_path, "wb") as f:
+        await f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    await aiofiles.os.replace(tmp_path, path)
+
+# --- Saved papers store ---
+# Papers live in SQLite, one row each, so saving or deleting is a single
+# statement instead of rewriting the whole JSON file. Every read goes to the
+# database, so all workers see each other's saves and deletes.
+PAPER_COLUMNS = ("id", "title", "level", "date", "content", "subject", "topic", "questions")
+
+def _open_papers_db():
+    conn = sqlite3.connect(PAPERS_DB, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS papers("
+        "id INTEGER PRIMARY KEY, title TEXT, level TEXT, date TEXT, "
+        "content TEXT, subject TEXT, topic TEXT, questions TEXT)"
+    )
+    return conn
+
+_INSERT_PAPER = f"INSERT INTO papers VALUES ({', '.join('?' * len(PAPER_COLUMNS))})"
+
+# PRAGMA user_version of a database whose legacy saved_papers.json import is done
+LEGACY_IMPORTED_VERSION = 1
+
+def _import_legacy_papers(conn):
+    """
+    Copy papers saved before the SQLite store existed, once per database.
+    user_version records that the import ran, so papers deleted afterwards
+    stay deleted; a store that already holds papers is only marked.
+    """
+    # IMMEDIATE takes the write lock up front, so workers starting together
+    # run the import one at a time and later ones see the marker
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < LEGACY_IMPORTED_VERSION:
+            empty = conn.execute("SELECT 1 FROM papers LIMIT 1").fetchone() is None
+            if empty and SAVE_FILE.exists():
+                try:
+                    legacy = orjson.loads(SAVE_FILE.read_bytes() or b"[]")
+                except orjson.JSONDecodeError:
+                    legacy = []
+                conn.executemany(
+                    _INSERT_PAPER.replace("INSERT", "INSERT OR IGNORE", 1),
+                    [tuple(paper.get(col) for col in PAPER_COLUMNS)
+                     for paper in legacy if paper.get("id") is not None]
+                )
+            conn.execute(f"PRAGMA user_version = {LEGACY_IMPORTED_VERSION}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+_SELECT_PAPERS = f"SELECT {', '.join(PAPER_COLUMNS)} FROM papers"
+
+def _list_papers(conn):
+    rows = conn.execute(f"{_SELECT_PAPERS} ORDER BY rowid").fetchall()
+    return [dict(zip(PAPER_COLUMNS, row)) for row in rows]
+
+def _get_paper(conn, paper_id):
+    row = conn.execute(f"{_SELECT_PAPERS} WHERE id = ?", (paper_id,)).fetchone()
+    return dict(zip(PAPER_COLUMNS, row)) if row else None
+
+_papers_db = _open_papers_db()
+_import_legacy_papers(_papers_db)
+
 # Extended Pydantic Model with content support
 class Paper(BaseModel):
     id: int
@@ -41,92 +121,34 @@ class GeneratedPaper(BaseModel):
 # --- Get all saved papers ---
 @router.get("/saved-papers", response_model=List[Paper])
 async def get_saved_papers():
-    with open(SAVE_FILE, "r") as f:
-        try:
-            data = json.load(f)
-        except:
-            data = []
-    return data
+    return _list_papers(_papers_db)
 
 # --- Save new paper ---
 @router.post("/saved-papers")
 async def save_paper(paper: Paper):
-    with open(SAVE_FILE, "r+") as f:
-        try:
-            data = json.load(f)
-        except:
-            data = []
-        
-        # Check if paper with same ID already exists
-        paper_exists = any(p.get('id') == paper.id for p in data)
-        if paper_exists:
-            raise HTTPException(status_code=400, detail="Paper with this ID already exists")
-        
-        data.append(paper.dict())
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
+    record = paper.dict()
+    # The primary key decides duplicates, whichever worker saved the first copy
+    try:
+        _papers_db.execute(_INSERT_PAPER, tuple(record[col] for col in PAPER_COLUMNS))
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=400, detail="Paper with this ID already exists")
     
     return JSONResponse({"message": "Paper saved successfully!"})
 
-# --- Get latest generated paper ---
-@router.get("/latest-paper")
-async def get_latest_paper():
-    try:
-        with open(GENERATED_PAPER_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                if data:
-                    return data
-                else:
-                    raise HTTPException(status_code=404, detail="No generated paper found")
-            except json.JSONDecodeError:
-                raise HTTPException(status_code=404, detail="No generated paper found")
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="No generated paper found")
-
 # --- Save generated paper (for when paper is generated) ---
 @router.post("/save-generated-paper")
 async def save_generated_paper(paper: GeneratedPaper):
     try:
-        with open(GENERATED_PAPER_FILE, "w") as f:
-            json.dump(paper.dict(), f, indent=4)
+        async with _lock_for(GENERATED_PAPER_FILE):
+            await _write_json(GENERATED_PAPER_FILE, paper.dict())
         return JSONResponse({"message": "Generated paper saved successfully!"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save generated paper: {str(e)}")
 
-# --- Download paper as PDF (placeholder - returns JSON for now) ---
-@router.post("/download-paper")
-async def download_paper(paper: Paper):
-    try:
-        # For now, we'll return a JSON response since PDF generation requires additional libraries
-        # In production, you would use libraries like reportlab, weasyprint, or pdfkit
-        return JSONResponse({
-            "message": "PDF download functionality",
-            "paper": paper.dict(),
-            "note": "PDF generation would be implemented here with libraries like reportlab or weasyprint"
-        })
-        
-        # Example of actual PDF implementation (commented out):
-        # pdf_content = generate_pdf(paper.dict())
-        # return Response(
-        #     content=pdf_content,
-        #     media_type="application/pdf",
-        #     headers={"Content-Disposition": f"attachment; filename={paper.title}.pdf"}
-        # )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
-
 # --- Get specific paper by ID ---
 @router.get("/paper/{paper_id}")
 async def get_paper_by_id(paper_id: int):
-    with open(SAVE_FILE, "r") as f:
-        try:
-            data = json.load(f)
-        except:
-            data = []
-    
-    paper = next((p for p in data if p.get('id') == paper_id), None)
+    paper = _get_paper(_papers_db, paper_id)
     if paper is None:
         raise HTTPException(status_code=404, detail="Paper not found")
     
@@ -135,51 +157,8 @@ async def get_paper_by_id(paper_id: int):
 # --- Delete paper by ID ---
 @router.delete("/paper/{paper_id}")
 async def delete_paper(paper_id: int):
-    with open(SAVE_FILE, "r+") as f:
-        try:
-            data = json.load(f)
-        except:
-            data = []
-        
-        initial_length = len(data)
-        data = [p for p in data if p.get('id') != paper_id]
-        
-        if len(data) == initial_length:
-            raise HTTPException(status_code=404, detail="Paper not found")
-        
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
+    deleted = _papers_db.execute("DELETE FROM papers WHERE id = ?", (paper_id,)).rowcount
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Paper not found")
     
     return JSONResponse({"message": "Paper deleted successfully!"})
-
-# --- Update the generate-paper endpoint to also save as latest generated paper ---
-@router.post("/generate-paper")
-async def generate_paper_endpoint(paper_data: dict):
-    try:
-        # Your existing paper generation logic here
-        # ...
-        
-        # Create a paper object from the generated data
-        generated_paper = GeneratedPaper(
-            id=paper_data.get('id', int(datetime.now().timestamp())),
-            title=paper_data.get('paperHeading', 'Generated Paper'),
-            level=paper_data.get('difficulty', 'Mixed'),
-            date=datetime.now().strftime("%Y-%m-%d"),
-            content=paper_data.get('content', ''),
-            subject=paper_data.get('subject', 'General'),
-            topic=paper_data.get('topic', 'Various Topics'),
-            questions=paper_data.get('questions', '')
-        )
-        
-        # Save as latest generated paper
-        with open(GENERATED_PAPER_FILE, "w") as f:
-            json.dump(generated_paper.dict(), f, indent=4)
-        
-        return JSONResponse({
-            "message": "Paper generated successfully!",
-            "paper": generated_paper.dict()
-        })
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate paper: {str(e)}")
\ No newline at end of file
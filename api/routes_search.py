@@ -1,36 +1,49 @@
 # routes_search.py
 from fastapi import APIRouter
-from chunker.embedder import embed_chunks
+import asyncio
+from chunker.embedder import EMBED_EXECUTOR
+from qdrant import query_cache
 from qdrant.client import get_client
-from qdrant.schema import COLLECTION, create_collection
+from qdrant.schema import COLLECTION, SEARCH_PARAMS
 from qdrant_client.models import VectorParams, Distance
 
 router = APIRouter()
 
 @router.get("/query")
-def semantic_search(query: str, top_k: int = 5):
-    client = get_client()
+async def semantic_search(query: str, top_k: int = 5):
+    # Encoding is CPU-bound and Qdrant calls block; keep both off the loop
+    loop = asyncio.get_running_loop()
+    query_vec = await loop.run_in_executor(EMBED_EXECUTOR, query_cache.embed_query, query)
+    return await asyncio.to_thread(_search, query, query_vec, top_k)
 
-    # Ensure collection exists
-    create_collection()
+def _search(query, query_vec, top_k):
+    client = get_client()
 
-    query_vec = embed_chunks([query])[0]
+    cached = query_cache.lookup(query_vec, top_k)
+    if cached is not None:
+        return {
+            "query": query,
+            "matches": cached
+        }
 
     results = client.query_points(
         collection_name=COLLECTION,
         query=query_vec,
-        limit=top_k
+        limit=top_k,
+        search_params=SEARCH_PARAMS,
+        with_payload=["chunk_text", "doc_id"],
+        with_vectors=False
     )
 
-    # Unpack tuples returned by Qdrant
     matches = [
         {
-            "score": score,
+            "score": point.score,
             "text": point.payload.get("chunk_text"),
             "doc_id": point.payload.get("doc_id")
         }
-        for point, score in results
+        for point in results.points
     ]
+    query_cache.store(query_vec, top_k, matches)
 
     return {
         "query": query,
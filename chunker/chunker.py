@@ -1,16 +1,22 @@
-def split_text_to_chunks(text, max_tokens=512):
+def split_text_to_chunks(text, max_tokens=512, stride=None):
     """
-    Split text into chunks by paragraphs and token limits.
+    Split text into overlapping windows of at most `max_tokens` words.
+    Consecutive windows start `stride` words apart (default 3/4 of the
+    window), so text near a boundary appears whole in at least one chunk.
+    The last window always reaches the end of the text.
     """
-    # Split text by paragraph
-    paragraphs = text.split("\n\n")
-    chunks = []
+    words = text.split()
+    if not words:
+        return []
 
-    for para in paragraphs:
-        words = para.split()
-        # Split paragraph into token-limited chunks
-        for i in range(0, len(words), max_tokens):
-            chunk = " ".join(words[i:i+max_tokens])
-            chunks.append(chunk)
+    if stride is None:
+        stride = max(1, (max_tokens * 3) // 4)
 
-    return chunks
+    # ceil((N - K) / S) + 1 windows cover all N words
+    overflow = max(0, len(words) - max_tokens)
+    window_count = -(-overflow // stride) + 1
+
+    return [
+        " ".join(words[i * stride:i * stride + max_tokens])
+        for i in range(window_count)
+    ]
@@ -1,24 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
 import numpy as np
 
 # Set embedding dimension to match Qdrant collection
 EMBED_DIM = 384  # Must match the dimension used in create_collection()
 
+# all-MiniLM-L6-v2 produces EMBED_DIM-sized vectors
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = 1024
+# Padded-token budget per forward pass for smart batching in embed_chunks
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", 8192))
+
+# Encodes from async endpoints run here; torch releases the GIL inside the
+# forward pass, so a few threads encode concurrent requests in parallel
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", min(4, os.cpu_count() or 1)))
+EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
+
 # Dummy model for testing without sentence-transformers
 class DummyModel:
-    def encode(self, chunks):
+    def encode(self, chunks, normalize_embeddings=False, **kwargs):
         """
-        Return a random vector for each chunk.
-        Each vector has EMBED_DIM floats.
+        Return a deterministic pseudo-random vector for each chunk: EMBED_DIM
+        SHAKE-256 bytes read as int8 and scaled to [-1, 1], or to unit length
+        with normalize_embeddings. Identical text always maps to the same
+        vector, so caches keyed on it stay valid.
         """
-        return [np.random.rand(EMBED_DIM).tolist() for _ in chunks]
+        digests = b"".join(hashlib.shake_256(c.encode()).digest(EMBED_DIM) for c in chunks)
+        lanes = np.frombuffer(digests, dtype=np.int8).reshape(len(chunks), EMBED_DIM)
+        vectors = lanes.astype(np.float32) / 127.0
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+# "torch" (default), or "onnx" / "openvino" to run the exported model through
+# ONNX Runtime / OpenVINO (needs sentence-transformers>=3.2 and optimum)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+
+def _load_model():
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        if EMBED_BACKEND == "torch":
+            model = SentenceTransformer(EMBED_MODEL, device=device)
+            # FP16 roughly doubles GPU encode throughput; outputs are
+            # normalized float32 either way
+            return model.half() if device == "cuda" else model
+        return SentenceTransformer(EMBED_MODEL, device=device, backend=EMBED_BACKEND)
+    except Exception as e:
+        print(f"SentenceTransformer unavailable ({e}), using hash embeddings")
+        return DummyModel()
+
+# Loaded once per process
+model = _load_model()
+# Hash vectors are only equal for equal text; similarity between them means nothing
+HASH_EMBEDDINGS = isinstance(model, DummyModel)
 
-# Use dummy model
-model = DummyModel()
+def _encode(texts):
+    embeddings = model.encode(
+        texts,
+        batch_size=EMBED_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(embeddings, dtype=np.float32)
 
-def embed_chunks(chunks):
+def _token_batches(lengths, target_tokens):
     """
-    Generate vector embeddings for a list of text chunks.
-    Works without the sentence-transformers package.
+    Group indices, shortest first, into batches whose padded size
+    (count x longest member) stays within target_tokens
     """
-    embeddings = model.encode(chunks)
-    return embeddings
+    batches = []
+    current, current_max = [], 0
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        longest = max(current_max, lengths[i])
+        if current and (len(current) + 1) * longest > target_tokens:
+            batches.append(current)
+            current, longest = [], lengths[i]
+        current.append(i)
+        current_max = longest
+    if current:
+        batches.append(current)
+    return batches
+
+def embed_chunks(chunks, target_tokens=EMBED_BATCH_TOKENS):
+    """
+    Generate vector embeddings for a list of text chunks. Returns a float32
+    array of shape (len(chunks), EMBED_DIM) in input order.
+    With a real model, chunks are length-sorted into batches of about
+    target_tokens padded tokens, so short chunks are not padded out to the
+    longest one in the request. Works without the sentence-transformers package.
+    """
+    if not chunks:
+        return np.empty((0, EMBED_DIM), dtype=np.float32)
+    chunks = list(chunks)
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None or len(chunks) == 1:
+        return _encode(chunks)
+
+    # The model truncates at max_seq_length, so longer inputs cost no more
+    max_len = getattr(model, "max_seq_length", None) or 512
+    token_ids = tokenizer(chunks, add_special_tokens=True, truncation=False)["input_ids"]
+    lengths = [min(len(ids), max_len) for ids in token_ids]
+
+    out = np.empty((len(chunks), EMBED_DIM), dtype=np.float32)
+    for batch in _token_batches(lengths, target_tokens):
+        out[batch] = _encode([chunks[i] for i in batch])
+    return out
@@ -1,10 +1,14 @@
 # main.py
 import os
 import sys
+import logging
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+# Configure root logger once; set LOG_LEVEL=DEBUG for per-request detail
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
 # Add services to path
 sys.path.append(str(Path(__file__).parent / "services"))
 
@@ -14,6 +18,7 @@ from api.routes_index import router as index_router
 from api.routes_auth import router as auth_router
 from api.routes_generate_paper import router as generate_paper_router
 from api.routes_saved_papers import router as saved_papers
+from qdrant.client import close_client
 
 # Import exam generation router
 try:
@@ -57,6 +62,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+def shutdown_event():
+    close_client()
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "exam_generation": EXAM_GEN_AVAILABLE}
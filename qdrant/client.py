@@ -1,7 +1,30 @@
+from functools import lru_cache
+import os
+
 from qdrant_client import QdrantClient
 
-# In-memory Qdrant (no Docker needed)
-client = QdrantClient(":memory:")
+# QDRANT_URL: shared Qdrant server (required for multiple workers)
+# QDRANT_PATH: embedded Qdrant persisted to a local directory
+# neither: in-memory Qdrant (no Docker needed, lost on restart)
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_PATH = os.getenv("QDRANT_PATH")
 
+@lru_cache(maxsize=1)
 def get_client():
-    return client
+    """Process-wide Qdrant client, created on first use"""
+    if QDRANT_URL:
+        return QdrantClient(
+            url=QDRANT_URL,
+            api_key=os.getenv("QDRANT_API_KEY"),
+            prefer_grpc=True,
+            timeout=10
+        )
+    if QDRANT_PATH:
+        return QdrantClient(path=QDRANT_PATH)
+    return QdrantClient(":memory:")
+
+def close_client():
+    """Close the shared client, if one was created"""
+    if get_client.cache_info().currsize:
+        get_client().close()
+        get_client.cache_clear()
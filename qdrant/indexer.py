@@ -1,25 +1,44 @@
 from qdrant.client import get_client
-from qdrant_client.models import PointStruct
-import uuid
+from qdrant.schema import COLLECTION
+import hashlib
+import numpy as np
+
+UPSERT_BATCH_SIZE = 256
+# parallel > 1 makes qdrant-client fork worker processes, each with its own
+# connection; for one document's chunks that costs more than it saves and it
+# doesn't work with a local-mode client
+UPSERT_PARALLEL = 1
+
+def point_id(doc_id, chunk_id):
+    """
+    Deterministic unsigned 64-bit point ID for a chunk of a document, so
+    re-indexing a document overwrites its points instead of duplicating them
+    """
+    digest = hashlib.blake2b(f"{doc_id}:{chunk_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
 
 def upsert_chunks(chunks, embeddings, doc_id="doc_1"):
     """
     Insert chunks and embeddings into Qdrant collection.
+    `embeddings` is an (N, dim) float32 array (or anything np.asarray accepts);
+    it is uploaded in batches straight from the array buffer.
+    Returns the number of points written.
     """
     client = get_client()
-    points = []
-
-    for i, (chunk, vector) in enumerate(zip(chunks, embeddings)):
-        points.append(
-            PointStruct(
-                id=str(uuid.uuid4()),  # Valid UUID for each point
-                vector=vector,
-                payload={
-                    "doc_id": doc_id,
-                    "chunk_text": chunk,
-                    "chunk_id": i
-                }
-            )
-        )
+    vectors = np.asarray(embeddings, dtype=np.float32)
 
-    client.upsert(collection_name="doc_chunks", points=points)
+    client.upload_collection(
+        collection_name=COLLECTION,
+        vectors=vectors,
+        payload=(
+            {"doc_id": doc_id, "chunk_text": chunk, "chunk_id": i}
+            for i, chunk in enumerate(chunks)
+        ),
+        ids=(point_id(doc_id, i) for i in range(len(chunks))),
+        batch_size=UPSERT_BATCH_SIZE,
+        parallel=UPSERT_PARALLEL,
+        # Return only once the points are searchable, so a search right after
+        # indexing (and the query cache invalidated by it) sees the new chunks
+        wait=True,
+    )
+    return len(chunks)
@@ -0,0 +1,118 @@
+from collections import deque
+from functools import lru_cache
+import re
+import threading
+import uuid
+
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import (
+    Distance, FieldCondition, Filter, MatchValue, PointIdsList, PointStruct, VectorParams
+)
+
+from chunker.embedder import EMBED_DIM, embed_chunks
+from qdrant.client import get_client
+
+# Search results of recent queries, looked up by embedding similarity so
+# rephrasings of a cached query skip the doc_chunks search
+CACHE_COLLECTION = "query_cache"
+SIMILARITY_THRESHOLD = 0.97
+MAX_CACHED_QUERIES = 1024
+
+_WS_RE = re.compile(r"\s+")
+# lookup/store run in worker threads; _lock guards the two globals below
+_lock = threading.Lock()
+_cached_ids = deque()
+_collection_ready = False
+
+def normalize_query(query: str) -> str:
+    return _WS_RE.sub(" ", query).strip().lower()
+
+@lru_cache(maxsize=4096)
+def _embed_normalized(normalized: str):
+    return embed_chunks([normalized])[0]
+
+def embed_query(query: str):
+    """Embedding of a query, computed once per normalized query string"""
+    return _embed_normalized(normalize_query(query))
+
+def _ensure_collection(client):
+    global _collection_ready
+    with _lock:
+        if not _collection_ready:
+            if not client.collection_exists(CACHE_COLLECTION):
+                client.create_collection(
+                    collection_name=CACHE_COLLECTION,
+                    vectors_config=VectorParams(size=EMBED_DIM, distance=Distance.COSINE)
+                )
+            _collection_ready = True
+
+def _is_missing_collection(exc) -> bool:
+    # The server answers 404; local mode raises ValueError
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code == 404
+    return isinstance(exc, ValueError)
+
+def _forget_collection():
+    """The collection vanished (e.g. a concurrent invalidate); recreate it next time"""
+    global _collection_ready
+    with _lock:
+        _cached_ids.clear()
+        _collection_ready = False
+
+def lookup(query_vec, top_k: int):
+    """Matches cached for a near-identical query with the same top_k, or None"""
+    client = get_client()
+    _ensure_collection(client)
+    try:
+        hits = client.query_points(
+            collection_name=CACHE_COLLECTION,
+            query=query_vec,
+            query_filter=Filter(must=[FieldCondition(key="top_k", match=MatchValue(value=top_k))]),
+            limit=1,
+            score_threshold=SIMILARITY_THRESHOLD,
+            with_payload=True
+        ).points
+    except (UnexpectedResponse, ValueError) as e:
+        if not _is_missing_collection(e):
+            raise
+        _forget_collection()
+        return None
+    return hits[0].payload["matches"] if hits else None
+
+def store(query_vec, top_k: int, matches):
+    """Cache matches for a query vector, evicting the oldest entry when full"""
+    client = get_client()
+    _ensure_collection(client)
+    point_id = str(uuid.uuid4())
+    try:
+        client.upsert(
+            collection_name=CACHE_COLLECTION,
+            points=[PointStruct(
+                id=point_id,
+                vector=list(map(float, query_vec)),
+                payload={"top_k": top_k, "matches": matches}
+            )]
+        )
+        with _lock:
+            _cached_ids.append(point_id)
+            evicted = _cached_ids.popleft() if len(_cached_ids) > MAX_CACHED_QUERIES else None
+        if evicted is not None:
+            client.delete(
+                collection_name=CACHE_COLLECTION,
+                points_selector=PointIdsList(points=[evicted])
+            )
+    except (UnexpectedResponse, ValueError) as e:
+        # Caching is best effort; a dropped collection just means this entry is lost
+        if not _is_missing_collection(e):
+            raise
+        _forget_collection()
+
+def invalidate():
+    """Drop cached results, e.g. after new documents are indexed"""
+    global _collection_ready
+    client = get_client()
+    with _lock:
+        if _collection_ready or client.collection_exists(CACHE_COLLECTION):
+            client.delete_collection(CACHE_COLLECTION)
+        _cached_ids.clear()
+        _collection_ready = False
@@ -1,21 +1,42 @@
 # schema.py
 from qdrant.client import get_client
-from qdrant_client.models import VectorParams, Distance
+from qdrant_client.models import (
+    VectorParams, Distance, OptimizersConfigDiff, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams
+)
 
 # === Constants used in all Qdrant operations ===
 COLLECTION = "doc_chunks"
 VECTOR_SIZE = 384
 DISTANCE = Distance.COSINE  # use Qdrant Distance object
 
+# Search runs on int8-quantized vectors kept in RAM while the float32
+# originals live on disk; top candidates are rescored against the originals
+# (oversampled 2x) to keep recall
+QUANTIZATION = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+)
+SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+# Set once the collection is known to exist, so repeat calls are free
+_collection_ready = False
+
 def create_collection():
     """Create Qdrant collection if not exists"""
+    global _collection_ready
+    if _collection_ready:
+        return
     client = get_client()
-    collections = [c.name for c in client.get_collections().collections]
-    if COLLECTION not in collections:
-        client.recreate_collection(
+    if not client.collection_exists(COLLECTION):
+        client.create_collection(
             collection_name=COLLECTION,
-            vectors_config=VectorParams(size=VECTOR_SIZE, distance=DISTANCE)
+            vectors_config=VectorParams(size=VECTOR_SIZE, distance=DISTANCE, on_disk=True),
+            quantization_config=QUANTIZATION,
+            optimizers_config=OptimizersConfigDiff(memmap_threshold=20000)
         )
         print(f"Collection '{COLLECTION}' created.")
     else:
         print(f"Collection '{COLLECTION}' already exists.")
+    _collection_ready = True
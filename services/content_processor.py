@@ -3,6 +3,23 @@ import re
 import nltk
 from typing import List, Tuple
 import os
+import string
+import numpy as np
+
+# --- Precompiled text patterns ---
+_WS_RE = re.compile(r'\s+')
+_SPECIAL_RE = re.compile(r'[^\w\s.,!?;:()\-]')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s')
+# Case-insensitive via explicit classes: no lowered copy of the sentence, and
+# faster than re.IGNORECASE on this pattern
+_PAGE_MARKER_RE = re.compile(r'[Pp][Aa][Gg][Ee]\s*\d+|\d+\s*[Oo][Ff]\s*\d+')
+# Capitalized terms and phrases, first word at least three letters
+_NOUN_PHRASE_RE = re.compile(r'\b[A-Z][a-z]{2,}(?:\s+[A-Z][a-z]+)*\b')
+
+# ASCII characters _SPECIAL_RE keeps once whitespace is collapsed to spaces;
+# deleting the rest via str.translate is one C pass for ASCII-only text
+_KEPT_ASCII = set(string.ascii_letters + string.digits + '_ .,!?;:()-')
+_DROP_SPECIAL_ASCII = str.maketrans('', '', ''.join(chr(c) for c in range(128) if chr(c) not in _KEPT_ASCII))
 
 class ContentProcessor:
     def __init__(self):
@@ -23,19 +40,19 @@ class ContentProcessor:
         # Split into sentences (improved approach)
         sentences = self.smart_sentence_split(text)
         meaningful_sentences = []
-        key_concepts = []
+        key_concepts: set = set()
         
+        min_length = self.min_sentence_length
+        is_meaningful = self.is_meaningful
         for sentence in sentences:
             sentence = sentence.strip()
-            if len(sentence) >= self.min_sentence_length and self.is_meaningful(sentence):
+            if len(sentence) >= min_length and is_meaningful(sentence):
                 meaningful_sentences.append(sentence)
                 
                 # Extract key concepts (nouns and important phrases)
-                concepts = self.extract_concepts(sentence)
-                key_concepts.extend(concepts)
+                key_concepts.update(self.extract_concepts(sentence))
         
-        # Remove duplicates from key concepts
-        key_concepts = list(set(key_concepts))
+        key_concepts = list(key_concepts)
         
         print(f"📝 Found {len(meaningful_sentences)} meaningful sentences and {len(key_concepts)} key concepts")
         
@@ -47,18 +64,21 @@ class ContentProcessor:
     
     def clean_text(self, text: str) -> str:
         """Clean and preprocess text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove page numbers and headers
-        text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
-        # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?;:()\-]', '', text)
+        # Remove extra whitespace (this also removes the newlines a separate
+        # "number on its own line" page-marker pass would look for)
+        text = _WS_RE.sub(' ', text)
+        # Remove special characters but keep basic punctuation; \w is
+        # Unicode-aware, so only ASCII text can take the translate path
+        if text.isascii():
+            text = text.translate(_DROP_SPECIAL_ASCII)
+        else:
+            text = _SPECIAL_RE.sub('', text)
         return text.strip()
     
     def smart_sentence_split(self, text: str) -> List[str]:
         """Split text into sentences intelligently"""
         # Simple sentence splitting that handles abbreviations
-        sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s', text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         return [s.strip() for s in sentences if s.strip()]
     
     def is_meaningful(self, sentence: str) -> bool:
@@ -67,38 +87,24 @@ class ContentProcessor:
         if len(sentence) < self.min_sentence_length:
             return False
         
-        # Exclude all-caps sentences (likely headers)
-        if sentence.isupper() and len(sentence) < 100:
+        # Should contain some substantive words; maxsplit stops after the
+        # fourth word instead of splitting the whole sentence
+        if len(sentence.split(maxsplit=3)) < 4:  # Too short
             return False
             
-        # Exclude page number indicators
-        if re.search(r'page\s*\d+|\d+\s*of\s*\d+', sentence.lower()):
+        # Exclude all-caps sentences (likely headers)
+        if len(sentence) < 100 and sentence.isupper():
             return False
             
-        # Should contain some substantive words
-        words = sentence.split()
-        if len(words) < 4:  # Too short
+        # Exclude page number indicators (regex last, it is the priciest check)
+        if _PAGE_MARKER_RE.search(sentence):
             return False
             
         return True
     
     def extract_concepts(self, sentence: str) -> List[str]:
-        """Extract key concepts from a sentence"""
-        concepts = []
-        
-        # Extract capitalized phrases (potential proper nouns/terms)
-        words = sentence.split()
-        for i, word in enumerate(words):
-            if (len(word) > 3 and word[0].isupper() and 
-                not word.isupper() and  # Not all caps
-                i > 0 and words[i-1][-1] not in '.!?'):  # Not start of sentence
-                concepts.append(word)
-        
-        # Extract noun phrases (simple pattern)
-        noun_phrases = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', sentence)
-        concepts.extend(noun_phrases)
-        
-        return concepts
+        """Extract key concepts (capitalized terms and noun phrases) from a sentence"""
+        return _NOUN_PHRASE_RE.findall(sentence)
     
     def fallback_extraction(self, text: str) -> Tuple[List[str], List[str]]:
         """Fallback method when no meaningful sentences are found"""
@@ -119,25 +125,23 @@ class ContentProcessor:
         if not sentences:
             return []
             
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for sentence in sentences:
-            sentence_length = len(sentence)
-            
-            # If adding this sentence would exceed chunk size and we have content, save current chunk
-            if current_length + sentence_length > 500 and current_chunk:  # Increased chunk size
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sentence]
-                current_length = sentence_length
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length + 1  # +1 for space
+        # Greedy packing up to 500 chars via prefix sums of (length + 1 space):
+        # each chunk ends before the first sentence that would overflow it,
+        # found with one binary search per chunk instead of a Python loop
+        # per sentence. The opening sentence of every later chunk is counted
+        # without its trailing space.
+        prefix = np.zeros(len(sentences) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(s) + 1 for s in sentences), dtype=np.int64,
+                              count=len(sentences)), out=prefix[1:])
         
-        # Add the last chunk
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
+        chunks = []
+        start = 0
+        while start < len(sentences):
+            limit = prefix[start] + 501 + (start > 0)
+            end = int(np.searchsorted(prefix, limit, side='right')) - 1
+            end = min(max(end, start + 1), len(sentences))
+            chunks.append(" ".join(sentences[start:end]))
+            start = end
         
         # Filter chunks that are too short
         chunks = [chunk for chunk in chunks if len(chunk) >= self.min_chunk_length]
@@ -1,4 +1,5 @@
 # services/controller.py
+import asyncio
 import os
 import json
 from datetime import datetime
@@ -132,21 +133,41 @@ class ExamForgeController:
 
         # Ingest PDF
         chunks = self.ingestor.ingest(file_path)
+        topics = self.process_chunks(chunks, os.path.basename(file_path))
 
-        # Store in vector database
-        metadata = {
-            'filename': os.path.basename(file_path),
+        print("PDF processing completed successfully")
+        return chunks, topics
+
+    @staticmethod
+    def _chunks_metadata(chunks, source_name: str) -> Dict:
+        return {
+            'filename': source_name,
             'total_chunks': len(chunks),
             'processed_at': str(datetime.now())
         }
-        self.vector_store.store_document(chunks, metadata)
+
+    def process_chunks(self, chunks, source_name: str = "text"):
+        """Store already-extracted text chunks and extract their topics"""
+        # Store in vector database
+        self.vector_store.store_document(chunks, self._chunks_metadata(chunks, source_name))
 
         # Extract topics
         topics = self.gemini_ai.extract_topics(chunks)
         self.save_topics_json(topics)
+        return topics
 
-        print("PDF processing completed successfully")
-        return chunks, topics
+    async def aprocess_chunks(self, chunks, source_name: str = "text"):
+        """process_chunks for async callers, keeping the event loop free while it runs"""
+        await asyncio.to_thread(
+            self.vector_store.store_document, chunks, self._chunks_metadata(chunks, source_name)
+        )
+
+        if hasattr(self.gemini_ai, 'aextract_topics'):
+            topics = await self.gemini_ai.aextract_topics(chunks)
+        else:
+            topics = self.gemini_ai.extract_topics(chunks)
+        await asyncio.to_thread(self.save_topics_json, topics)
+        return topics
 
     def generate_exam(self, query: str, counts: Dict, target_total: int = 100) -> Dict:
         """Generate complete exam paper"""
@@ -239,10 +260,11 @@ class ExamForgeController:
                 if len(set(options)) != len(options):
                     print("Warning: Duplicate options in MCQ")
 
-            # Check for duplicates
-            source_hash = hash(q.get('source_chunk', '') + q.get('question', ''))
-            if source_hash in sources:
+            # Check for duplicates; a tuple key reuses each string's cached
+            # hash instead of hashing a freshly concatenated copy
+            source_key = (q.get('source_chunk', ''), q.get('question', ''))
+            if source_key in sources:
                 print("Warning: Duplicate question detected")
-            sources.add(source_hash)
+            sources.add(source_key)
 
         print("Questions validation completed")
\ No newline at end of file
@@ -1,46 +1,89 @@
 # services/data_ingestion.py
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image
 from pdf2image import convert_from_path
 import re
 
+logger = logging.getLogger(__name__)
+
+# Tesseract and poppler run as subprocesses, so threads only wait on them and
+# one worker per core keeps every core busy
+OCR_WORKERS = os.cpu_count() or 1
+# Grayscale 150 DPI is enough for body text; Tesseract's LSTM engine only
+# (--oem 1) on a single text block (--psm 6) skips the legacy engine and
+# page layout analysis
+OCR_DPI = 150
+OCR_CONFIG = os.getenv("OCR_CONFIG", "--oem 1 --psm 6")
+
+# Points from the top/bottom page edge treated as header/footer area
+HEADER_FOOTER_MARGIN = 40
+
+_PAGE_MARKER_RE = re.compile(r'--- Page \d+ ---')
+# Case-insensitive via explicit classes, so lines need no lowered copy
+_PAGE_NUM_RE = re.compile(r'[Pp][Aa][Gg][Ee]\s*\d+|\d+\s*[Oo][Ff]\s*\d+')
+
+def _ocr_image(image):
+    """OCR a grayscale page image after binarizing it to 1 bit per pixel"""
+    return pytesseract.image_to_string(image.point(lambda p: 255 if p > 180 else 0, mode='1'), config=OCR_CONFIG)
+
 class PDFIngestor:
     def __init__(self, chunk_size=512, chunk_overlap=64):
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+            separators=("\n\n", "\n", ". ", "! ", "? ", " ", "")
         )
 
     def extract_text(self, file_path):
-        """Extract text from PDF using PyMuPDF"""
+        """
+        Extract text from PDF using PyMuPDF.
+        Returns (pages, ocr_pages): text keyed by 1-based page number, and the
+        pages that are image-only scans (under 50 chars of text but with
+        images) and need OCR. Both are None if the PDF cannot be opened.
+        """
         try:
             print(f"🔍 Extracting text from: {file_path}")
-            doc = fitz.open(file_path)
-            text = ""
-            for page_num, page in enumerate(doc):
-                try:
-                    page_text = page.get_text("text")
-                    if page_text.strip():
-                        text += f"\n--- Page {page_num + 1} ---\n{page_text}"
-                        print(f"✅ Page {page_num + 1}: {len(page_text)} chars")
-                except Exception as e:
-                    print(f"⚠️ Error extracting text from page {page_num}: {e}")
-                    continue
-            doc.close()
+            pages = {}
+            ocr_pages = []
+            failed_pages = []
+            with fitz.open(file_path) as doc:
+                for page_num, page in enumerate(doc, start=1):
+                    try:
+                        # Text blocks (b[6] == 0) clear of the top and bottom
+                        # margins; running headers, footers and page numbers
+                        # sit there and are dropped by geometry
+                        bottom = page.rect.height - HEADER_FOOTER_MARGIN
+                        page_text = "\n".join(
+                            b[4] for b in page.get_text("blocks", flags=fitz.TEXTFLAGS_SEARCH)
+                            if b[6] == 0 and b[1] > HEADER_FOOTER_MARGIN and b[3] < bottom
+                        ).strip()
+                        if len(page_text) < 50 and page.get_images():
+                            ocr_pages.append(page_num)
+                        elif page_text:
+                            pages[page_num] = page_text
+                            logger.debug("Page %d: %d chars", page_num, len(page_text))
+                    except Exception as e:
+                        # try costs nothing until a page actually raises
+                        failed_pages.append(page_num)
+                        logger.warning("Error extracting text from page %d: %s", page_num, e)
             
-            if text.strip():
-                print(f"✅ Successfully extracted {len(text)} characters")
-                return text
-            else:
-                print("❌ No text extracted")
-                return None
+            if failed_pages:
+                print(f"⚠️ Could not extract text from pages: {failed_pages}")
+            print(f"✅ Extracted text from {len(pages)} pages, {len(ocr_pages)} scanned pages need OCR")
+            return pages, ocr_pages
                 
         except Exception as e:
             print(f"❌ Error opening PDF: {e}")
-            return None
+            return None, None
+
+    @staticmethod
+    def join_pages(pages):
+        """Join per-page text in page order, each behind a page marker"""
+        return "".join(f"\n--- Page {num} ---\n{pages[num]}" for num in sorted(pages))
 
     def clean_text(self, text):
         """Clean and preprocess extracted text"""
@@ -50,24 +93,18 @@ class PDFIngestor:
         print("🔄 Cleaning extracted text...")
         
         # Remove page markers
-        text = re.sub(r'--- Page \d+ ---', '', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _PAGE_MARKER_RE.sub('', text)
         
-        # Remove duplicate lines while preserving order
-        lines = text.split('\n')
-        seen = set()
-        clean_lines = []
-
-        for line in lines:
-            line = line.strip()
-            if line and line not in seen:
-                # Filter out headers/footers (all caps, page indicators)
-                if not (line.isupper() and len(line) < 100):
-                    if not re.search(r'page\s*\d+|\d+\s*of\s*\d+', line.lower()):
-                        clean_lines.append(line)
-                        seen.add(line)
+        # Collapse whitespace within each line, drop headers/footers (all
+        # caps, page indicators), then remove duplicate lines while
+        # preserving order; dict.fromkeys does the dedupe in one C pass
+        lines = (' '.join(line.split()) for line in text.split('\n'))
+        clean_lines = dict.fromkeys(
+            line for line in lines
+            if line
+            and not (len(line) < 100 and line.isupper())
+            and not _PAGE_NUM_RE.search(line)
+        )
 
         cleaned_text = ' '.join(clean_lines)
         print(f"✅ Cleaned text: {len(cleaned_text)} characters")
@@ -77,13 +114,16 @@ class PDFIngestor:
         """Main ingestion method"""
         print(f"📥 Ingesting PDF: {file_path}")
 
-        # Try direct text extraction first
-        text = self.extract_text(file_path)
-
-        # Fallback to OCR if no text found
-        if not text or len(text.strip()) < 200:
-            print("🔄 No text found, attempting OCR...")
-            text = self.ocr_extract(file_path)
+        # Direct text extraction first; only image-only pages go through OCR,
+        # so born-digital PDFs are never rasterized
+        pages, ocr_pages = self.extract_text(file_path)
+        if pages is None:
+            print("🔄 Could not read PDF text, attempting OCR...")
+            pages = self.ocr_extract(file_path)
+        elif ocr_pages:
+            print(f"🔄 OCR for scanned pages: {ocr_pages}")
+            pages.update(self.ocr_extract(file_path, ocr_pages))
+        text = self.join_pages(pages)
 
         if not text or len(text.strip()) < 100:
             raise ValueError("❌ Could not extract sufficient text from PDF")
@@ -101,26 +141,38 @@ class PDFIngestor:
 
         return chunks
 
-    def ocr_extract(self, file_path):
-        """Extract text using OCR for scanned PDFs"""
+    def ocr_extract(self, file_path, pages=None):
+        """
+        Extract text using OCR for scanned PDFs. OCRs the given 1-based page
+        numbers, or every page when pages is None. Returns text keyed by page.
+        """
         try:
             print("🔄 Starting OCR extraction...")
-            images = convert_from_path(file_path, dpi=200)  # Lower DPI for speed
-            text = ""
-            for i, img in enumerate(images):
-                print(f"📄 Processing page {i+1}/{len(images)} with OCR")
-                page_text = pytesseract.image_to_string(img)
-                text += f"\n--- Page {i+1} ---\n{page_text}"
-            return text
+            with ThreadPoolExecutor(max_workers=OCR_WORKERS) as pool:
+                if pages is None:
+                    images = convert_from_path(file_path, dpi=OCR_DPI, grayscale=True, thread_count=OCR_WORKERS)
+                    pages = range(1, len(images) + 1)
+                    page_texts = pool.map(_ocr_image, images)
+                else:
+                    page_texts = pool.map(lambda num: self._ocr_page(file_path, num), pages)
+                print(f"📄 Running OCR on {len(pages)} pages with {OCR_WORKERS} workers")
+                return dict(zip(pages, page_texts))
         except Exception as e:
             print(f"❌ Error in OCR extraction: {e}")
-            return ""
+            return {}
+
+    def _ocr_page(self, file_path, page_num):
+        """Render a single page and OCR it"""
+        image = convert_from_path(file_path, dpi=OCR_DPI, grayscale=True, first_page=page_num, last_page=page_num)[0]
+        return _ocr_image(image)
 
 class RecursiveCharacterTextSplitter:
     def __init__(self, chunk_size=512, chunk_overlap=64, separators=None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.separators = separators if separators else ["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+        self.separators = tuple(separators) if separators else ("\n\n", "\n", ". ", "! ", "? ", " ", "")
+        # (separator, length) pairs for the split loop; "" never matches
+        self._separator_lens = tuple((sep, len(sep)) for sep in self.separators if sep)
 
     def split_text(self, text):
         """Split text into chunks"""
@@ -128,7 +180,13 @@ class RecursiveCharacterTextSplitter:
             return []
 
         text = str(text)
-        chunks = []
+        return [text[start:end] for start, end in self.split_indices(text)]
+
+    def split_indices(self, text):
+        """
+        Yield (start, end) offsets of each chunk in text, already trimmed of
+        surrounding whitespace, so callers slice once and only if needed
+        """
         start = 0
         
         while start < len(text):
@@ -137,23 +195,25 @@ class RecursiveCharacterTextSplitter:
             
             # If we're not at the end, try to break at a separator
             if end < len(text):
-                for separator in self.separators:
-                    if separator:
-                        # Look for the separator before the end
-                        pos = text.rfind(separator, start, end)
-                        if pos != -1 and pos > start:
-                            end = pos + len(separator)
-                            break
+                for separator, sep_len in self._separator_lens:
+                    # Look for the separator before the end
+                    pos = text.rfind(separator, start, end)
+                    if pos != -1 and pos > start:
+                        end = pos + sep_len
+                        break
             
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+            # Trim whitespace by moving the offsets, as str.strip would
+            chunk_start, chunk_end = start, end
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_start < chunk_end:
+                yield chunk_start, chunk_end
             
-            # Move start position, considering overlap
-            start = end - self.chunk_overlap
-            if start < 0:
-                start = 0
             if end >= len(text):
                 break
-
-        return chunks
\ No newline at end of file
+            # Move start position, considering overlap; a separator close to
+            # start would otherwise move it backwards and loop forever
+            next_start = end - self.chunk_overlap
+            start = next_start if next_start > start else end
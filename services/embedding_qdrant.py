@@ -1,11 +1,23 @@
 # services/embeddings_qdrant.py
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant.schema import QUANTIZATION, SEARCH_PARAMS
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import hashlib
+import logging
 import numpy as np
 import os
+import sqlite3
+import time
 
 try:
     import google.generativeai as genai
+    try:
+        from services.genai_client import configure_genai
+    except ImportError:
+        from genai_client import configure_genai
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
@@ -19,8 +31,65 @@ except ImportError:
     SKLEARN_AVAILABLE = False
     print("❌ scikit-learn not available, using random embeddings")
 
+logger = logging.getLogger(__name__)
+
+GEMINI_EMBED_MODEL = "models/embedding-001"
+
+# --- Persistent embedding cache ---
+# Gemini vectors keyed by a BLAKE2b digest of (model, task type, text), so
+# re-ingested documents and chunks repeated across documents skip the API
+EMBED_CACHE_DB = Path(os.getenv("EMBED_CACHE_DB", "embed_cache.db"))
+EMBED_CACHE_TTL = 30 * 86400  # seconds
+# Gemini embedding requests allowed in flight at once
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 16))
+
+def embedding_key(text, task_type, model=GEMINI_EMBED_MODEL):
+    return hashlib.blake2b(f"{model}\0{task_type}\0{text}".encode(), digest_size=16).digest()
+
+class EmbeddingCache:
+    def __init__(self, path=EMBED_CACHE_DB, ttl=EMBED_CACHE_TTL):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings("
+            "key BLOB PRIMARY KEY, vector BLOB, created REAL)"
+        )
+
+    def get_many(self, keys):
+        """Cached vectors for the given keys, as {key: list}; misses are absent"""
+        found = {}
+        oldest = time.time() - self.ttl
+        keys = list(set(keys))
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE created > ? AND key IN ({', '.join('?' * len(batch))})",
+                (oldest, *batch)
+            ).fetchall()
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs"""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+            [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items]
+        )
+
+class GeminiEmbeddingError(Exception):
+    """A Gemini embedding request failed"""
+
 class GeminiEmbedder:
     def __init__(self, api_key=None):
+        # TF-IDF fallback vocabulary, fitted once per stored document so
+        # queries are embedded in the same space as its chunks
+        self._tfidf = None
+        
         # FIX: Use environment variable or provided key
         self.api_key = api_key or os.getenv('GOOGLE_API_KEY')
         print(f"🔑 Embedder API Key: {'***' + self.api_key[-4:] if self.api_key else 'NOT SET'}")
@@ -36,8 +105,9 @@ class GeminiEmbedder:
             return
 
         try:
-            genai.configure(api_key=self.api_key)
+            configure_genai(self.api_key)
             self.available = True
+            self.cache = EmbeddingCache()
             print("✅ Gemini Embedder configured successfully")
         except Exception as e:
             print(f"❌ Error configuring Gemini Embedder: {e}")
@@ -47,13 +117,18 @@ class GeminiEmbedder:
         """Get embedding using Gemini API or fallback"""
         if self.available:
             try:
-                print(f"🔄 Getting Gemini embedding for {len(text)} chars...")
+                key = embedding_key(text, "retrieval_document")
+                cached = self.cache.get_many([key])
+                if key in cached:
+                    return cached[key]
+                logger.debug("Getting Gemini embedding for %d chars", len(text))
                 result = genai.embed_content(
-                    model="models/embedding-001",
+                    model=GEMINI_EMBED_MODEL,
                     content=text,
                     task_type="retrieval_document"
                 )
-                print("✅ Gemini embedding successful")
+                logger.debug("Gemini embedding successful")
+                self.cache.put_many([(key, result['embedding'])])
                 return result['embedding']
             except Exception as e:
                 print(f"❌ Gemini embedding failed: {e}")
@@ -61,6 +136,71 @@ class GeminiEmbedder:
         # Fallback to TF-IDF
         return self.get_tfidf_embedding(text)
 
+    def get_embeddings_batch(self, texts, batch_size=100):
+        """
+        Embed many texts with one Gemini request per batch_size texts, or
+        fallback. Only texts missing from the embedding cache hit the API.
+        """
+        texts = list(texts)
+        if self.available and texts:
+            try:
+                vector_for = self.embed_pipelined(texts, batch_size)
+                vectors = [vector_for(text) for text in texts]
+                print("✅ Gemini embeddings successful")
+                return vectors
+            except Exception as e:
+                print(f"❌ Gemini batch embedding failed: {e}")
+        
+        # Fallback to TF-IDF
+        return self.get_tfidf_embeddings_batch(texts)
+
+    def embed_pipelined(self, texts, batch_size=100):
+        """
+        Start embedding texts and return a lookup, text -> vector, that waits
+        only for the batch holding that text. Callers can use the first
+        vectors while later batches are still in flight. The lookup raises
+        GeminiEmbeddingError if a request fails.
+        """
+        keys = {text: embedding_key(text, "retrieval_document") for text in texts}
+        vectors = self.cache.get_many(keys.values())
+        missing = [text for text, key in keys.items() if key not in vectors]
+        print(f"🔄 Getting Gemini embeddings for {len(missing)} texts ({len(keys) - len(missing)} cached)...")
+        
+        pending = {}
+        if missing:
+            # Requests are network-bound; overlap up to EMBED_CONCURRENCY
+            batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+            pool = ThreadPoolExecutor(max_workers=min(EMBED_CONCURRENCY, len(batches)))
+            for batch in batches:
+                future = pool.submit(self._embed_texts, batch)
+                pending.update((text, (batch, future)) for text in batch)
+            pool.shutdown(wait=False)  # workers still finish every submitted batch
+        
+        def vector_for(text):
+            key = keys[text]
+            if key not in vectors:
+                batch, future = pending[text]
+                try:
+                    embeddings = future.result()
+                except Exception as e:
+                    for _, other in pending.values():
+                        other.cancel()
+                    raise GeminiEmbeddingError(str(e)) from e
+                fresh = [(keys[t], embedding) for t, embedding in zip(batch, embeddings)]
+                self.cache.put_many(fresh)
+                vectors.update(fresh)
+            return vectors[key]
+        
+        return vector_for
+
+    def _embed_texts(self, texts):
+        result = genai.embed_content(
+            model=GEMINI_EMBED_MODEL,
+            content=texts,
+            task_type="retrieval_document"
+        )
+        return result['embedding']
+
     def get_tfidf_embedding(self, text):
         """Fallback TF-IDF embedding"""
         if not SKLEARN_AVAILABLE:
@@ -68,15 +208,12 @@ class GeminiEmbedder:
             return np.random.rand(512).tolist()
             
         try:
-            # Use a simple TF-IDF approach
-            from sklearn.feature_extraction.text import TfidfVectorizer
-            import numpy as np
-            
-            # Create vectorizer with limited features for efficiency
-            vectorizer = TfidfVectorizer(max_features=512, stop_words='english')
-            
-            # Fit and transform the text
-            embedding = vectorizer.fit_transform([text]).toarray()[0]
+            # Reuse the document vocabulary; fit on the text alone only if
+            # no document has been embedded with TF-IDF yet
+            vectorizer = self._tfidf
+            if vectorizer is None:
+                vectorizer = TfidfVectorizer(max_features=512, stop_words='english').fit([text])
+            embedding = vectorizer.transform([text]).toarray()[0]
             
             # Pad or truncate to 512 dimensions
             if len(embedding) < 512:
@@ -84,18 +221,42 @@ class GeminiEmbedder:
             else:
                 embedding = embedding[:512]
                 
-            print("✅ TF-IDF embedding generated")
+            logger.debug("TF-IDF embedding generated")
             return embedding.tolist()
         except Exception as e:
             print(f"❌ TF-IDF embedding failed: {e}")
             return np.random.rand(512).tolist()
 
+    def get_tfidf_embeddings_batch(self, texts):
+        """Fallback TF-IDF embeddings, fitting one vocabulary over all texts"""
+        if not SKLEARN_AVAILABLE:
+            print("🔄 Using random embeddings (scikit-learn not available)")
+            return np.random.rand(len(texts), 512).tolist()
+            
+        try:
+            self._tfidf = TfidfVectorizer(max_features=512, stop_words='english').fit(texts)
+            matrix = self._tfidf.transform(texts).toarray()
+            
+            # Pad columns up to 512 dimensions
+            if matrix.shape[1] < 512:
+                matrix = np.pad(matrix, ((0, 0), (0, 512 - matrix.shape[1])))
+                
+            print(f"✅ TF-IDF embeddings generated for {len(texts)} texts")
+            return matrix.tolist()
+        except Exception as e:
+            print(f"❌ TF-IDF embedding failed: {e}")
+            return np.random.rand(len(texts), 512).tolist()
+
+UPLOAD_BATCH_SIZE = 256
+
 class VectorMemory:
     def __init__(self, qdrant_url=":memory:", collection_name="exam_chunks", api_key=None):
         print(f"🔄 Initializing VectorMemory with Qdrant: {qdrant_url}")
         
         try:
-            self.client = QdrantClient(url=qdrant_url)
+            # location accepts ":memory:" as well as a server URL; gRPC
+            # is used for server URLs
+            self.client = QdrantClient(qdrant_url, prefer_grpc=True)
             self.collection = collection_name
             self.embedder = GeminiEmbedder(api_key)
 
@@ -106,7 +267,9 @@ class VectorMemory:
             except Exception:
                 self.client.create_collection(
                     collection_name=collection_name,
-                    vectors_config=VectorParams(size=512, distance=Distance.COSINE)
+                    vectors_config=VectorParams(size=512, distance=Distance.COSINE, on_disk=True),
+                    # Same int8 scalar quantization as doc_chunks
+                    quantization_config=QUANTIZATION
                 )
                 print(f"✅ Created collection '{collection_name}'")
                 
@@ -129,23 +292,25 @@ class VectorMemory:
             return
 
         try:
-            print(f"🔄 Generating embeddings for {len(chunks)} chunks...")
-            vectors = [self.embedder.get_embedding(chunk) for chunk in chunks]
-
-            points = []
-            for idx, (vec, chunk) in enumerate(zip(vectors, chunks)):
-                points.append(
-                    PointStruct(
-                        id=idx,
-                        vector=vec,
-                        payload={"text": chunk, **metadata, "chunk_id": idx}
-                    )
-                )
+            # Repeated chunks (headers, boilerplate) are embedded once
+            counts = Counter(chunks)
+            unique_chunks = list(counts)
+            print(f"🔄 Generating embeddings for {len(unique_chunks)} unique chunks of {len(chunks)}...")
 
-            self.client.upsert(
-                collection_name=self.collection,
-                points=points
-            )
+            vector_for = None
+            if self.embedder.available:
+                # Points upload while later embedding batches are in flight
+                try:
+                    vector_for = self.embedder.embed_pipelined(unique_chunks)
+                    self._upload_points(chunks, counts, metadata, vector_for)
+                except GeminiEmbeddingError as e:
+                    print(f"❌ Gemini batch embedding failed: {e}")
+                    vector_for = None
+            if vector_for is None:
+                # TF-IDF fallback; point IDs are chunk indices, so this also
+                # overwrites any Gemini vectors uploaded before a failure
+                tfidf_vectors = self.embedder.get_tfidf_embeddings_batch(unique_chunks)
+                self._upload_points(chunks, counts, metadata, dict(zip(unique_chunks, tfidf_vectors)).__getitem__)
             print(f"✅ Stored {len(chunks)} chunks in Qdrant database")
         except Exception as e:
             print(f"❌ Failed to store in Qdrant: {e}")
@@ -157,6 +322,23 @@ class VectorMemory:
                     "metadata": {**metadata, "chunk_id": i}
                 })
 
+    def _upload_points(self, chunks, counts, metadata, vector_for):
+        points = (
+            PointStruct(
+                id=idx,
+                vector=vector_for(chunk),
+                payload={"text": chunk, **metadata, "chunk_id": idx, "duplicate_count": counts[chunk]}
+            )
+            for idx, chunk in enumerate(chunks)
+        )
+
+        # Sent in batches rather than one request holding every point
+        self.client.upload_points(
+            collection_name=self.collection,
+            points=points,
+            batch_size=UPLOAD_BATCH_SIZE
+        )
+
     def retrieve(self, query, top_k=5):
         """Retrieve relevant chunks for query"""
         if self.client is None:
@@ -165,17 +347,23 @@ class VectorMemory:
             return self._fallback_storage[:top_k] if hasattr(self, '_fallback_storage') else []
 
         try:
-            print(f"🔍 Retrieving top {top_k} chunks for query: '{query}'")
+            logger.debug("Retrieving top %d chunks for query: %r", top_k, query)
             embedded_query = self.embedder.get_embedding(query)
 
-            results = self.client.search(
+            # Quantized search, rescored against the original vectors
+            points = self.client.query_points(
                 collection_name=self.collection,
-                query_vector=embedded_query,
-                limit=top_k
-            )
+                query=embedded_query,
+                limit=top_k,
+                with_payload=True,
+                search_params=SEARCH_PARAMS
+            ).points
 
-            print(f"✅ Retrieved {len(results)} chunks from Qdrant")
-            return [r.payload for r in results]
+            logger.debug("Retrieved %d chunks from Qdrant", len(points))
+            # Payload dicts are returned as-is, with the similarity added
+            for point in points:
+                point.payload["score"] = point.score
+            return [point.payload for point in points]
         except Exception as e:
             print(f"❌ Qdrant retrieval failed: {e}")
             # Fallback: return first N chunks
@@ -1,8 +1,9 @@
 # services/exam_service.py
+import asyncio
 import os
 import sys
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 from datetime import datetime
 
 # Add the services directory to Python path
@@ -20,9 +21,18 @@ except ImportError as e:
         def process_pdf(self, file_path: str):
             raise Exception("ExamForgeController not properly initialized")
         
+        def process_chunks(self, chunks, source_name: str = "text"):
+            raise Exception("ExamForgeController not properly initialized")
+        
+        async def aprocess_chunks(self, chunks, source_name: str = "text"):
+            raise Exception("ExamForgeController not properly initialized")
+        
         def generate_exam(self, query: str, counts: Dict, target_total: int = 100) -> Dict:
             raise Exception("ExamForgeController not properly initialized")
 
+# Exam section letter for each question kind, in paper order
+SECTION_BY_KIND = {"mcq": "A", "short": "B", "long": "C"}
+
 class ExamGenerationService:
     def __init__(self):
         # FIX: Use environment variable instead of hardcoded key
@@ -36,7 +46,9 @@ class ExamGenerationService:
         self.controller = None
         
     def initialize_controller(self):
-        """Initialize the exam forge controller"""
+        """Initialize the exam forge controller (once; it holds the PDF ingestor and vector store)"""
+        if self.controller:
+            return True
         try:
             print("🔄 Initializing ExamForgeController...")
             self.controller = ExamForgeController(google_api_key=self.api_key)
@@ -80,40 +92,67 @@ class ExamGenerationService:
                     "error": "Insufficient content extracted from PDF. Please try a different PDF with more text content."
                 }
             
-            # Step 2: Use CONTENT-BASED question generation
-            print("🎯 Using content-based question generation...")
-            counts = {
-                'mcq': mcq_count,
-                'short': short_count, 
-                'long': long_count
-            }
+            return self._exam_from_chunks(chunks, topics, mcq_count, short_count,
+                                          long_count, total_marks, "PDF")
             
-            # Use the new content-based generation
-            if hasattr(self.controller.question_gen, 'generate_questions_from_content'):
-                questions = self.controller.question_gen.generate_questions_from_content(
-                    chunks, counts, "medium"
-                )
-            else:
-                # Fallback to original method
-                questions = self.controller.question_gen.generate_questions(
-                    chunks, counts, "medium"
-                )
+        except Exception as e:
+            print(f"❌ Error in exam generation: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    def generate_exam_from_chunks(self, chunks: List[str], query: str,
+                                  mcq_count: int = 10, short_count: int = 5,
+                                  long_count: int = 2, total_marks: int = 100):
+        """
+        Generate an exam from text that has already been extracted, skipping
+        the PDF ingestion step
+        """
+        try:
+            if not self.controller:
+                if not self.initialize_controller():
+                    return {"success": False, "error": "Failed to initialize exam generator"}
             
-            # Create exam structure
-            exam = self._create_exam_from_questions(questions, counts, total_marks)
+            if not chunks or len(chunks) < 3:
+                return {
+                    "success": False,
+                    "error": "Insufficient content provided. Please try material with more text content."
+                }
             
-            # Check Gemini usage
-            gemini_used = getattr(self.controller.gemini_ai, 'available', False) if hasattr(self.controller, 'gemini_ai') else False
+            topics = self.controller.process_chunks(chunks, query or "text")
+            return self._exam_from_chunks(chunks, topics, mcq_count, short_count,
+                                          long_count, total_marks, "text")
             
+        except Exception as e:
+            print(f"❌ Error in exam generation: {e}")
+            import traceback
+            traceback.print_exc()
             return {
-                "success": True,
-                "exam": exam,
-                "topics": topics,
-                "chunks_processed": len(chunks),
-                "gemini_used": gemini_used,
-                "content_based": True,
-                "message": f"Exam generated from PDF with {len(chunks)} content chunks"
+                "success": False,
+                "error": str(e)
             }
+
+    async def agenerate_exam_from_chunks(self, chunks: List[str], query: str,
+                                         mcq_count: int = 10, short_count: int = 5,
+                                         long_count: int = 2, total_marks: int = 100):
+        """generate_exam_from_chunks for async route handlers"""
+        try:
+            if not self.controller:
+                if not await asyncio.to_thread(self.initialize_controller):
+                    return {"success": False, "error": "Failed to initialize exam generator"}
+            
+            if not chunks or len(chunks) < 3:
+                return {
+                    "success": False,
+                    "error": "Insufficient content provided. Please try material with more text content."
+                }
+            
+            topics = await self.controller.aprocess_chunks(chunks, query or "text")
+            return await asyncio.to_thread(self._exam_from_chunks, chunks, topics, mcq_count,
+                                           short_count, long_count, total_marks, "text")
             
         except Exception as e:
             print(f"❌ Error in exam generation: {e}")
@@ -124,6 +163,78 @@ class ExamGenerationService:
                 "error": str(e)
             }
 
+    def _exam_from_chunks(self, chunks, topics, mcq_count, short_count,
+                          long_count, total_marks, source):
+        """Shared question generation step for PDF and text inputs"""
+        # Step 2: Use CONTENT-BASED question generation
+        print("🎯 Using content-based question generation...")
+        counts = {
+            'mcq': mcq_count,
+            'short': short_count, 
+            'long': long_count
+        }
+        
+        # Use the new content-based generation
+        if hasattr(self.controller.question_gen, 'generate_questions_from_content'):
+            questions = self.controller.question_gen.generate_questions_from_content(
+                chunks, counts, "medium"
+            )
+        else:
+            # Fallback to original method
+            questions = self.controller.question_gen.generate_questions(
+                chunks, counts, "medium"
+            )
+        
+        # Create exam structure
+        exam = self._create_exam_from_questions(questions, counts, total_marks)
+        
+        # Check Gemini usage
+        gemini_used = getattr(self.controller.gemini_ai, 'available', False) if hasattr(self.controller, 'gemini_ai') else False
+        
+        return {
+            "success": True,
+            "exam": exam,
+            "topics": topics,
+            "chunks_processed": len(chunks),
+            "gemini_used": gemini_used,
+            "content_based": True,
+            "message": f"Exam generated from {source} with {len(chunks)} content chunks"
+        }
+
+    def stream_exam_from_chunks(self, chunks: List[str], query: str,
+                                mcq_count: int = 10, short_count: int = 5,
+                                long_count: int = 2):
+        """
+        Yield exam events as questions are generated: {"section": "A", "question": {...}}
+        per question (A: MCQ, B: short, C: long), or a single {"error": ...}
+        """
+        try:
+            if not self.controller:
+                if not self.initialize_controller():
+                    yield {"error": "Failed to initialize exam generator"}
+                    return
+            
+            if not chunks or len(chunks) < 3:
+                yield {"error": "Insufficient content provided. Please try material with more text content."}
+                return
+            
+            self.controller.process_chunks(chunks, query or "text")
+            counts = {'mcq': mcq_count, 'short': short_count, 'long': long_count}
+            
+            question_gen = self.controller.question_gen
+            if hasattr(question_gen, 'iter_questions_from_content'):
+                generated = question_gen.iter_questions_from_content(chunks, counts, "medium")
+            else:
+                questions = question_gen.generate_questions(chunks, counts, "medium")
+                generated = ((kind, q) for kind in SECTION_BY_KIND for q in questions.get(kind, []))
+            
+            for kind, question in generated:
+                yield {"section": SECTION_BY_KIND[kind], "question": question}
+                
+        except Exception as e:
+            print(f"❌ Error in streamed exam generation: {e}")
+            yield {"error": str(e)}
+
     def _create_exam_from_questions(self, questions: Dict, counts: Dict, total_marks: int) -> Dict:
         """Create exam structure from generated questions"""
         return {
@@ -1,506 +1,954 @@
 # services/gemini_integration.py
+import asyncio
 import google.generativeai as genai
 import os
 import json
+import logging
+import random
+import re
+import threading
 import time
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from typing import Annotated, List, Dict, Any
+
+from google.api_core import exceptions as google_exceptions
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+try:
+    from services.genai_client import configure_genai
+    from services.llm_cache import EMBEDDER_AVAILABLE, LLMCache, SemanticCache, cache_key
+except ImportError:
+    from genai_client import configure_genai
+    from llm_cache import EMBEDDER_AVAILABLE, LLMCache, SemanticCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r'\s*```(?:json)?\s*')
+_JSON_DECODER = json.JSONDecoder()
+
+# Words that select a fallback question family, checked in this order.
+# Matching is on whole words, so common inflections are listed explicitly
+_TECH_KEYWORDS = frozenset({
+    'technical', 'report', 'reports', 'documentation', 'manual', 'manuals'
+})
+_RESEARCH_KEYWORDS = frozenset({
+    'research', 'method', 'methods', 'methodology', 'study', 'studies',
+    'experiment', 'experiments', 'experimental'
+})
+_DATA_KEYWORDS = frozenset({
+    'data', 'analysis', 'statistic', 'statistics', 'statistical', 'result', 'results'
+})
+_CS_KEYWORDS = frozenset({
+    'computer', 'computers', 'software', 'system', 'systems', 'algorithm', 'algorithms'
+})
+_FAMILY_KEYWORDS = (
+    (_TECH_KEYWORDS, "tech"),
+    (_RESEARCH_KEYWORDS, "research"),
+    (_DATA_KEYWORDS, "data"),
+    (_CS_KEYWORDS, "computer_science"),
+)
+_WORD_RE = re.compile(r'[a-z]+')
+
+# Fallback questions per content family, formatted with {context}: the
+# first words of the chunk. Types other than mcq/short use the long one
+FALLBACK_TEMPLATES = {
+    "tech": {
+        "explanation": "Based on technical content about {context}",
+        "source_chunk": "Technical content: {context}...",
+        "mcq": {
+            "question": "What is the primary purpose of technical documentation regarding {context}?",
+            "options": (
+                "To entertain readers interested in {context}",
+                "To convey technical information about {context} objectively and factually",
+                "To promote commercial products related to {context}",
+                "To tell fictional stories about {context}",
+            ),
+            "answer": 1
+        },
+        "short": {
+            "question": "Explain the key characteristics of effective technical documentation for {context}.",
+            "answer": "Effective technical documentation for {context} should be clear, concise, objective, well-structured, and evidence-based with proper documentation of methods and findings specific to this domain."
+        },
+        "long": {
+            "question": "Discuss the importance of proper structure and documentation in technical reports about {context} for professional communication.",
+            "answer": "Proper structure ensures logical flow and readability for {context} topics, while comprehensive documentation provides credibility, enables reproducibility, facilitates peer review, and serves as a permanent record for future reference and knowledge transfer in this technical domain."
+        }
+    },
+    "research": {
+        "explanation": "Based on research methodology content about {context}",
+        "source_chunk": "Research content: {context}...",
+        "mcq": {
+            "question": "What is the main purpose of research methodology in studying {context}?",
+            "options": (
+                "To make research on {context} more complicated",
+                "To ensure systematic and valid investigation of {context}",
+                "To increase the length of research papers about {context}",
+                "To satisfy academic requirements only for {context}",
+            ),
+            "answer": 1
+        },
+        "short": {
+            "question": "Describe the key components of a research methodology section for studying {context}.",
+            "answer": "A research methodology section for {context} should include research design, population and sampling, data collection methods specific to this topic, data analysis techniques, and ethical considerations relevant to the study."
+        },
+        "long": {
+            "question": "Analyze the importance of selecting appropriate research methods for studying {context} compared to other topics.",
+            "answer": "Appropriate research methods ensure validity and reliability of findings about {context}. Quantitative methods suit hypothesis testing in this domain, qualitative methods explore complex phenomena, and mixed methods provide comprehensive insights. Method selection depends on research questions about {context}, available resources, and epistemological stance."
+        }
+    },
+    "data": {
+        "explanation": "Based on data analysis principles applied to {context}",
+        "source_chunk": "Data analysis content: {context}...",
+        "mcq": {
+            "question": "What is the primary goal of data analysis for {context}?",
+            "options": (
+                "To collect as much data as possible about {context}",
+                "To extract meaningful insights and patterns from data about {context}",
+                "To create colorful charts and graphs for {context}",
+                "To prove predetermined conclusions about {context}",
+            ),
+            "answer": 1
+        },
+        "short": {
+            "question": "Explain how descriptive and inferential statistics differ when analyzing {context}.",
+            "answer": "Descriptive statistics summarize and describe data features about {context} (mean, median, mode), while inferential statistics make predictions or inferences about populations based on sample data related to {context}."
+        },
+        "long": {
+            "question": "Discuss the importance of data quality and preprocessing specifically for analyzing {context}.",
+            "answer": "Data quality ensures accurate results for {context}; preprocessing handles missing values, outliers, and normalization specific to this domain. Poor data quality leads to misleading conclusions about {context}, while proper preprocessing enhances model performance and reliability of insights for this topic."
+        }
+    },
+    "computer_science": {
+        "explanation": "Based on computer science principles related to {context}",
+        "source_chunk": "Computer science content: {context}...",
+        "mcq": {
+            "question": "What is the primary goal of software engineering principles applied to {context}?",
+            "options": (
+                "To write code for {context} as quickly as possible",
+                "To develop reliable, maintainable software systems for {context} efficiently",
+                "To use the latest programming languages and frameworks for {context}",
+                "To create software for {context} with the most features",
+            ),
+            "answer": 1
+        },
+        "short": {
+            "question": "Explain the importance of algorithms specifically for {context} in computer science.",
+            "answer": "Algorithms provide step-by-step procedures for solving problems efficiently in {context}, enabling automation, optimization, and reliable computation across various applications and systems in this domain."
+        },
+        "long": {
+            "question": "Discuss the role of data structures and algorithms in building efficient software systems for {context}.",
+            "answer": "Data structures organize and store data efficiently for {context}, while algorithms process this data effectively. Together they enable optimized performance, scalability, and maintainability in software systems for {context}, impacting everything from response times to resource utilization and system reliability in this specific application domain."
+        }
+    },
+    "general": {
+        "explanation": "Based on academic content about {context}",
+        "source_chunk": "Academic content: {context}...",
+        "mcq": {
+            "question": "What is the main purpose of academic writing about {context}?",
+            "options": (
+                "To entertain readers with creative stories about {context}",
+                "To present information and arguments about {context} clearly and logically",
+                "To use complex vocabulary to impress readers about {context}",
+                "To summarize existing knowledge about {context} without analysis",
+            ),
+            "answer": 1
+        },
+        "short": {
+            "question": "Explain the importance of critical thinking specifically for academic work on {context}.",
+            "answer": "Critical thinking enables objective analysis of {context}, evaluation of evidence, identification of biases, and development of well-reasoned arguments, leading to more robust and credible academic work in this specific domain."
+        },
+        "long": {
+            "question": "Discuss the role of proper citation and referencing specifically for academic work on {context}.",
+            "answer": "Proper citation acknowledges original authors in {context} research, avoids plagiarism, enables verification of sources, demonstrates research depth in this field, and contributes to scholarly conversation. It maintains academic integrity and builds credibility for research specifically about {context}."
+        }
+    }
+}
+
+# Question prompts put the text shared by every call of a type first and the
+# per-call values last, so repeated calls share a long identical prefix
+_QUESTION_RULES = {
+    "mcq": """
+        - Provide EXACTLY 4 distinct options
+        - One option must be clearly correct based on the text
+        - Options should be plausible but distinct
+        - Avoid "all of the above" or "none of the above"
+        """,
+    "short": """
+        - Provide a clear, concise expected answer
+        - Answer should be 2-3 sentences maximum
+        - Focus on key concepts from the text
+        """,
+    "long": """
+        - Provide detailed evaluation criteria
+        - Answer should demonstrate deep understanding
+        - Include specific references to the text content
+        """,
+}
+
+# Models too old for structured output get the JSON format in the prompt
+_LEGACY_MODELS = frozenset({
+    'gemini-pro', 'models/gemini-pro', 'gemini-1.0-pro', 'models/gemini-1.0-pro'
+})
+_LEGACY_JSON_FORMAT = """
+        Return ONLY valid JSON in this exact format:
+        {
+            "question": "generated question here",
+            "options": ["option1", "option2", "option3", "option4"],
+            "answer": 0,
+            "explanation": "brief explanation referencing the specific text content"
+        }
+        """
+
+def _question_template(rules: str, json_format: str = "") -> Template:
+    return Template("""
+        Create ONE question of the QUESTION TYPE below, based EXCLUSIVELY on the TEXT CONTENT at the end of this prompt.
+
+        REQUIREMENTS:
+        - Use ONLY information from the provided text
+        - Make the question specific and relevant to the content
+        - Ensure the question can be answered using ONLY the provided text
+        """ + rules + json_format + """
+        IMPORTANT: Base everything ONLY on the provided text content. Do not use external knowledge.
+
+        - Question type: $question_type_upper
+        - Difficulty: $difficulty
+        - Bloom's Taxonomy Level: $blooms_level
+
+        CONTEXT: $context
+
+        TEXT CONTENT:
+        $chunk
+        """)
+
+_QUESTION_TEMPLATES = {qtype: _question_template(rules) for qtype, rules in _QUESTION_RULES.items()}
+_GENERIC_QUESTION_TEMPLATE = _question_template("")
+_LEGACY_QUESTION_TEMPLATES = {
+    qtype: _question_template(rules, _LEGACY_JSON_FORMAT) for qtype, rules in _QUESTION_RULES.items()
+}
+_LEGACY_GENERIC_QUESTION_TEMPLATE = _question_template("", _LEGACY_JSON_FORMAT)
+
+# Structured-output schemas for generated questions. The model only writes
+# the question itself; difficulty, level, type and source are filled in after
+_MCQ_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "answer": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["question", "options", "answer", "explanation"],
+}
+_WRITTEN_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "answer": {"type": "STRING"},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["question", "answer", "explanation"],
+}
+# Generated questions are checked against these models; pydantic compiles
+# each into a validator once, at class creation
+class _WrittenQuestion(BaseModel):
+    model_config = ConfigDict(strict=True)
+
+    question: str
+    answer: str
+    explanation: str
+    difficulty: str
+    blooms_level: str
+    question_type: str
+
+class _MCQQuestion(_WrittenQuestion):
+    answer: Annotated[int, Field(ge=0, le=3)]
+    options: Annotated[List[str], Field(min_length=4, max_length=4)]
+
+    @field_validator("options")
+    @classmethod
+    def distinct_options(cls, options):
+        if len(set(options)) != len(options):
+            raise ValueError("MCQ has duplicate options")
+        return options
+
+class FallbackQuestion(dict):
+    """A question built from FALLBACK_TEMPLATES instead of by the model.
+    Serializes like any other question dict; callers that cache questions
+    check is_fallback so a failed call isn't replayed after recovery."""
+    is_fallback = True
+
+# Batched questions share one item shape; MCQ answers come back as the
+# option index in string form
+_BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "question": {"type": "STRING"},
+            "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "answer": {"type": "STRING"},
+            "explanation": {"type": "STRING"},
+        },
+        "required": ["question", "options", "answer", "explanation"],
+    },
+}
+_RESPONSE_SCHEMAS = {"mcq": _MCQ_SCHEMA, "written": _WRITTEN_SCHEMA, "batch": _BATCH_SCHEMA}
+
+# Sampling settings for question generation; they are part of the semantic
+# cache namespace, so single and batched questions share entries
+QUESTION_TEMPERATURE = 0.3
+# Output tokens allowed per question type: room for the JSON object with its
+# options, answer and explanation. Decode time and billing grow with the cap
+# actually used, and a tight cap stops a rambling answer early
+QUESTION_MAX_TOKENS = {"mcq": 400, "short": 500, "long": 900}
+
+def _question_max_tokens(question_type: str) -> int:
+    # Unknown types get the long prompt, so they get its cap too
+    return QUESTION_MAX_TOKENS.get(question_type, QUESTION_MAX_TOKENS["long"])
+
+# Questions requested per Gemini call by generate_questions_batch; a batch
+# may use the sum of its questions' QUESTION_MAX_TOKENS
+QUESTION_BATCH_SIZE = 10
+
+_BATCH_PROMPT = Template("""
+        Create ONE question for EACH numbered QUESTION below, each based EXCLUSIVELY on its own TEXT CONTENT.
+
+        REQUIREMENTS:
+        - Use ONLY information from the question's own text
+        - Make each question specific and relevant to its content
+        - Ensure each question can be answered using ONLY its own text
+        - Return a JSON array with exactly one object per QUESTION, in the same order
+
+        For MCQ questions:""" + _QUESTION_RULES["mcq"] + """- Set "answer" to the index (0-3) of the correct option
+
+        For SHORT questions:""" + _QUESTION_RULES["short"] + """- Leave "options" empty
+
+        For LONG questions:""" + _QUESTION_RULES["long"] + """- Leave "options" empty
+
+        IMPORTANT: Base everything ONLY on the provided text content. Do not use external knowledge.
+        $questions""")
+_BATCH_ITEM = Template("""
+        QUESTION $number
+        - Question type: $question_type_upper
+        - Difficulty: $difficulty
+        - Bloom's Taxonomy Level: $blooms_level
+
+        TEXT CONTENT:
+        $chunk
+        """)
+
+# Topic-extraction prompt, rendered exactly as the former per-call f-string
+# so cached topic responses stay valid
+_TOPICS_PROMPT = Template("""
+        Analyze the following educational content and extract main topics and structure.
+
+        CONTENT:
+        $combined_text
+
+        Return ONLY valid JSON in this format:
+        {
+            "main_topics": ["topic1", "topic2", "topic3"],
+            "subtopics": {
+                "topic1": ["subtopic1.1", "subtopic1.2"],
+                "topic2": ["subtopic2.1", "subtopic2.2"]
+            },
+            "knowledge_gaps": ["gap1", "gap2"],
+            "topic_density": {
+                "topic1": 0.8,
+                "topic2": 0.6
+            },
+            "blooms_distribution": {
+                "remember": 0.3,
+                "understand": 0.4,
+                "apply": 0.2,
+                "analyze": 0.1,
+                "evaluate": 0.0,
+                "create": 0.0
+            }
+        }
+
+        Base your analysis ONLY on the provided content. Be specific to the actual content.
+        """)
+
+@lru_cache(maxsize=32)
+def _cfg(temperature: float, max_tokens: int, schema_name: str = None):
+    """
+    Generation config shared by every call with the same settings; with
+    schema_name the response is JSON matching that _RESPONSE_SCHEMAS entry
+    """
+    if schema_name is None:
+        return genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens)
+    return genai.types.GenerationConfig(
+        temperature=temperature,
+        max_output_tokens=max_tokens,
+        response_mime_type="application/json",
+        response_schema=_RESPONSE_SCHEMAS[schema_name],
+    )
+
+# Prompt budgets, in tokens. Gemini averages about 4 characters per token on
+# English text; truncating on that estimate at a word boundary keeps prompt
+# sizes predictable without a tokenizer round trip per call
+CHARS_PER_TOKEN = 4
+TOPIC_TOKEN_BUDGET = 750
+QUESTION_TOKEN_BUDGET = 375
+SOURCE_SNIPPET_TOKENS = 25
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """text cut to about max_tokens tokens, ending on a whole word"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(' ', 0, limit + 1)
+    return text[:cut] if cut > 0 else text[:limit]
+
+# Topic structure used when Gemini cannot extract one. Shared by every caller
+# and never mutated; it stays a plain dict so it serializes like real topics
+_FALLBACK_TOPICS = {
+    "main_topics": ["Technical Documentation", "Professional Communication", "Content Analysis"],
+    "subtopics": {
+        "Technical Documentation": ["Report Structure", "Content Organization", "Best Practices", "Audience Adaptation"],
+        "Professional Communication": ["Clarity", "Accuracy", "Audience Adaptation", "Purpose"],
+        "Content Analysis": ["Topic Extraction", "Key Concepts", "Structure Analysis", "Application"]
+    },
+    "knowledge_gaps": ["Advanced formatting techniques", "Industry-specific standards", "Practical applications"],
+    "topic_density": {
+        "Technical Documentation": 0.7, 
+        "Professional Communication": 0.5,
+        "Content Analysis": 0.6
+    },
+    "blooms_distribution": {
+        "remember": 0.3, "understand": 0.4, "apply": 0.2,
+        "analyze": 0.1, "evaluate": 0.0, "create": 0.0
+    }
+}
+
+# Gemini requests one GeminiAI instance keeps in flight from async callers
+GEMINI_CONCURRENCY = 8
+
+# The model _find_working_model settled on, reused across restarts until it expires
+MODEL_CACHE_PATH = Path(os.getenv(
+    "GEMINI_MODEL_CACHE", Path.home() / ".cache" / "paper_generator" / "gemini_model.json"
+))
+MODEL_CACHE_TTL = 24 * 60 * 60
+
+# Rate limits and server-side failures clear up on their own; anything else
+# (bad request, invalid key, blocked prompt) fails the same way on retry
+_RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    ConnectionError,
+    TimeoutError,
+)
+GEMINI_MAX_ATTEMPTS = 4
+BACKOFF_MAX = 20  # seconds
+# After this many calls in a row fail, calls skip the API for CIRCUIT_COOLDOWN
+# seconds and return None straight away, so callers use their fallbacks
+CIRCUIT_FAILURE_LIMIT = 10
+CIRCUIT_COOLDOWN = 60  # seconds
+
+def _backoff(attempt: int) -> float:
+    """Seconds before retry attempt + 1: exponential with full jitter, capped at BACKOFF_MAX"""
+    return random.uniform(0, min(BACKOFF_MAX, 2 ** attempt))
 
 class GeminiAI:
     def __init__(self, api_key=None):
+        self._semaphore = None  # created on first async call
+        self._circuit_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._circuit_open_until = 0.0
+        self.structured_output = False
         self.api_key = api_key or os.getenv('GOOGLE_API_KEY')
-        print(f"🔑 Gemini API Key: {'***' + self.api_key[-4:] if self.api_key else 'NOT SET'}")
+        logger.info("Gemini API key: %s", '***' + self.api_key[-4:] if self.api_key else 'NOT SET')
         
         if not self.api_key:
-            print("❌ No Google API key found")
+            logger.warning("No Google API key found")
             self.available = False
             return
 
         try:
-            genai.configure(api_key=self.api_key)
+            configure_genai(self.api_key)
             
             # Find a working model
             working_model = self._find_working_model()
             if working_model:
+                self.model_name = working_model
                 self.model = genai.GenerativeModel(working_model)
+                self.structured_output = working_model not in _LEGACY_MODELS
+                self.cache = LLMCache()
+                self.semantic_cache = SemanticCache() if EMBEDDER_AVAILABLE else None
                 self.available = True
-                print(f"✅ Gemini AI configured successfully with model: {working_model}")
+                logger.info("Gemini AI configured with model: %s", working_model)
             else:
-                print("❌ No working Gemini model found")
+                logger.error("No working Gemini model found")
                 self.available = False
                 
         except Exception as e:
-            print(f"❌ Error configuring Gemini: {e}")
+            logger.error("Error configuring Gemini: %s", e)
             self.available = False
 
     def _find_working_model(self):
         """Find a working Gemini model with the current API key"""
+        try:
+            entry = json.loads(MODEL_CACHE_PATH.read_text())
+            if time.time() - entry["ts"] < MODEL_CACHE_TTL:
+                logger.debug("Using cached model: %s", entry["model"])
+                return entry["model"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
         model_attempts = [
-            'gemini-pro',           # Most widely available
-            'models/gemini-pro',    # Alternative format
-            'gemini-1.0-pro',       # Version-specific
-            'models/gemini-1.0-pro',
-            'gemini-1.5-flash',     # Newer models
+            'gemini-1.5-flash',     # Fastest and cheapest
             'models/gemini-1.5-flash',
             'gemini-1.5-pro',
-            'models/gemini-1.5-pro'
+            'models/gemini-1.5-pro',
+            'gemini-pro',           # Older, widely available
+            'models/gemini-pro',    # Alternative format
+            'gemini-1.0-pro',       # Version-specific
+            'models/gemini-1.0-pro'
         ]
         
-        for model_name in model_attempts:
-            try:
-                print(f"🔄 Testing model: {model_name}")
-                test_model = genai.GenerativeModel(model_name)
-                # Quick test with minimal content
-                test_response = test_model.generate_content(
-                    "Say 'OK'",
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=10,
-                        temperature=0.1
-                    )
-                )
-                if test_response.text:
-                    print(f"✅ Model {model_name} is working")
+        # Probe every candidate at once, but keep the list's priority: results
+        # are read in list order, so a working model is chosen only once every
+        # model ranked above it has failed. The pool is not joined, so probes
+        # for lower-ranked models finish in the background.
+        executor = ThreadPoolExecutor(max_workers=len(model_attempts), thread_name_prefix="gemini-probe")
+        try:
+            futures = [executor.submit(self._probe, name) for name in model_attempts]
+            for model_name, future in zip(model_attempts, futures):
+                if future.result():
+                    self._remember_model(model_name)
                     return model_name
-            except Exception as e:
-                print(f"❌ Model {model_name} failed: {str(e)[:80]}")
-                continue
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
         return None
 
-    def generate_content(self, prompt, temperature=0.7, max_tokens=1000):
-        """Generate content using Gemini with retry logic"""
+    @staticmethod
+    def _probe(model_name):
+        """Whether model_name answers a minimal request"""
+        try:
+            logger.debug("Testing model: %s", model_name)
+            test_model = genai.GenerativeModel(model_name)
+            # Quick test with minimal content
+            test_response = test_model.generate_content(
+                "Say 'OK'",
+                generation_config=_cfg(0.1, 10)
+            )
+            if test_response.text:
+                logger.debug("Model %s is working", model_name)
+                return True
+        except Exception as e:
+            logger.debug("Model %s failed: %.80s", model_name, e)
+        return False
+
+    @staticmethod
+    def _remember_model(model_name):
+        try:
+            MODEL_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            MODEL_CACHE_PATH.write_text(json.dumps({"model": model_name, "ts": time.time()}))
+        except OSError as e:
+            logger.warning("Could not cache model choice: %s", e)
+
+    def _semantic_namespace(self, kind, temperature, max_tokens):
+        return f"{kind}|{self.model_name}|{temperature}|{max_tokens}"
+
+    def _question_namespace(self, spec):
+        kind = f"{spec['question_type']}:{spec['difficulty']}:{spec['blooms_level']}"
+        return self._semantic_namespace(kind, QUESTION_TEMPERATURE, _question_max_tokens(spec['question_type']))
+
+    def _question_key(self, spec, chunk_text):
+        """LLMCache key of a single batched question, tied to the model like a prompt key"""
+        kind = f"question|{spec['question_type']}|{spec['difficulty']}|{spec['blooms_level']}"
+        return cache_key(self.model_name, f"{kind}\n{chunk_text}", QUESTION_TEMPERATURE, _question_max_tokens(spec['question_type']))
+
+    def _cached_response(self, prompt, temperature, max_tokens, semantic_key):
+        """
+        Look a call up in the response caches.
+        Returns (response, store): response is None on a miss, and store(text)
+        records a fresh response under every cache key probed.
+        """
+        # Identical prompts (retries, re-runs on the same document) are
+        # answered from the persistent cache
+        key = cache_key(self.model_name, prompt, temperature, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, None
+        
+        semantic_vector = None
+        if semantic_key and self.semantic_cache:
+            kind, source_text = semantic_key
+            namespace = self._semantic_namespace(kind, temperature, max_tokens)
+            semantic_vector = self.semantic_cache.embed(source_text)
+            similar = self.semantic_cache.lookup(namespace, semantic_vector)
+            if similar is not None:
+                logger.debug("Reusing response for similar %s content", kind)
+                return similar, None
+        
+        def store(text):
+            self.cache.set(key, text)
+            if semantic_vector is not None:
+                self.semantic_cache.add(namespace, semantic_vector, text)
+        
+        return None, store
+
+    def _circuit_open(self) -> bool:
+        """Whether calls are skipping the API after too many consecutive failures"""
+        if time.monotonic() < self._circuit_open_until:
+            logger.debug("Gemini circuit open, skipping API call")
+            return True
+        return False
+
+    def _record_call(self, ok: bool):
+        """Count a finished call toward opening the circuit (failure) or reset the count (success)"""
+        with self._circuit_lock:
+            if ok:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= CIRCUIT_FAILURE_LIMIT:
+                logger.error("%d Gemini calls failed in a row, pausing API calls for %ds",
+                             self._consecutive_failures, CIRCUIT_COOLDOWN)
+                self._circuit_open_until = time.monotonic() + CIRCUIT_COOLDOWN
+                self._consecutive_failures = 0
+
+    def generate_content(self, prompt, temperature=0.7, max_tokens=1000, semantic_key=None, schema_name=None):
+        """
+        Generate content using Gemini with retry logic.
+        semantic_key, a (kind, source_text) pair, also reuses the response of
+        an earlier call of the same kind whose source text was near-identical.
+        With schema_name the model returns JSON matching that _RESPONSE_SCHEMAS entry.
+        """
         if not self.available:
-            print("❌ Gemini not available")
+            logger.error("Gemini not available")
+            return None
+        
+        cached, store = self._cached_response(prompt, temperature, max_tokens, semantic_key)
+        if cached is not None:
+            return cached
+        if self._circuit_open():
             return None
         
         # Retry logic for API calls
-        max_retries = 3
-        for attempt in range(max_retries):
+        for attempt in range(GEMINI_MAX_ATTEMPTS):
             try:
-                print(f"🔄 Gemini API call attempt {attempt + 1}/{max_retries}")
+                logger.debug("Gemini API call attempt %d/%d", attempt + 1, GEMINI_MAX_ATTEMPTS)
                 response = self.model.generate_content(
                     prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=temperature,
-                        max_output_tokens=max_tokens,
-                    )
+                    generation_config=_cfg(temperature, max_tokens, schema_name)
                 )
-                print("✅ Gemini response received")
+                logger.debug("Gemini response received")
+                self._record_call(True)
+                store(response.text)
                 return response.text
                 
             except Exception as e:
-                print(f"❌ Gemini API error (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    print(f"⏳ Waiting {wait_time}s before retry...")
+                logger.warning("Gemini API error (attempt %d): %s", attempt + 1, e)
+                if isinstance(e, _RETRYABLE_ERRORS) and attempt < GEMINI_MAX_ATTEMPTS - 1:
+                    wait_time = _backoff(attempt)
+                    logger.debug("Waiting %.1fs before retry", wait_time)
                     time.sleep(wait_time)
                 else:
-                    print("❌ All Gemini API retries failed")
+                    logger.error("Gemini API call failed")
+                    self._record_call(False)
                     return None
         
         return None
 
-    def extract_topics(self, chunks: List[str]) -> Dict[str, Any]:
-        """Extract topics and subtopics from text chunks"""
-        if not self.available:
-            print("❌ Gemini not available for topic extraction")
-            return self._get_fallback_topics()
-
+    async def agenerate_content(self, prompt, temperature=0.7, max_tokens=1000, semantic_key=None, schema_name=None):
+        """
+        generate_content for async callers: the call, with its caching, retries
+        and circuit breaker, runs in a worker thread, so concurrent callers
+        overlap their round trips, at most GEMINI_CONCURRENCY in flight per instance
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        async with self._semaphore:
+            return await asyncio.to_thread(
+                self.generate_content, prompt, temperature, max_tokens, semantic_key, schema_name
+            )
+
+    def _build_topics_prompt(self, chunks: List[str]):
+        """Topic-extraction prompt and the content it was built from"""
         # Use more chunks for better topic extraction
-        combined_text = " ".join(chunks[:5])[:3000]  # Use first 5 chunks, limit to 3000 chars
-        print(f"🔄 Extracting topics from {len(combined_text)} characters...")
-
-        prompt = f"""
-        Analyze the following educational content and extract main topics and structure.
-
-        CONTENT:
-        {combined_text}
-
-        Return ONLY valid JSON in this format:
-        {{
-            "main_topics": ["topic1", "topic2", "topic3"],
-            "subtopics": {{
-                "topic1": ["subtopic1.1", "subtopic1.2"],
-                "topic2": ["subtopic2.1", "subtopic2.2"]
-            }},
-            "knowledge_gaps": ["gap1", "gap2"],
-            "topic_density": {{
-                "topic1": 0.8,
-                "topic2": 0.6
-            }},
-            "blooms_distribution": {{
-                "remember": 0.3,
-                "understand": 0.4,
-                "apply": 0.2,
-                "analyze": 0.1,
-                "evaluate": 0.0,
-                "create": 0.0
-            }}
-        }}
+        combined_text = _truncate_tokens(" ".join(chunks[:5]), TOPIC_TOKEN_BUDGET)  # Use first 5 chunks
+        logger.debug("Extracting topics from %d characters", len(combined_text))
 
-        Base your analysis ONLY on the provided content. Be specific to the actual content.
-        """
+        prompt = _TOPICS_PROMPT.substitute(combined_text=combined_text)
+        return prompt, combined_text
 
-        response = self.generate_content(prompt, temperature=0.3)
+    def _parse_topics(self, response) -> Dict[str, Any]:
         if response:
             try:
                 # Extract JSON from response
-                json_str = self._extract_json_from_response(response)
-                result = json.loads(json_str)
-                print("✅ Topics extracted successfully")
+                result = self._extract_json(response)
+                logger.debug("Topics extracted successfully")
                 return result
             except Exception as e:
-                print(f"❌ Failed to parse topics JSON: {e}")
-                print(f"Raw response: {response[:500]}...")
+                logger.error("Failed to parse topics JSON: %s", e)
+                logger.debug("Raw response: %.500s", response)
 
-        print("🔄 Using fallback topics")
+        logger.warning("Using fallback topics")
         return self._get_fallback_topics()
 
-    def generate_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str = "mcq") -> Dict[str, Any]:
-        """Generate question using Gemini AI"""
-        print(f"🔄 Generating {question_type} question from {len(chunk)} chars...")
-        
+    def extract_topics(self, chunks: List[str]) -> Dict[str, Any]:
+        """Extract topics and subtopics from text chunks"""
         if not self.available:
-            print(f"❌ Gemini not available, using fallback for {question_type}")
-            return self._get_contextual_fallback_question(chunk, difficulty, blooms_level, question_type)
+            logger.warning("Gemini not available for topic extraction")
+            return self._get_fallback_topics()
 
-        prompt = self._build_question_prompt(chunk, difficulty, blooms_level, question_type)
-        response = self.generate_content(prompt, temperature=0.3)
-        
+        prompt, combined_text = self._build_topics_prompt(chunks)
+        response = self.generate_content(prompt, temperature=0.3, semantic_key=("topics", combined_text))
+        return self._parse_topics(response)
+
+    async def aextract_topics(self, chunks: List[str]) -> Dict[str, Any]:
+        """extract_topics for async callers"""
+        if not self.available:
+            logger.warning("Gemini not available for topic extraction")
+            return self._get_fallback_topics()
+
+        prompt, combined_text = self._build_topics_prompt(chunks)
+        response = await self.agenerate_content(prompt, temperature=0.3, semantic_key=("topics", combined_text))
+        return self._parse_topics(response)
+
+    def _parse_question(self, response, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
+        question_data = None
         if response:
             try:
-                json_str = self._extract_json_from_response(response)
-                question_data = json.loads(json_str)
-                
-                # Validate the question data
-                if self._validate_question(question_data, question_type):
-                    print(f"✅ {question_type} question generated successfully")
-                    return question_data
-                    
+                if self.structured_output:
+                    question_data = json.loads(response)
+                else:
+                    question_data = self._extract_json(response)
             except Exception as e:
-                print(f"❌ Failed to parse question JSON: {e}")
-                print(f"Raw response: {response[:200]}...")
+                logger.error("Failed to parse question JSON: %s", e)
+                logger.debug("Raw response: %.200s", response)
+        return self._finish_question(question_data, chunk, difficulty, blooms_level, question_type)
+
+    def _finish_question(self, question_data, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
+        """Complete and validate a generated question, or fall back to a contextual one"""
+        if isinstance(question_data, dict):
+            question_data.setdefault("options", [])
+            question_data.update({
+                "difficulty": difficulty,
+                "blooms_level": blooms_level,
+                "question_type": question_type,
+                "source_chunk": _truncate_tokens(chunk, SOURCE_SNIPPET_TOKENS) + "..."
+            })
+            
+            # Validate the question data
+            if self._validate_question(question_data, question_type):
+                logger.debug("%s question generated successfully", question_type)
+                return question_data
 
-        print(f"🔄 Using fallback for {question_type} question")
+        logger.warning("Using fallback for %s question", question_type)
         return self._get_contextual_fallback_question(chunk, difficulty, blooms_level, question_type)
 
-    def _extract_json_from_response(self, response: str) -> str:
-        """Extract JSON from API response"""
-        # Remove markdown code blocks if present
-        if '```json' in response:
-            response = response.split('```json')[1].split('```')[0]
-        elif '```' in response:
-            response = response.split('```')[1].split('```')[0]
-        
-        # Find JSON object
-        start = response.find('{')
-        end = response.rfind('}') + 1
-        
-        if start != -1 and end != 0:
-            return response[start:end]
+    def generate_questions_batch(self, specs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Generate one question per spec, a dict with chunk, difficulty,
+        blooms_level and question_type, asking for up to QUESTION_BATCH_SIZE
+        questions per Gemini call and running the calls concurrently.
+        Results are in spec order; any question the model gets wrong is
+        replaced by a contextual fallback.
+        """
+        if not self.available:
+            return [self.generate_question(**spec) for spec in specs]
+        if not self.structured_output:
+            # One call per question, GEMINI_CONCURRENCY of them in flight
+            with ThreadPoolExecutor(max_workers=GEMINI_CONCURRENCY, thread_name_prefix="gemini") as executor:
+                return list(executor.map(lambda spec: self.generate_question(**spec), specs))
+
+        questions = [None] * len(specs)
+        texts = [_truncate_tokens(spec["chunk"], QUESTION_TOKEN_BUDGET) for spec in specs]
+        # Questions are also stored one by one, so a chunk asked about in an
+        # earlier run is answered from disk whatever batch it lands in now
+        keys = [self._question_key(spec, text) for spec, text in zip(specs, texts)]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                pending.append(i)
+            else:
+                questions[i] = self._parse_question(cached, **specs[i])
         
-        return response.strip()
+        vectors = None
+        if self.semantic_cache and pending:
+            # Near-duplicates of chunks asked about earlier, singly or in a
+            # batch, reuse those questions; all chunks embed in one pass
+            vectors = dict(zip(pending, self.semantic_cache.embed_many(texts[i] for i in pending)))
+            misses = []
+            for i in pending:
+                similar = self.semantic_cache.lookup(self._question_namespace(specs[i]), vectors[i])
+                if similar is None:
+                    misses.append(i)
+                else:
+                    questions[i] = self._parse_question(similar, **specs[i])
+            pending = misses
+        if len(pending) < len(specs):
+            logger.debug("Reusing %d cached questions", len(specs) - len(pending))
+
+        # Batches are independent, so their calls overlap
+        batches = [pending[start:start + QUESTION_BATCH_SIZE] for start in range(0, len(pending), QUESTION_BATCH_SIZE)]
+        if batches:
+            workers = min(GEMINI_CONCURRENCY, len(batches))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini") as executor:
+                results = executor.map(lambda batch_idx: self._generate_batch([specs[i] for i in batch_idx]), batches)
+                for batch_idx, (batch_questions, valid) in zip(batches, results):
+                    for i, question, ok in zip(batch_idx, batch_questions, valid):
+                        questions[i] = question
+                        if ok:
+                            text = json.dumps(question)
+                            self.cache.set(keys[i], text)
+                            if vectors is not None:
+                                self.semantic_cache.add(self._question_namespace(specs[i]), vectors[i], text)
+        return questions
+
+    def _generate_batch(self, batch: List[Dict[str, str]]):
+        """One Gemini call for a batch of specs; returns _parse_question_batch's result"""
+        logger.debug("Generating %d questions in one call", len(batch))
+        prompt = _BATCH_PROMPT.substitute(questions="".join(
+            _BATCH_ITEM.substitute(
+                number=number,
+                question_type_upper=spec["question_type"].upper(),
+                difficulty=spec["difficulty"],
+                blooms_level=spec["blooms_level"],
+                chunk=_truncate_tokens(spec["chunk"], QUESTION_TOKEN_BUDGET)
+            )
+            for number, spec in enumerate(batch, 1)
+        ))
+        response = self.generate_content(
+            prompt, temperature=QUESTION_TEMPERATURE,
+            max_tokens=sum(_question_max_tokens(spec["question_type"]) for spec in batch),
+            schema_name="batch"
+        )
+        return self._parse_question_batch(response, batch)
+
+    def _parse_question_batch(self, response, batch: List[Dict[str, str]]):
+        """Questions for a batch response in spec order, and whether each came from the model"""
+        items = []
+        if response:
+            try:
+                items = json.loads(response)
+            except ValueError as e:
+                logger.error("Failed to parse question batch JSON: %s", e)
+                logger.debug("Raw response: %.200s", response)
+        if not isinstance(items, list):
+            items = []
+        if len(items) != len(batch):
+            logger.warning("Question batch returned %d of %d questions", len(items), len(batch))
+
+        questions, valid = [], []
+        for i, spec in enumerate(batch):
+            item = items[i] if i < len(items) else None
+            if spec["question_type"] == "mcq" and isinstance(item, dict):
+                try:
+                    item["answer"] = int(item["answer"])
+                except (KeyError, TypeError, ValueError):
+                    item = None
+            question = self._finish_question(item, **spec)
+            questions.append(question)
+            valid.append(question is item)
+        return questions, valid
 
-    def _build_question_prompt(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> str:
-        """Build specific prompt for each question type"""
-        # Extract context from chunk for better prompts
-        context_words = chunk.split()[:15]
-        context = " ".join(context_words)
+    def generate_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str = "mcq") -> Dict[str, Any]:
+        """Generate question using Gemini AI"""
+        logger.debug("Generating %s question from %d chars", question_type, len(chunk))
         
-        base_prompt = f"""
-        Create ONE {question_type.upper()} question based EXCLUSIVELY on the following text.
-
-        TEXT CONTENT:
-        {chunk[:1500]}
-
-        CONTEXT: {context}
+        if not self.available:
+            logger.warning("Gemini not available, using fallback for %s", question_type)
+            return self._get_contextual_fallback_question(chunk, difficulty, blooms_level, question_type)
 
-        REQUIREMENTS:
-        - Difficulty: {difficulty}
-        - Bloom's Taxonomy Level: {blooms_level}
-        - Use ONLY information from the provided text
-        - Make the question specific and relevant to the content
-        - Ensure the question can be answered using ONLY the provided text
+        prompt = self._build_question_prompt(chunk, difficulty, blooms_level, question_type)
+        response = self.generate_content(
+            prompt, temperature=QUESTION_TEMPERATURE, max_tokens=_question_max_tokens(question_type),
+            semantic_key=(f"{question_type}:{difficulty}:{blooms_level}", _truncate_tokens(chunk, QUESTION_TOKEN_BUDGET)),
+            schema_name=self._question_schema(question_type)
+        )
+        return self._parse_question(response, chunk, difficulty, blooms_level, question_type)
+
+    def _extract_json(self, response: str) -> Dict[str, Any]:
         """
-
-        if question_type == "mcq":
-            base_prompt += """
-            - Provide EXACTLY 4 distinct options
-            - One option must be clearly correct based on the text
-            - Options should be plausible but distinct
-            - Avoid "all of the above" or "none of the above"
-            """
-        elif question_type == "short":
-            base_prompt += """
-            - Provide a clear, concise expected answer
-            - Answer should be 2-3 sentences maximum
-            - Focus on key concepts from the text
-            """
-        elif question_type == "long":
-            base_prompt += """
-            - Provide detailed evaluation criteria
-            - Answer should demonstrate deep understanding
-            - Include specific references to the text content
-            """
-
-        json_format = '''
-        {
-            "question": "generated question here",
-            "options": ["option1", "option2", "option3", "option4"],
-            "answer": 0,
-            "explanation": "brief explanation referencing the specific text content",
-            "difficulty": "''' + difficulty + '''",
-            "blooms_level": "''' + blooms_level + '''",
-            "question_type": "''' + question_type + '''",
-            "source_chunk": "''' + chunk[:100] + '''..."
-        }
-        '''
-
-        base_prompt += f"""
-        Return ONLY valid JSON in this exact format:
-        {json_format}
-
-        IMPORTANT: Base everything ONLY on the provided text content. Do not use external knowledge.
+        Parse the first complete JSON object in an API response, skipping a
+        leading markdown fence and any prose before the object.
+        Raises ValueError if the response holds no complete object.
         """
+        fence = _FENCE_RE.match(response)
+        start = response.find('{', fence.end() if fence else 0)
+        while start != -1:
+            try:
+                # raw_decode stops at the end of the object, so a closing
+                # fence or trailing text needs no separate pass
+                result, _ = _JSON_DECODER.raw_decode(response, start)
+                if isinstance(result, dict):
+                    return result
+            except ValueError:
+                pass
+            start = response.find('{', start + 1)
+        raise ValueError("no complete JSON object in response")
 
-        return base_prompt
+    def _build_question_prompt(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> str:
+        """Build specific prompt for each question type"""
+        if self.structured_output:
+            template = _QUESTION_TEMPLATES.get(question_type, _GENERIC_QUESTION_TEMPLATE)
+        else:
+            template = _LEGACY_QUESTION_TEMPLATES.get(question_type, _LEGACY_GENERIC_QUESTION_TEMPLATE)
+        return template.substitute(
+            question_type_upper=question_type.upper(),
+            difficulty=difficulty,
+            blooms_level=blooms_level,
+            # Extract context from chunk for better prompts
+            context=" ".join(chunk.split()[:15]),
+            chunk=_truncate_tokens(chunk, QUESTION_TOKEN_BUDGET)
+        )
+
+    def _question_schema(self, question_type: str):
+        """Response schema name for a question type, or None if the model predates structured output"""
+        if not self.structured_output:
+            return None
+        return "mcq" if question_type == "mcq" else "written"
 
     def _validate_question(self, question_data: Dict, question_type: str) -> bool:
         """Validate generated question data"""
-        required_fields = ["question", "answer", "explanation", "difficulty", "blooms_level", "question_type"]
-        
-        for field in required_fields:
-            if field not in question_data:
-                print(f"❌ Missing required field: {field}")
-                return False
-        
-        if question_type == "mcq":
-            if "options" not in question_data or len(question_data["options"]) != 4:
-                print("❌ MCQ must have exactly 4 options")
-                return False
-                
-            # Check for duplicate options
-            if len(set(question_data["options"])) != len(question_data["options"]):
-                print("❌ MCQ has duplicate options")
-                return False
-        
+        model = _MCQQuestion if question_type == "mcq" else _WrittenQuestion
+        try:
+            model.model_validate(question_data)
+        except ValidationError as e:
+            logger.warning("Invalid %s question: %s", question_type, e)
+            return False
         return True
 
     def _get_contextual_fallback_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
         """Create contextual fallback questions based on content"""
         # Extract context from the chunk for more relevant questions
-        chunk_words = chunk.split()[:20]
-        context = " ".join(chunk_words)
-        chunk_lower = chunk.lower()
+        context = " ".join(chunk.split()[:20])
+        chunk_words = frozenset(_WORD_RE.findall(chunk.lower()))
         
         # Determine content type for better contextual questions
-        if any(word in chunk_lower for word in ['technical', 'report', 'documentation', 'manual']):
-            return self._get_tech_report_question(context, difficulty, blooms_level, question_type)
-        elif any(word in chunk_lower for word in ['research', 'method', 'study', 'experiment']):
-            return self._get_research_question(context, difficulty, blooms_level, question_type)
-        elif any(word in chunk_lower for word in ['data', 'analysis', 'statistic', 'result']):
-            return self._get_data_question(context, difficulty, blooms_level, question_type)
-        elif any(word in chunk_lower for word in ['computer', 'software', 'system', 'algorithm']):
-            return self._get_computer_science_question(context, difficulty, blooms_level, question_type)
-        else:
-            return self._get_general_question(context, difficulty, blooms_level, question_type)
-
-    def _get_tech_report_question(self, context: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-        """Technical report related questions"""
-        base = {
+        family = next(
+            (name for keywords, name in _FAMILY_KEYWORDS if keywords & chunk_words), "general"
+        )
+        return self._render_fallback(family, context, difficulty, blooms_level, question_type)
+
+    def _render_fallback(self, family: str, context: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
+        """Fallback question of a content family, filled in with context"""
+        templates = FALLBACK_TEMPLATES[family]
+        template = templates.get(question_type) or templates["long"]
+        answer = template["answer"]
+        return FallbackQuestion({
             "difficulty": difficulty,
             "blooms_level": blooms_level,
             "question_type": question_type,
-            "explanation": f"Based on technical content about {context}",
-            "source_chunk": f"Technical content: {context}..."
-        }
-        
-        if question_type == "mcq":
-            base.update({
-                "question": f"What is the primary purpose of technical documentation regarding {context}?",
-                "options": [
-                    f"To entertain readers interested in {context}",
-                    f"To convey technical information about {context} objectively and factually",
-                    f"To promote commercial products related to {context}",
-                    f"To tell fictional stories about {context}"
-                ],
-                "answer": 1
-            })
-        elif question_type == "short":
-            base.update({
-                "question": f"Explain the key characteristics of effective technical documentation for {context}.",
-                "answer": f"Effective technical documentation for {context} should be clear, concise, objective, well-structured, and evidence-based with proper documentation of methods and findings specific to this domain.",
-                "options": []
-            })
-        else:  # long
-            base.update({
-                "question": f"Discuss the importance of proper structure and documentation in technical reports about {context} for professional communication.",
-                "answer": f"Proper structure ensures logical flow and readability for {context} topics, while comprehensive documentation provides credibility, enables reproducibility, facilitates peer review, and serves as a permanent record for future reference and knowledge transfer in this technical domain.",
-                "options": []
-            })
-        
-        return base
-
-    def _get_research_question(self, context: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-        """Research methodology questions"""
-        base = {
-            "difficulty": difficulty,
-            "blooms_level": blooms_level,
-            "question_type": question_type,
-            "explanation": f"Based on research methodology content about {context}",
-            "source_chunk": f"Research content: {context}..."
-        }
-        
-        if question_type == "mcq":
-            base.update({
-                "question": f"What is the main purpose of research methodology in studying {context}?",
-                "options": [
-                    f"To make research on {context} more complicated",
-                    f"To ensure systematic and valid investigation of {context}",
-                    f"To increase the length of research papers about {context}", 
-                    f"To satisfy academic requirements only for {context}"
-                ],
-                "answer": 1
-            })
-        elif question_type == "short":
-            base.update({
-                "question": f"Describe the key components of a research methodology section for studying {context}.",
-                "answer": f"A research methodology section for {context} should include research design, population and sampling, data collection methods specific to this topic, data analysis techniques, and ethical considerations relevant to the study.",
-                "options": []
-            })
-        else:  # long
-            base.update({
-                "question": f"Analyze the importance of selecting appropriate research methods for studying {context} compared to other topics.",
-                "answer": f"Appropriate research methods ensure validity and reliability of findings about {context}. Quantitative methods suit hypothesis testing in this domain, qualitative methods explore complex phenomena, and mixed methods provide comprehensive insights. Method selection depends on research questions about {context}, available resources, and epistemological stance.",
-                "options": []
-            })
-        
-        return base
-
-    def _get_data_question(self, context: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-        """Data analysis questions"""
-        base = {
-            "difficulty": difficulty,
-            "blooms_level": blooms_level,
-            "question_type": question_type,
-            "explanation": f"Based on data analysis principles applied to {context}",
-            "source_chunk": f"Data analysis content: {context}..."
-        }
-        
-        if question_type == "mcq":
-            base.update({
-                "question": f"What is the primary goal of data analysis for {context}?",
-                "options": [
-                    f"To collect as much data as possible about {context}",
-                    f"To extract meaningful insights and patterns from data about {context}",
-                    f"To create colorful charts and graphs for {context}",
-                    f"To prove predetermined conclusions about {context}"
-                ],
-                "answer": 1
-            })
-        elif question_type == "short":
-            base.update({
-                "question": f"Explain how descriptive and inferential statistics differ when analyzing {context}.",
-                "answer": f"Descriptive statistics summarize and describe data features about {context} (mean, median, mode), while inferential statistics make predictions or inferences about populations based on sample data related to {context}.",
-                "options": []
-            })
-        else:  # long
-            base.update({
-                "question": f"Discuss the importance of data quality and preprocessing specifically for analyzing {context}.",
-                "answer": f"Data quality ensures accurate results for {context}; preprocessing handles missing values, outliers, and normalization specific to this domain. Poor data quality leads to misleading conclusions about {context}, while proper preprocessing enhances model performance and reliability of insights for this topic.",
-                "options": []
-            })
-        
-        return base
-
-    def _get_computer_science_question(self, context: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-        """Computer science questions"""
-        base = {
-            "difficulty": difficulty,
-            "blooms_level": blooms_level,
-            "question_type": question_type,
-            "explanation": f"Based on computer science principles related to {context}",
-            "source_chunk": f"Computer science content: {context}..."
-        }
-        
-        if question_type == "mcq":
-            base.update({
-                "question": f"What is the primary goal of software engineering principles applied to {context}?",
-                "options": [
-                    f"To write code for {context} as quickly as possible",
-                    f"To develop reliable, maintainable software systems for {context} efficiently",
-                    f"To use the latest programming languages and frameworks for {context}",
-                    f"To create software for {context} with the most features"
-                ],
-                "answer": 1
-            })
-        elif question_type == "short":
-            base.update({
-                "question": f"Explain the importance of algorithms specifically for {context} in computer science.",
-                "answer": f"Algorithms provide step-by-step procedures for solving problems efficiently in {context}, enabling automation, optimization, and reliable computation across various applications and systems in this domain.",
-                "options": []
-            })
-        else:  # long
-            base.update({
-                "question": f"Discuss the role of data structures and algorithms in building efficient software systems for {context}.",
-                "answer": f"Data structures organize and store data efficiently for {context}, while algorithms process this data effectively. Together they enable optimized performance, scalability, and maintainability in software systems for {context}, impacting everything from response times to resource utilization and system reliability in this specific application domain.",
-                "options": []
-            })
-        
-        return base
-
-    def _get_general_question(self, context: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-        """General knowledge questions"""
-        base = {
-            "difficulty": difficulty,
-            "blooms_level": blooms_level,
-            "question_type": question_type,
-            "explanation": f"Based on academic content about {context}",
-            "source_chunk": f"Academic content: {context}..."
-        }
-        
-        if question_type == "mcq":
-            base.update({
-                "question": f"What is the main purpose of academic writing about {context}?",
-                "options": [
-                    f"To entertain readers with creative stories about {context}",
-                    f"To present information and arguments about {context} clearly and logically",
-                    f"To use complex vocabulary to impress readers about {context}",
-                    f"To summarize existing knowledge about {context} without analysis"
-                ],
-                "answer": 1
-            })
-        elif question_type == "short":
-            base.update({
-                "question": f"Explain the importance of critical thinking specifically for academic work on {context}.",
-                "answer": f"Critical thinking enables objective analysis of {context}, evaluation of evidence, identification of biases, and development of well-reasoned arguments, leading to more robust and credible academic work in this specific domain.",
-                "options": []
-            })
-        else:  # long
-            base.update({
-                "question": f"Discuss the role of proper citation and referencing specifically for academic work on {context}.",
-                "answer": f"Proper citation acknowledges original authors in {context} research, avoids plagiarism, enables verification of sources, demonstrates research depth in this field, and contributes to scholarly conversation. It maintains academic integrity and builds credibility for research specifically about {context}.",
-                "options": []
-            })
-        
-        return base
+            "explanation": templates["explanation"].format(context=context),
+            "source_chunk": templates["source_chunk"].format(context=context),
+            "question": template["question"].format(context=context),
+            "options": [option.format(context=context) for option in template.get("options", ())],
+            "answer": answer.format(context=context) if isinstance(answer, str) else answer
+        })
 
     def _get_fallback_topics(self):
         """Return fallback topic structure"""
-        return {
-            "main_topics": ["Technical Documentation", "Professional Communication", "Content Analysis"],
-            "subtopics": {
-                "Technical Documentation": ["Report Structure", "Content Organization", "Best Practices", "Audience Adaptation"],
-                "Professional Communication": ["Clarity", "Accuracy", "Audience Adaptation", "Purpose"],
-                "Content Analysis": ["Topic Extraction", "Key Concepts", "Structure Analysis", "Application"]
-            },
-            "knowledge_gaps": ["Advanced formatting techniques", "Industry-specific standards", "Practical applications"],
-            "topic_density": {
-                "Technical Documentation": 0.7, 
-                "Professional Communication": 0.5,
-                "Content Analysis": 0.6
-            },
-            "blooms_distribution": {
-                "remember": 0.3, "understand": 0.4, "apply": 0.2,
-                "analyze": 0.1, "evaluate": 0.0, "create": 0.0
-            }
-        }
\ No newline at end of file
+        return _FALLBACK_TOPICS
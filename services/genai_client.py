@@ -0,0 +1,18 @@
+# services/genai_client.py
+import threading
+
+import google.generativeai as genai
+
+# genai keeps one client (and its gRPC channel) per process and service, but
+# every genai.configure call discards them. Configuring once per API key lets
+# all GeminiAI / GeminiEmbedder instances share the same keep-alive channel
+_configured_key = None
+_lock = threading.Lock()
+
+def configure_genai(api_key: str):
+    """Point google-generativeai at api_key, reusing the existing clients if it already is"""
+    global _configured_key
+    with _lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key, transport="grpc")
+            _configured_key = api_key
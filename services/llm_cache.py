@@ -0,0 +1,120 @@
+# services/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from chunker.embedder import HASH_EMBEDDINGS, embed_chunks
+    # Without a real model, "similar" hash vectors are unrelated texts
+    EMBEDDER_AVAILABLE = not HASH_EMBEDDINGS
+except ImportError:
+    EMBEDDER_AVAILABLE = False
+
+LLM_CACHE_DB = Path(os.getenv("LLM_CACHE_DB", "llm_cache.db"))
+LLM_CACHE_TTL = 7 * 86400  # seconds
+# Responses are reused for texts at least this cosine-similar, per namespace
+SEMANTIC_THRESHOLD = 0.92
+MAX_SEMANTIC_ENTRIES = 4096  # per namespace
+
+def cache_key(model_name, prompt, temperature, max_tokens):
+    """SHA-256 of everything that determines a Gemini response"""
+    payload = json.dumps(
+        {"m": model_name, "p": prompt, "t": temperature, "mt": max_tokens},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class LLMCache:
+    """Persistent prompt -> response text store, so repeated prompts skip the API"""
+
+    def __init__(self, path=LLM_CACHE_DB, ttl=LLM_CACHE_TTL):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache("
+            "key TEXT PRIMARY KEY, response TEXT, ts REAL)"
+        )
+
+    def get(self, key):
+        """Cached response for key, or None if missing or expired"""
+        row = self.conn.execute(
+            "SELECT response FROM cache WHERE key = ? AND ts > ?",
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, response):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+            (key, response, time.time())
+        )
+
+class SemanticCache:
+    """
+    Response store looked up by embedding similarity, for prompts whose
+    source text is a near-duplicate of an earlier one. Entries are grouped
+    by namespace (prompt kind, model and settings) and searched in memory
+    with one matrix-vector product; they persist alongside LLMCache.
+    """
+
+    def __init__(self, path=LLM_CACHE_DB, ttl=LLM_CACHE_TTL, threshold=SEMANTIC_THRESHOLD):
+        self.threshold = threshold
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache("
+            "namespace TEXT, vector BLOB, response TEXT, ts REAL)"
+        )
+        # namespace -> (unit vectors (n, dim), responses)
+        self._entries = {}
+        rows = self.conn.execute(
+            "SELECT namespace, vector, response FROM semantic_cache WHERE ts > ? ORDER BY ts",
+            (time.time() - ttl,)
+        ).fetchall()
+        for namespace, vector, response in rows:
+            # Rows written before add() normalized may not be unit length
+            self._append(namespace, self._unit(np.frombuffer(vector, dtype=np.float32)), response)
+
+    @staticmethod
+    def embed(text):
+        return embed_chunks([text])[0]
+
+    @staticmethod
+    def embed_many(texts):
+        """Vectors for several texts from one batched encode, in input order"""
+        return embed_chunks(list(texts))
+
+    @staticmethod
+    def _unit(vector):
+        """vector scaled to length 1, so a dot product is its cosine similarity"""
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _append(self, namespace, vector, response):
+        vectors, responses = self._entries.get(namespace, (np.empty((0, vector.shape[0]), dtype=np.float32), []))
+        vectors = np.vstack((vectors, vector))[-MAX_SEMANTIC_ENTRIES:]
+        responses = (responses + [response])[-MAX_SEMANTIC_ENTRIES:]
+        self._entries[namespace] = (vectors, responses)
+
+    def lookup(self, namespace, vector):
+        """Response stored for the most similar text above threshold, or None"""
+        if namespace not in self._entries:
+            return None
+        vectors, responses = self._entries[namespace]
+        scores = vectors @ self._unit(vector)
+        best = int(np.argmax(scores))
+        return responses[best] if scores[best] >= self.threshold else None
+
+    def add(self, namespace, vector, response):
+        vector = self._unit(vector)
+        self._append(namespace, vector, response)
+        self.conn.execute(
+            "INSERT INTO semantic_cache VALUES (?, ?, ?, ?)",
+            (namespace, vector.tobytes(), response, time.time())
+        )
@@ -1,32 +1,29 @@
 # marks_analyzer.py
+import numpy as np
+
+# Marks per question before scaling, and the least each type may be scaled to
+QUESTION_TYPES = ('mcq', 'short', 'long')
+BASE_MARKS = np.array([1, 4, 10])
+MIN_MARKS = np.array([1, 2, 5])
+
 class MarksAnalyzer:
     def adjust(self, counts: dict, target_total: int) -> dict:
         """Adjust marks distribution to reach target total"""
-        total_questions = sum(counts.values())
-        
-        if total_questions == 0:
-            return {'mcq': 1, 'short': 4, 'long': 10}
-        
-        # Simple proportional distribution
-        base_marks = {
-            'mcq': 1,
-            'short': 4, 
-            'long': 10
-        }
-        
-        current_total = (counts['mcq'] * base_marks['mcq'] + 
-                        counts['short'] * base_marks['short'] + 
-                        counts['long'] * base_marks['long'])
-        
-        if current_total == target_total:
-            return base_marks
-        
-        # Adjust proportionally
-        ratio = target_total / current_total
-        adjusted_marks = {
-            'mcq': max(1, round(base_marks['mcq'] * ratio)),
-            'short': max(2, round(base_marks['short'] * ratio)),
-            'long': max(5, round(base_marks['long'] * ratio))
-        }
-        
-        return adjusted_marks
\ No newline at end of file
+        row = self.adjust_batch([[counts[t] for t in QUESTION_TYPES]], [target_total])[0]
+        return dict(zip(QUESTION_TYPES, row.tolist()))
+
+    def adjust_batch(self, counts, target_totals) -> np.ndarray:
+        """
+        adjust for many papers at once: counts is (N, 3) question counts in
+        QUESTION_TYPES order, target_totals has N entries. Returns (N, 3)
+        marks per question.
+        """
+        counts = np.asarray(counts).reshape(-1, len(QUESTION_TYPES))
+        targets = np.asarray(target_totals, dtype=float)
+        current_totals = counts @ BASE_MARKS
+
+        # Simple proportional distribution; papers without questions keep
+        # the base marks (a ratio of 1 reproduces them exactly)
+        ratios = np.divide(targets, current_totals, out=np.ones_like(targets), where=current_totals > 0)
+        # np.round rounds halves to even, like the built-in round
+        return np.maximum(MIN_MARKS, np.round(BASE_MARKS * ratios[:, None])).astype(int)
@@ -1,7 +1,40 @@
 # services/question_generation.py
+import hashlib
 import random
 import json
-from typing import List, Dict, Any
+import logging
+import re
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Iterable
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Topic keywords of the fallback question generator, matched anywhere in a
+# chunk the way the former substring checks did; the group name is the keyword
+_TOPIC_RE = re.compile(
+    r"(?P<technical>technical)|(?P<report>report)|(?P<research>research)|(?P<data>data|analysis)",
+    re.IGNORECASE
+)
+
+def _fallback_topic(chunk: str) -> str:
+    """Topic of the fallback templates for chunk, from a single keyword scan"""
+    found = set()
+    for m in _TOPIC_RE.finditer(chunk):
+        found.add(m.lastgroup)
+        if "technical" in found and "report" in found:
+            # Nothing outranks it, the rest of the chunk needn't be scanned
+            return "tech"
+    if "research" in found:
+        return "research"
+    if "data" in found:
+        return "data"
+    return "general"
 
 try:
     # FIX: Use absolute import for services
@@ -15,329 +48,374 @@ except ImportError:
         
         # Emergency fallback
         class GeminiAI:
+            # Question templates, built once with the class
+            _TECH_MCQS = (
+                {
+                    "question": "What is the primary characteristic of effective technical documentation?",
+                    "options": (
+                        "Use of complex technical jargon",
+                        "Clarity, accuracy, and accessibility",
+                        "Lengthy and detailed descriptions", 
+                        "Colorful graphics and images"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Which element is most crucial for user comprehension in technical manuals?",
+                    "options": (
+                        "Complex terminology",
+                        "Logical organization and clear examples",
+                        "Extensive background information",
+                        "Abstract concepts"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "What distinguishes technical writing from creative writing?",
+                    "options": (
+                        "Use of figurative language",
+                        "Focus on factual accuracy and precision",
+                        "Entertainment value",
+                        "Character development"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Why is consistency important in technical documentation?",
+                    "options": (
+                        "It makes documents look professional",
+                        "It reduces cognitive load and prevents confusion",
+                        "It allows for longer documents",
+                        "It enables creative expression"
+                    ),
+                    "answer": 1
+                }
+            )
+
+            _TECH_SHORT = {
+                "question": "Explain why accuracy is crucial in technical reports.",
+                "answer": "Accuracy ensures reliability, prevents misunderstandings, supports decision-making, and maintains professional credibility in technical documentation.",
+                "options": ()
+            }
+
+            _TECH_LONG = {
+                "question": "Discuss the key elements that make technical documentation effective for different audiences.",
+                "answer": "Effective technical documentation considers audience knowledge level, uses appropriate terminology, provides clear structure with headings, includes examples where needed, and maintains consistency in formatting and style for better comprehension.",
+                "options": ()
+            }
+
+            _RESEARCH_MCQS = (
+                {
+                    "question": "What is the main purpose of a literature review in research?",
+                    "options": (
+                        "To fill pages and meet word count requirements",
+                        "To identify gaps in existing knowledge and contextualize the study",
+                        "To copy previous researchers' work",
+                        "To demonstrate reading comprehension"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Which factor is most important for research validity?",
+                    "options": (
+                        "Length of the research paper",
+                        "Appropriate methodology and measurement accuracy",
+                        "Number of references cited",
+                        "Complexity of statistical analysis"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "What distinguishes qualitative from quantitative research?",
+                    "options": (
+                        "The number of participants",
+                        "Focus on meanings vs. numerical data analysis",
+                        "The length of the study",
+                        "Use of questionnaires"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Why is ethical approval important in research?",
+                    "options": (
+                        "It makes research more expensive",
+                        "It protects participants and ensures ethical standards",
+                        "It guarantees publication",
+                        "It simplifies data analysis"
+                    ),
+                    "answer": 1
+                }
+            )
+
+            _RESEARCH_SHORT = {
+                "question": "Describe the importance of research methodology.",
+                "answer": "Research methodology provides a systematic approach for data collection and analysis, ensures study validity and reliability, and allows for replication of research findings.",
+                "options": ()
+            }
+
+            _RESEARCH_LONG = {
+                "question": "Analyze how different research methods are suited for different types of research questions.",
+                "answer": "Quantitative methods suit hypothesis testing and statistical analysis, qualitative methods explore complex phenomena and meanings, while mixed methods provide comprehensive insights by combining both approaches based on research objectives.",
+                "options": ()
+            }
+
+            _DATA_MCQS = (
+                {
+                    "question": "What is the primary goal of data analysis?",
+                    "options": (
+                        "To collect large amounts of data",
+                        "To extract meaningful insights and support decision-making",
+                        "To create colorful charts",
+                        "To prove predetermined conclusions"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Which statistical measure indicates data variability?",
+                    "options": (
+                        "Mean",
+                        "Standard deviation",
+                        "Median",
+                        "Mode"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "What makes data visualization effective?",
+                    "options": (
+                        "Use of many colors",
+                        "Clear communication of insights and patterns",
+                        "Complex graphical elements",
+                        "Large size"
+                    ),
+                    "answer": 1
+                }
+            )
+
+            _DATA_SHORT = {
+                "question": "Explain the importance of data cleaning in analysis.",
+                "answer": "Data cleaning ensures accuracy, removes inconsistencies, handles missing values, and improves the reliability of analytical results and conclusions.",
+                "options": ()
+            }
+
+            _DATA_LONG = {
+                "question": "Discuss the relationship between data quality and analytical outcomes.",
+                "answer": "High-quality data leads to reliable insights and valid conclusions, while poor data quality can result in misleading findings, incorrect decisions, and wasted resources in the analytical process.",
+                "options": ()
+            }
+
+            _GENERAL_MCQS = (
+                {
+                    "question": "What is the primary goal of academic writing?",
+                    "options": (
+                        "To entertain readers with creative stories",
+                        "To present information clearly and support arguments with evidence",
+                        "To use complex vocabulary to impress professors",
+                        "To summarize information without analysis"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Which characteristic is most important for credible sources?",
+                    "options": (
+                        "Recent publication date",
+                        "Author credentials and peer-review process",
+                        "Length of the publication",
+                        "Number of citations"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "What is the purpose of critical thinking in academia?",
+                    "options": (
+                        "To criticize others' work",
+                        "To evaluate evidence and construct reasoned arguments",
+                        "To memorize information",
+                        "To agree with established authorities"
+                    ),
+                    "answer": 1
+                },
+                {
+                    "question": "Why is proper citation important in academic work?",
+                    "options": (
+                        "To increase word count",
+                        "To acknowledge sources and avoid plagiarism",
+                        "To make papers look more impressive",
+                        "To follow formatting rules"
+                    ),
+                    "answer": 1
+                }
+            )
+
+            _GENERAL_SHORT = {
+                "question": "Explain the importance of critical analysis in academic work.",
+                "answer": "Critical analysis enables evaluation of evidence, identification of biases, development of reasoned arguments, and contributes to knowledge advancement rather than mere information repetition.",
+                "options": ()
+            }
+
+            _GENERAL_LONG = {
+                "question": "Discuss how proper academic integrity practices contribute to the credibility of research.",
+                "answer": "Academic integrity through proper citation, original work, and ethical research practices establishes credibility, enables knowledge building on previous work, maintains trust in academic community, and ensures the reliability and validity of research outcomes.",
+                "options": ()
+            }
+
+            @staticmethod
+            def _from_template(base, template):
+                question = dict(base, **template)
+                question["options"] = list(template["options"])
+                return question
+            
+            # topic -> (MCQ templates, short template, long template, explanation)
+            _TOPIC_TABLE = {
+                "tech": (_TECH_MCQS, _TECH_SHORT, _TECH_LONG, "Based on technical documentation content"),
+                "research": (_RESEARCH_MCQS, _RESEARCH_SHORT, _RESEARCH_LONG, "Based on research methodology content"),
+                "data": (_DATA_MCQS, _DATA_SHORT, _DATA_LONG, "Based on data analysis content"),
+                "general": (_GENERAL_MCQS, _GENERAL_SHORT, _GENERAL_LONG, "Based on academic content"),
+            }
+            
             def __init__(self, api_key=None):
                 self.api_key = api_key
                 self.available = False
+                # Own generator, so threads using other instances don't share its state
+                self._rng = random.Random()
                 print("⚠️ Using fallback GeminiAI - no real AI available")
             
             def generate_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str = "mcq") -> Dict[str, Any]:
                 """Fallback question generation with contextual variety"""
-                print(f"🔄 Generating fallback {question_type} question")
-                
-                # Create contextual questions based on chunk content
-                chunk_lower = chunk.lower()
-                
-                if "technical" in chunk_lower and "report" in chunk_lower:
-                    return self._get_tech_question(chunk, difficulty, blooms_level, question_type)
-                elif "research" in chunk_lower:
-                    return self._get_research_question(chunk, difficulty, blooms_level, question_type)
-                elif "data" in chunk_lower or "analysis" in chunk_lower:
-                    return self._get_data_question(chunk, difficulty, blooms_level, question_type)
-                else:
-                    return self._get_general_question(chunk, difficulty, blooms_level, question_type)
+                return self._build(chunk, _fallback_topic(chunk), difficulty, blooms_level, question_type)
             
-            def _get_tech_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-                """Generate varied technical questions based on chunk content"""
-                base = {
-                    "difficulty": difficulty,
-                    "blooms_level": blooms_level,
-                    "question_type": question_type,
-                    "explanation": "Based on technical documentation content",
-                    "source_chunk": chunk[:100] + "..." if len(chunk) > 100 else chunk
-                }
-                
-                # Different question templates for variety
-                tech_questions = [
-                    {
-                        "question": "What is the primary characteristic of effective technical documentation?",
-                        "options": [
-                            "Use of complex technical jargon",
-                            "Clarity, accuracy, and accessibility",
-                            "Lengthy and detailed descriptions", 
-                            "Colorful graphics and images"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Which element is most crucial for user comprehension in technical manuals?",
-                        "options": [
-                            "Complex terminology",
-                            "Logical organization and clear examples",
-                            "Extensive background information",
-                            "Abstract concepts"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "What distinguishes technical writing from creative writing?",
-                        "options": [
-                            "Use of figurative language",
-                            "Focus on factual accuracy and precision",
-                            "Entertainment value",
-                            "Character development"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Why is consistency important in technical documentation?",
-                        "options": [
-                            "It makes documents look professional",
-                            "It reduces cognitive load and prevents confusion",
-                            "It allows for longer documents",
-                            "It enables creative expression"
-                        ],
-                        "answer": 1
-                    }
+            def generate_questions_batch(self, specs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+                topics = [_fallback_topic(spec["chunk"]) for spec in specs]
+                # Draw every MCQ template of a topic in one call
+                mcq_topics = [topic for spec, topic in zip(specs, topics) if spec["question_type"] == "mcq"]
+                picks = {topic: iter(self._pick_template(topic, mcq_topics.count(topic))) for topic in set(mcq_topics)}
+                return [
+                    self._build(spec["chunk"], topic, spec["difficulty"], spec["blooms_level"], spec["question_type"],
+                                next(picks[topic]) if spec["question_type"] == "mcq" else None)
+                    for spec, topic in zip(specs, topics)
                 ]
-                
-                if question_type == "mcq":
-                    # Select a random question template
-                    selected_q = random.choice(tech_questions)
-                    base.update(selected_q)
-                elif question_type == "short":
-                    base.update({
-                        "question": "Explain why accuracy is crucial in technical reports.",
-                        "answer": "Accuracy ensures reliability, prevents misunderstandings, supports decision-making, and maintains professional credibility in technical documentation.",
-                        "options": []
-                    })
-                else:  # long
-                    base.update({
-                        "question": "Discuss the key elements that make technical documentation effective for different audiences.",
-                        "answer": "Effective technical documentation considers audience knowledge level, uses appropriate terminology, provides clear structure with headings, includes examples where needed, and maintains consistency in formatting and style for better comprehension.",
-                        "options": []
-                    })
-                return base
             
-            def _get_research_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-                """Generate varied research questions based on chunk content"""
-                base = {
-                    "difficulty": difficulty,
-                    "blooms_level": blooms_level,
-                    "question_type": question_type,
-                    "explanation": "Based on research methodology content",
-                    "source_chunk": chunk[:100] + "..." if len(chunk) > 100 else chunk
-                }
-                
-                # Different question templates for variety
-                research_questions = [
-                    {
-                        "question": "What is the main purpose of a literature review in research?",
-                        "options": [
-                            "To fill pages and meet word count requirements",
-                            "To identify gaps in existing knowledge and contextualize the study",
-                            "To copy previous researchers' work",
-                            "To demonstrate reading comprehension"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Which factor is most important for research validity?",
-                        "options": [
-                            "Length of the research paper",
-                            "Appropriate methodology and measurement accuracy",
-                            "Number of references cited",
-                            "Complexity of statistical analysis"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "What distinguishes qualitative from quantitative research?",
-                        "options": [
-                            "The number of participants",
-                            "Focus on meanings vs. numerical data analysis",
-                            "The length of the study",
-                            "Use of questionnaires"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Why is ethical approval important in research?",
-                        "options": [
-                            "It makes research more expensive",
-                            "It protects participants and ensures ethical standards",
-                            "It guarantees publication",
-                            "It simplifies data analysis"
-                        ],
-                        "answer": 1
-                    }
-                ]
-                
-                if question_type == "mcq":
-                    # Select a random question template
-                    selected_q = random.choice(research_questions)
-                    base.update(selected_q)
-                elif question_type == "short":
-                    base.update({
-                        "question": "Describe the importance of research methodology.",
-                        "answer": "Research methodology provides a systematic approach for data collection and analysis, ensures study validity and reliability, and allows for replication of research findings.",
-                        "options": []
-                    })
-                else:  # long
-                    base.update({
-                        "question": "Analyze how different research methods are suited for different types of research questions.",
-                        "answer": "Quantitative methods suit hypothesis testing and statistical analysis, qualitative methods explore complex phenomena and meanings, while mixed methods provide comprehensive insights by combining both approaches based on research objectives.",
-                        "options": []
-                    })
-                return base
+            def _pick_template(self, topic: str, n: int) -> List[int]:
+                """n random indices into topic's MCQ templates"""
+                return self._rng.choices(range(len(self._TOPIC_TABLE[topic][0])), k=n)
             
-            def _get_data_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-                """Generate varied data analysis questions"""
-                base = {
-                    "difficulty": difficulty,
-                    "blooms_level": blooms_level,
-                    "question_type": question_type,
-                    "explanation": "Based on data analysis content",
-                    "source_chunk": chunk[:100] + "..." if len(chunk) > 100 else chunk
-                }
+            def _build(self, chunk: str, topic: str, difficulty: str, blooms_level: str, question_type: str, pick=None) -> Dict[str, Any]:
+                """Question of question_type from topic's templates; pick selects the MCQ template"""
+                logger.debug("Generating fallback %s question", question_type)
                 
-                # Different question templates for variety
-                data_questions = [
-                    {
-                        "question": "What is the primary goal of data analysis?",
-                        "options": [
-                            "To collect large amounts of data",
-                            "To extract meaningful insights and support decision-making",
-                            "To create colorful charts",
-                            "To prove predetermined conclusions"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Which statistical measure indicates data variability?",
-                        "options": [
-                            "Mean",
-                            "Standard deviation",
-                            "Median",
-                            "Mode"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "What makes data visualization effective?",
-                        "options": [
-                            "Use of many colors",
-                            "Clear communication of insights and patterns",
-                            "Complex graphical elements",
-                            "Large size"
-                        ],
-                        "answer": 1
-                    }
-                ]
-                
-                if question_type == "mcq":
-                    selected_q = random.choice(data_questions)
-                    base.update(selected_q)
-                elif question_type == "short":
-                    base.update({
-                        "question": "Explain the importance of data cleaning in analysis.",
-                        "answer": "Data cleaning ensures accuracy, removes inconsistencies, handles missing values, and improves the reliability of analytical results and conclusions.",
-                        "options": []
-                    })
-                else:  # long
-                    base.update({
-                        "question": "Discuss the relationship between data quality and analytical outcomes.",
-                        "answer": "High-quality data leads to reliable insights and valid conclusions, while poor data quality can result in misleading findings, incorrect decisions, and wasted resources in the analytical process.",
-                        "options": []
-                    })
-                return base
-            
-            def _get_general_question(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
-                """Generate varied general academic questions"""
+                mcqs, short, long, explanation = self._TOPIC_TABLE[topic]
                 base = {
                     "difficulty": difficulty,
                     "blooms_level": blooms_level,
                     "question_type": question_type,
-                    "explanation": "Based on academic content",
+                    "explanation": explanation,
                     "source_chunk": chunk[:100] + "..." if len(chunk) > 100 else chunk
                 }
                 
-                # Different question templates for variety
-                general_questions = [
-                    {
-                        "question": "What is the primary goal of academic writing?",
-                        "options": [
-                            "To entertain readers with creative stories",
-                            "To present information clearly and support arguments with evidence",
-                            "To use complex vocabulary to impress professors",
-                            "To summarize information without analysis"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Which characteristic is most important for credible sources?",
-                        "options": [
-                            "Recent publication date",
-                            "Author credentials and peer-review process",
-                            "Length of the publication",
-                            "Number of citations"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "What is the purpose of critical thinking in academia?",
-                        "options": [
-                            "To criticize others' work",
-                            "To evaluate evidence and construct reasoned arguments",
-                            "To memorize information",
-                            "To agree with established authorities"
-                        ],
-                        "answer": 1
-                    },
-                    {
-                        "question": "Why is proper citation important in academic work?",
-                        "options": [
-                            "To increase word count",
-                            "To acknowledge sources and avoid plagiarism",
-                            "To make papers look more impressive",
-                            "To follow formatting rules"
-                        ],
-                        "answer": 1
-                    }
-                ]
-                
                 if question_type == "mcq":
-                    # Select a random question template
-                    selected_q = random.choice(general_questions)
-                    base.update(selected_q)
+                    if pick is None:
+                        pick = self._pick_template(topic, 1)[0]
+                    return self._from_template(base, mcqs[pick])
                 elif question_type == "short":
-                    base.update({
-                        "question": "Explain the importance of critical analysis in academic work.",
-                        "answer": "Critical analysis enables evaluation of evidence, identification of biases, development of reasoned arguments, and contributes to knowledge advancement rather than mere information repetition.",
-                        "options": []
-                    })
+                    return self._from_template(base, short)
                 else:  # long
-                    base.update({
-                        "question": "Discuss how proper academic integrity practices contribute to the credibility of research.",
-                        "answer": "Academic integrity through proper citation, original work, and ethical research practices establishes credibility, enables knowledge building on previous work, maintains trust in academic community, and ensures the reliability and validity of research outcomes.",
-                        "options": []
-                    })
-                return base
+                    return self._from_template(base, long)
+
+# Templates for content-based questions, formatted with {ctx}: the first
+# words of the chunk
+_MCQ_QUESTION_TEMPLATES = (
+    "What is the main concept discussed in: '{ctx}'?",
+    "Based on the content, what best describes: '{ctx}'?",
+    "What key point is emphasized regarding: '{ctx}'?",
+    "Which statement accurately reflects the discussion of: '{ctx}'?"
+)
+_MCQ_OPTION_TEMPLATES = (
+    ("A correct interpretation based on {ctx}", "A common misunderstanding about {ctx}", "An unrelated concept that sounds similar", "A partially correct but incomplete view"),
+    ("The primary concept explained in the text", "A secondary detail mentioned briefly", "A contradictory viewpoint not supported", "An assumption not made in the content"),
+    ("The main idea supported by evidence", "A minor point with limited significance", "An external concept not discussed", "An oversimplification of the topic"),
+    ("The central argument presented", "A supporting example provided", "A counterargument not addressed", "An irrelevant technical detail")
+)
+_SHORT_QUESTION_TEMPLATES = (
+    "Explain the key concept of '{ctx}' in 2-3 sentences.",
+    "Describe the main point about '{ctx}' briefly.",
+    "What is the significance of '{ctx}' according to the text?",
+    "Summarize the discussion about '{ctx}' from the material."
+)
+_SHORT_ANSWER_TEMPLATE = "This would explain {ctx} based on the specific content provided in the source material."
+_LONG_QUESTION_TEMPLATES = (
+    "Discuss in detail the concepts related to '{ctx}' as presented in the material. Provide specific examples and applications.",
+    "Analyze the importance and implications of '{ctx}' based on the content. Include relevant details and connections to broader concepts.",
+    "Provide a comprehensive explanation of '{ctx}' covering its principles, significance, and practical relevance as discussed in the text."
+)
+_LONG_ANSWER_TEMPLATE = "A comprehensive analysis of {ctx} covering principles, examples, and practical applications as detailed in the source material. The answer should demonstrate deep understanding and critical thinking about the specific content."
+
+# Generated questions kept per QuestionGenerator, keyed by chunk and settings
+RESPONSE_CACHE_SIZE = 1024
+
+def _chunk_context(chunk: str) -> Tuple[str, str, str]:
+    """
+    (first 20 words, first 15 words, source snippet) of a chunk, what the
+    _create_contextual_* builders format their templates with
+    """
+    # maxsplit stops scanning the chunk once the 20 words are found
+    words = chunk.split(None, 20)[:20]
+    return " ".join(words), " ".join(words[:15]), chunk[:100] + "..."
+
+def _response_key(chunk: str, difficulty: str, blooms_level: str, question_type: str) -> str:
+    return hashlib.sha256(f"{question_type}|{difficulty}|{blooms_level}|{chunk}".encode()).hexdigest()
+
+def _freeze(question: Dict[str, Any]) -> Tuple:
+    """Immutable (key, value) pairs of a question, lists turned into tuples"""
+    return tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in question.items())
+
+def _thaw(frozen: Tuple) -> Dict[str, Any]:
+    """Fresh question dict, with its own lists, from _freeze's output"""
+    return {k: list(v) if isinstance(v, tuple) else v for k, v in frozen}
 
 class QuestionGenerator:
     def __init__(self, api_key=None):
-        print("🔄 Initializing QuestionGenerator...")
+        logger.debug("Initializing QuestionGenerator")
         self.gemini = GeminiAI(api_key)
-        print(f"🤖 QuestionGenerator ready - Gemini available: {getattr(self.gemini, 'available', False)}")
+        logger.info("QuestionGenerator ready - Gemini available: %s", getattr(self.gemini, 'available', False))
         # Track used questions to avoid duplicates in fallback mode
         self.used_questions = set()
+        self._rng = random.Random()
+        # Gemini questions by _response_key, least recently used first
+        self._resp_cache = OrderedDict()
 
     def generate_questions_from_content(self, chunks: List[str], counts: Dict[str, int],
                                       difficulty: str = "medium", blooms_level: str = "understand") -> Dict[str, List]:
         """Generate questions that actually use the PDF content"""
-        print(f"📚 Generating questions from {len(chunks)} content chunks")
+        questions = {"mcq": [], "short": [], "long": []}
+        for kind, question in self.iter_questions_from_content(chunks, counts, difficulty, blooms_level):
+            questions[kind].append(question)
         
-        questions = {
-            "mcq": [],
-            "short": [], 
-            "long": []
-        }
+        logger.info("Generated %d MCQs, %d SAQs, %d LAQs from content",
+                    len(questions['mcq']), len(questions['short']), len(questions['long']))
+        return questions
+
+    def iter_questions_from_content(self, chunks: List[str], counts: Dict[str, int],
+                                    difficulty: str = "medium", blooms_level: str = "understand"):
+        """
+        Yield (kind, question) pairs as each content-based question is built,
+        kind being "mcq", "short" or "long"
+        """
+        logger.debug("Generating questions from %d content chunks", len(chunks))
+        
+        # Question texts already yielded, per kind
+        seen = {"mcq": set(), "short": set(), "long": set()}
+        
+        n_chunks = len(chunks)
         
         # Ensure we have enough chunks
         if len(chunks) < sum(counts.values()):
-            print(f"⚠️ Not enough chunks ({len(chunks)}) for requested questions ({sum(counts.values())})")
+            logger.warning("Not enough chunks (%d) for requested questions (%d)", len(chunks), sum(counts.values()))
             # Reuse chunks if necessary
             chunks = chunks * (sum(counts.values()) // len(chunks) + 1)
         
+        # Word contexts per distinct chunk; the reused copies map onto them by index
+        contexts = [_chunk_context(chunk) for chunk in chunks[:n_chunks]]
+        
         used_chunks = set()
         
         # Generate MCQs with VARIED options
@@ -348,12 +426,13 @@ class QuestionGenerator:
                 
             try:
                 # Create context-aware MCQ
-                mcq = self._create_contextual_mcq(chunk, difficulty, i)
-                if mcq and mcq['question'] not in [q['question'] for q in questions["mcq"]]:
-                    questions["mcq"].append(mcq)
+                mcq = self._create_contextual_mcq(contexts[i % n_chunks], difficulty, i)
+                if mcq and mcq['question'] not in seen["mcq"]:
+                    seen["mcq"].add(mcq['question'])
                     used_chunks.add(chunk)
+                    yield "mcq", mcq
             except Exception as e:
-                print(f"❌ Error creating MCQ {i}: {e}")
+                logger.error("Error creating MCQ %d: %s", i, e)
                 continue
         
         # Generate Short Answer questions
@@ -364,12 +443,13 @@ class QuestionGenerator:
                 break
             chunk = chunks[idx]
             try:
-                saq = self._create_contextual_short_answer(chunk, difficulty, i)
-                if saq and saq['question'] not in [q['question'] for q in questions["short"]]:
-                    questions["short"].append(saq)
+                saq = self._create_contextual_short_answer(contexts[idx % n_chunks], difficulty, i)
+                if saq and saq['question'] not in seen["short"]:
+                    seen["short"].add(saq['question'])
                     used_chunks.add(chunk)
+                    yield "short", saq
             except Exception as e:
-                print(f"❌ Error creating SAQ {i}: {e}")
+                logger.error("Error creating SAQ %d: %s", i, e)
                 continue
         
         # Generate Long Answer questions  
@@ -380,145 +460,160 @@ class QuestionGenerator:
                 break
             chunk = chunks[idx]
             try:
-                laq = self._create_contextual_long_answer(chunk, difficulty, i)
-                if laq and laq['question'] not in [q['question'] for q in questions["long"]]:
-                    questions["long"].append(laq)
+                laq = self._create_contextual_long_answer(contexts[idx % n_chunks], difficulty, i)
+                if laq and laq['question'] not in seen["long"]:
+                    seen["long"].add(laq['question'])
                     used_chunks.add(chunk)
+                    yield "long", laq
             except Exception as e:
-                print(f"❌ Error creating LAQ {i}: {e}")
+                logger.error("Error creating LAQ %d: %s", i, e)
                 continue
-        
-        print(f"✅ Generated {len(questions['mcq'])} MCQs, {len(questions['short'])} SAQs, {len(questions['long'])} LAQs from content")
-        return questions
 
-    def _create_contextual_mcq(self, chunk: str, difficulty: str, index: int) -> Dict:
+    def _create_contextual_mcq(self, context: Tuple[str, str, str], difficulty: str, index: int) -> Dict:
         """Create MCQ that actually uses the content"""
-        # Extract key phrases from chunk for context
-        words = chunk.split()[:20]  # First 20 words for context
-        context = " ".join(words)
-        
-        # Different question templates based on content
-        templates = [
-            f"What is the main concept discussed in: '{context}'?",
-            f"Based on the content, what best describes: '{context}'?",
-            f"What key point is emphasized regarding: '{context}'?",
-            f"Which statement accurately reflects the discussion of: '{context}'?"
-        ]
-        
-        question_text = templates[index % len(templates)]
+        ctx, _, snippet = context
         
-        # Create VARIED options based on actual content
-        option_templates = [
-            [f"A correct interpretation based on {context}", f"A common misunderstanding about {context}", f"An unrelated concept that sounds similar", f"A partially correct but incomplete view"],
-            [f"The primary concept explained in the text", f"A secondary detail mentioned briefly", f"A contradictory viewpoint not supported", f"An assumption not made in the content"],
-            [f"The main idea supported by evidence", f"A minor point with limited significance", f"An external concept not discussed", f"An oversimplification of the topic"],
-            [f"The central argument presented", f"A supporting example provided", f"A counterargument not addressed", f"An irrelevant technical detail"]
-        ]
-        
-        options = option_templates[index % len(option_templates)]
+        # Different question templates based on content, with VARIED options
+        question_text = _MCQ_QUESTION_TEMPLATES[index % len(_MCQ_QUESTION_TEMPLATES)].format(ctx=ctx)
+        options = [t.format(ctx=ctx) for t in _MCQ_OPTION_TEMPLATES[index % len(_MCQ_OPTION_TEMPLATES)]]
         
         return {
             "question": question_text,
             "options": options,
             "answer": 0,
-            "explanation": f"Based on the content discussing {context}",
+            "explanation": f"Based on the content discussing {ctx}",
             "difficulty": difficulty,
             "blooms_level": "understand",
             "question_type": "mcq",
-            "source_chunk": chunk[:100] + "..."
+            "source_chunk": snippet
         }
 
-    def _create_contextual_short_answer(self, chunk: str, difficulty: str, index: int) -> Dict:
+    def _create_contextual_short_answer(self, context: Tuple[str, str, str], difficulty: str, index: int) -> Dict:
         """Create short answer that uses content"""
-        words = chunk.split()[:15]
-        context = " ".join(words)
-        
-        templates = [
-            f"Explain the key concept of '{context}' in 2-3 sentences.",
-            f"Describe the main point about '{context}' briefly.",
-            f"What is the significance of '{context}' according to the text?",
-            f"Summarize the discussion about '{context}' from the material."
-        ]
+        _, ctx, snippet = context
         
         return {
-            "question": templates[index % len(templates)],
+            "question": _SHORT_QUESTION_TEMPLATES[index % len(_SHORT_QUESTION_TEMPLATES)].format(ctx=ctx),
             "options": [],
-            "answer": f"This would explain {context} based on the specific content provided in the source material.",
+            "answer": _SHORT_ANSWER_TEMPLATE.format(ctx=ctx),
             "explanation": "Answer should reference the actual content from the text and demonstrate understanding of the key concepts.",
             "difficulty": difficulty,
             "blooms_level": "understand",
             "question_type": "short",
-            "source_chunk": chunk[:100] + "..."
+            "source_chunk": snippet
         }
 
-    def _create_contextual_long_answer(self, chunk: str, difficulty: str, index: int) -> Dict:
+    def _create_contextual_long_answer(self, context: Tuple[str, str, str], difficulty: str, index: int) -> Dict:
         """Create long answer that uses content"""
-        words = chunk.split()[:15]
-        context = " ".join(words)
-        
-        templates = [
-            f"Discuss in detail the concepts related to '{context}' as presented in the material. Provide specific examples and applications.",
-            f"Analyze the importance and implications of '{context}' based on the content. Include relevant details and connections to broader concepts.",
-            f"Provide a comprehensive explanation of '{context}' covering its principles, significance, and practical relevance as discussed in the text."
-        ]
+        _, ctx, snippet = context
         
         return {
-            "question": templates[index % len(templates)],
+            "question": _LONG_QUESTION_TEMPLATES[index % len(_LONG_QUESTION_TEMPLATES)].format(ctx=ctx),
             "options": [],
-            "answer": f"A comprehensive analysis of {context} covering principles, examples, and practical applications as detailed in the source material. The answer should demonstrate deep understanding and critical thinking about the specific content.",
+            "answer": _LONG_ANSWER_TEMPLATE.format(ctx=ctx),
             "explanation": "Should demonstrate deep understanding of the specific content, critical analysis, and ability to connect concepts to practical applications.",
             "difficulty": difficulty, 
             "blooms_level": "analyze",
             "question_type": "long",
-            "source_chunk": chunk[:100] + "..."
+            "source_chunk": snippet
         }
 
+    def _cache_get(self, key: str):
+        frozen = self._resp_cache.get(key)
+        if frozen is None:
+            return None
+        self._resp_cache.move_to_end(key)
+        return _thaw(frozen)
+
+    def _cache_put(self, key: str, question: Dict[str, Any]):
+        # Fallback questions are picked at random, and one standing in for a
+        # failed Gemini call would outlive the failure; cache model output only
+        if not getattr(self.gemini, 'available', False) or getattr(question, 'is_fallback', False):
+            return
+        # Stored frozen, so building a fresh dict per hit is all it takes to
+        # keep callers' edits out of the cache
+        self._resp_cache[key] = _freeze(question)
+        if len(self._resp_cache) > RESPONSE_CACHE_SIZE:
+            self._resp_cache.popitem(last=False)
+
+    def _generate(self, chunk: str, difficulty: str, blooms_level: str, question_type: str) -> Dict[str, Any]:
+        """gemini.generate_question, answered from the response cache when possible"""
+        key = _response_key(chunk, difficulty, blooms_level, question_type)
+        question = self._cache_get(key)
+        if question is None:
+            question = self.gemini.generate_question(chunk, difficulty, blooms_level, question_type)
+            self._cache_put(key, question)
+        return question
+
+    def _generate_batch(self, specs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """gemini.generate_questions_batch, sending only specs missing from the response cache"""
+        keys = [_response_key(**spec) for spec in specs]
+        questions = [self._cache_get(key) for key in keys]
+        misses = [i for i, question in enumerate(questions) if question is None]
+        if misses:
+            generated = self.gemini.generate_questions_batch([specs[i] for i in misses])
+            for i, question in zip(misses, generated):
+                self._cache_put(keys[i], question)
+                questions[i] = question
+        return [question for question in questions if question is not None]
+
     def generate_mcq(self, chunk: str, difficulty: str, blooms_level: str) -> Dict[str, Any]:
         """Generate multiple choice question"""
-        print(f"🎯 Generating MCQ (Difficulty: {difficulty}, Bloom's: {blooms_level})")
-        question = self.gemini.generate_question(chunk, difficulty, blooms_level, "mcq")
+        logger.debug("Generating MCQ (Difficulty: %s, Bloom's: %s)", difficulty, blooms_level)
+        question = self._mark_fallback_duplicate(
+            self._generate(chunk, difficulty, blooms_level, "mcq")
+        )
         
-        # For fallback mode, ensure uniqueness
+        logger.debug("MCQ generated: %.50s...", question['question'])
+        return question
+
+    def _mark_fallback_duplicate(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        """For fallback mode, ensure uniqueness"""
         if not getattr(self.gemini, 'available', False):
             question_text = question['question']
             if question_text in self.used_questions:
                 # If duplicate, modify the question slightly
                 question['question'] = question_text + " (Based on specific content)"
             self.used_questions.add(question_text)
-        
-        print(f"✅ MCQ generated: {question['question'][:50]}...")
         return question
 
     def generate_short_answer(self, chunk: str, difficulty: str, blooms_level: str) -> Dict[str, Any]:
         """Generate short answer question"""
-        print(f"🎯 Generating Short Answer (Difficulty: {difficulty}, Bloom's: {blooms_level})")
-        question = self.gemini.generate_question(chunk, difficulty, blooms_level, "short")
-        print(f"✅ Short Answer generated: {question['question'][:50]}...")
+        logger.debug("Generating Short Answer (Difficulty: %s, Bloom's: %s)", difficulty, blooms_level)
+        question = self._generate(chunk, difficulty, blooms_level, "short")
+        logger.debug("Short Answer generated: %.50s...", question['question'])
         return question
 
     def generate_long_answer(self, chunk: str, difficulty: str, blooms_level: str) -> Dict[str, Any]:
         """Generate long answer question"""
-        print(f"🎯 Generating Long Answer (Difficulty: {difficulty}, Bloom's: {blooms_level})")
-        question = self.gemini.generate_question(chunk, difficulty, blooms_level, "long")
-        print(f"✅ Long Answer generated: {question['question'][:50]}...")
+        logger.debug("Generating Long Answer (Difficulty: %s, Bloom's: %s)", difficulty, blooms_level)
+        question = self._generate(chunk, difficulty, blooms_level, "long")
+        logger.debug("Long Answer generated: %.50s...", question['question'])
         return question
 
     def generate_questions(self, chunks: List[str], counts: Dict[str, int],
                           difficulty: str = "medium", blooms_level: str = "understand") -> Dict[str, List]:
         """Generate different types of questions"""
-        print(f"🚀 Starting question generation for {len(chunks)} chunks")
-        print(f"📊 Target counts: MCQ={counts['mcq']}, Short={counts['short']}, Long={counts['long']}")
+        logger.info("Starting question generation for %d chunks", len(chunks))
+        logger.debug("Target counts: MCQ=%d, Short=%d, Long=%d", counts['mcq'], counts['short'], counts['long'])
 
-        # Filter valid chunks
-        valid_chunks = [chunk for chunk in chunks if len(chunk.strip()) > 50]
+        # Filter valid chunks. Repeated passages (overlapping chunker
+        # windows, the same page in two uploads) would only cost extra
+        # Gemini calls for questions the MCQ dedup throws away, so chunks
+        # equal up to case and whitespace are kept once
+        unique_chunks = {}
+        for chunk in chunks:
+            if len(chunk.strip()) > 50:
+                unique_chunks.setdefault(" ".join(chunk.casefold().split()), chunk)
+        valid_chunks = list(unique_chunks.values())
         if not valid_chunks:
-            print("❌ No valid chunks available for question generation")
+            logger.warning("No valid chunks available for question generation")
             # Use first few chunks even if short
             valid_chunks = chunks[:min(5, len(chunks))]
             if not valid_chunks:
                 raise ValueError("No valid chunks available for question generation")
 
-        print(f"✅ Using {len(valid_chunks)} valid chunks")
+        logger.debug("Using %d valid chunks", len(valid_chunks))
 
         questions = {
             "mcq": [],
@@ -529,79 +624,122 @@ class QuestionGenerator:
         # Reset used questions tracking for new generation session
         self.used_questions = set()
 
-        # Generate MCQs - ensure we use different chunks
-        mcq_count = min(counts['mcq'], len(valid_chunks))
-        mcq_chunks = random.sample(valid_chunks, mcq_count)
-        print(f"🔢 Generating {mcq_count} MCQs...")
-        
-        for i, chunk in enumerate(mcq_chunks):
+        # Pick different chunks for each question type: disjoint slices of
+        # one shuffled index list
+        idx = list(range(len(valid_chunks)))
+        self._rng.shuffle(idx)
+        mcq_count = min(counts['mcq'], len(idx))
+        short_count = min(counts['short'], len(idx) - mcq_count)
+        long_count = min(counts['long'], len(idx) - mcq_count - short_count)
+        short_end = mcq_count + short_count
+        long_end = short_end + long_count
+        # Chunks for duplicate-MCQ retries: unused ones first, then those
+        # given to other question types
+        retry_idx = idx[long_end:] + idx[mcq_count:long_end]
+
+        # Request the whole paper at once; Gemini answers it in a few calls
+        # instead of one per question. One pass over the selected chunks,
+        # each one's position deciding its question type
+        specs = []
+        for pos, i in enumerate(idx[:long_end]):
+            if pos < mcq_count:
+                question_type, level = "mcq", blooms_level
+            elif pos < short_end:
+                question_type, level = "short", blooms_level
+            else:
+                question_type, level = "long", "analyze"
+            specs.append({"chunk": valid_chunks[i], "difficulty": difficulty, "blooms_level": level, "question_type": question_type})
+        logger.debug("Generating %d MCQs, %d Short Answers, %d Long Answers", mcq_count, short_count, long_count)
+        try:
+            generated = self._generate_batch(specs)
+        except Exception as e:
+            logger.error("Error generating questions: %s", e)
+            generated = []
+
+        seen_mcqs = set()
+        duplicates = 0
+        for i, mcq in enumerate(generated[:mcq_count]):
             try:
-                print(f"  📝 MCQ {i+1}/{mcq_count}...")
-                mcq = self.generate_mcq(chunk, difficulty, blooms_level)
+                mcq = self._mark_fallback_duplicate(mcq)
                 
                 # Check for duplicate questions in the current batch
-                current_questions = [q['question'] for q in questions["mcq"]]
-                if mcq['question'] not in current_questions:
+                if mcq['question'] not in seen_mcqs:
+                    seen_mcqs.add(mcq['question'])
                     questions["mcq"].append(mcq)
                 else:
-                    print(f"⚠️  Duplicate MCQ detected, skipping...")
-                    # Try with a different chunk if available
-                    remaining_chunks = [c for c in valid_chunks if c not in mcq_chunks]
-                    if remaining_chunks:
-                        alternative_chunk = random.choice(remaining_chunks)
-                        print(f"🔄 Retrying with alternative chunk...")
-                        mcq = self.generate_mcq(alternative_chunk, difficulty, blooms_level)
-                        if mcq['question'] not in current_questions:
-                            questions["mcq"].append(mcq)
-                        
+                    logger.debug("Duplicate MCQ detected, skipping")
+                    duplicates += 1
             except Exception as e:
-                print(f"❌ Error generating MCQ {i+1}: {e}")
+                logger.error("Error generating MCQ %d: %s", i + 1, e)
                 continue
 
-        # Generate Short Answer questions
-        remaining_after_mcq = [c for c in valid_chunks if c not in mcq_chunks]
-        short_count = min(counts['short'], len(remaining_after_mcq))
-        short_chunks = random.sample(remaining_after_mcq, short_count)
-        print(f"🔢 Generating {short_count} Short Answers...")
-        
-        for i, chunk in enumerate(short_chunks):
+        # Replace each duplicate with an MCQ on a different chunk, if
+        # available; the retries are independent, so they go out as one batch
+        retry_chunks = [valid_chunks[i] for i in retry_idx[:duplicates]]
+        if retry_chunks:
+            logger.debug("Retrying %d duplicate MCQs with alternative chunks", len(retry_chunks))
             try:
-                print(f"  📝 Short Answer {i+1}/{short_count}...")
-                short_q = self.generate_short_answer(chunk, difficulty, blooms_level)
-                questions["short"].append(short_q)
+                retries = self._generate_batch([
+                    {"chunk": c, "difficulty": difficulty, "blooms_level": blooms_level, "question_type": "mcq"}
+                    for c in retry_chunks
+                ])
             except Exception as e:
-                print(f"❌ Error generating short answer {i+1}: {e}")
-                continue
+                logger.error("Error retrying duplicate MCQs: %s", e)
+                retries = []
+            for mcq in retries:
+                mcq = self._mark_fallback_duplicate(mcq)
+                if mcq['question'] not in seen_mcqs:
+                    seen_mcqs.add(mcq['question'])
+                    questions["mcq"].append(mcq)
 
-        # Generate Long Answer questions
-        remaining_after_short = [c for c in remaining_after_mcq if c not in short_chunks]
-        long_count = min(counts['long'], len(remaining_after_short))
-        long_chunks = random.sample(remaining_after_short, long_count)
-        print(f"🔢 Generating {long_count} Long Answers...")
-        
-        for i, chunk in enumerate(long_chunks):
-            try:
-                print(f"  📝 Long Answer {i+1}/{long_count}...")
-                long_q = self.generate_long_answer(chunk, difficulty, "analyze")
-                questions["long"].append(long_q)
-            except Exception as e:
-                print(f"❌ Error generating long answer {i+1}: {e}")
-                continue
+        questions["short"].extend(generated[mcq_count:mcq_count + short_count])
+        questions["long"].extend(generated[mcq_count + short_count:])
 
         # Summary
         total_generated = len(questions["mcq"]) + len(questions["short"]) + len(questions["long"])
-        print(f"🎉 Question generation completed: {total_generated} questions generated")
-        print(f"   - MCQs: {len(questions['mcq'])}")
-        print(f"   - Short Answers: {len(questions['short'])}")
-        print(f"   - Long Answers: {len(questions['long'])}")
+        logger.info("Question generation completed: %d questions generated (%d MCQs, %d Short Answers, %d Long Answers)",
+                    total_generated, len(questions['mcq']), len(questions['short']), len(questions['long']))
 
         return questions
 
     def save_questions_json(self, questions: Dict, out_path: str = "questions.json"):
         """Save questions to JSON file"""
+        try:
+            if ORJSON_AVAILABLE:
+                # Serialised in C straight to UTF-8 bytes
+                with open(out_path, "wb") as f:
+                    f.write(orjson.dumps(questions, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                with open(out_path, "w", encoding='utf-8') as f:
+                    json.dump(questions, f, indent=2, ensure_ascii=False)
+            logger.info("Questions saved to %s", out_path)
+        except Exception as e:
+            logger.error("Error saving questions: %s", e)
+
+    def save_questions_ndjson(self, generated: Iterable[Tuple[str, Dict[str, Any]]], out_path: str = "questions.ndjson") -> int:
+        """
+        Write (kind, question) pairs, e.g. from iter_questions_from_content,
+        one JSON line each as they arrive, so an interrupted run keeps the
+        questions finished so far. Returns the number written.
+        """
+        written = 0
         try:
             with open(out_path, "w", encoding='utf-8') as f:
-                json.dump(questions, f, indent=2, ensure_ascii=False)
-            print(f"💾 Questions saved to {out_path}")
+                for kind, question in generated:
+                    f.write(json.dumps({"type": kind, "question": question}, ensure_ascii=False) + "\n")
+                    f.flush()
+                    written += 1
+            logger.info("%d questions saved to %s", written, out_path)
         except Exception as e:
-            print(f"❌ Error saving questions: {e}")
\ No newline at end of file
+            logger.error("Error saving questions after %d: %s", written, e)
+        return written
+
+def ndjson_to_grouped_json(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Read save_questions_ndjson output back as {"mcq": [...], "short": [...], "long": [...]}"""
+    questions = {"mcq": [], "short": [], "long": []}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                questions.setdefault(record["type"], []).append(record["question"])
+    return questions
@@ -1,8 +1,9 @@
 from chunker.chunker import split_text_to_chunks
 from chunker.embedder import embed_chunks
 from qdrant.indexer import upsert_chunks
-from qdrant.schema import create_collection
+from qdrant.schema import COLLECTION, create_collection
 from qdrant.client import get_client
+from qdrant_client.models import QueryRequest
 
 # 1️⃣ Sample text
 text = """This is the first paragraph of the document.
@@ -24,12 +25,13 @@ create_collection()
 # 5️⃣ Upsert chunks into Qdrant
 upsert_chunks(chunks, embeddings, doc_id="doc_test")
 
-# 6️⃣ Test search
+# 6️⃣ Test search: every chunk is queried in one round trip, and each
+# should find itself
 client = get_client()
-result = client.search(
-    collection_name="doc_chunks",
-    query_vector=embeddings[0],
-    limit=1
+responses = client.query_batch_points(
+    collection_name=COLLECTION,
+    requests=[QueryRequest(query=vector.tolist(), limit=1, with_payload=True) for vector in embeddings]
 )
 
-print("Top result:", result[0].payload["chunk_text"])
+for response in responses:
+    print("Top result:", response.points[0].payload["chunk_text"])